@@ -0,0 +1,166 @@
+"""
+Response compression: Accept-Encoding negotiation across zstd, brotli and gzip, an ASGI
+middleware that compresses large compressible responses on the fly, and ``encode_all`` for
+bodies that are cached pre-compressed (the sync snapshot). brotli and zstd are used only
+when their packages are installed; gzip is always available.
+"""
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional
+    brotli = None
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - optional
+    zstandard = None
+
+# Server preference when the client weights several encodings equally.
+PREFERENCE = [name for name, module in (("zstd", zstandard), ("br", brotli), ("gzip", zlib)) if module is not None]
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/", "application/javascript", "image/svg+xml")
+
+
+def negotiate(accept_encoding: str | None) -> str | None:
+    """Best supported encoding for an Accept-Encoding header, honouring q-values; None for identity."""
+    if not accept_encoding:
+        return None
+    weights: dict[str, float] = {}
+    for item in accept_encoding.split(","):
+        name, _, params = item.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name.strip().lower()] = q
+    star = weights.get("*", 0.0)
+    best, best_q = None, 0.0
+    for name in PREFERENCE:
+        q = weights.get(name, star)
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Encoder:
+    def __init__(self, encoding: str, level: int | None = None):
+        self.encoding = encoding
+        if encoding == "gzip":
+            self._obj = zlib.compressobj(level if level is not None else 6, zlib.DEFLATED, 31)
+            self.compress, self._finish = self._obj.compress, self._obj.flush
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=level if level is not None else 5)
+            self.compress, self._finish = self._obj.process, self._obj.finish
+        elif encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level if level is not None else 3).compressobj()
+            self.compress, self._finish = self._obj.compress, self._obj.flush
+        else:
+            raise ValueError(f"Unsupported encoding {encoding}")
+
+    def finish(self) -> bytes:
+        return self._finish()
+
+
+def compress(data: bytes, encoding: str, level: int | None = None) -> bytes:
+    encoder = _Encoder(encoding, level)
+    return encoder.compress(data) + encoder.finish()
+
+
+def encode_all(data: bytes) -> dict[str, bytes]:
+    """
+    Every supported encoding of ``data``, for cached bodies. The sync snapshot is rebuilt on
+    each invalidation while devices wait for it, so this uses the same moderate levels as
+    live responses: brotli 11 and zstd 19 cost seconds per megabyte for a few percent.
+    """
+    return {encoding: compress(data, encoding) for encoding in PREFERENCE}
+
+
+class CompressionMiddleware:
+    """
+    Compresses responses of compressible types over ``minimum_size`` bytes with the encoding
+    the client prefers. Responses that already set Content-Encoding (pre-compressed bodies)
+    and partial responses are passed through untouched; streaming bodies are compressed
+    chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(Headers(scope=scope).get("accept-encoding"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+        await _Responder(self.app, encoding, self.minimum_size)(scope, receive, send)
+
+
+class _Responder:
+    def __init__(self, app: ASGIApp, encoding: str, minimum_size: int):
+        self.app = app
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.send: Send | None = None
+        self.start: Message | None = None
+        self.encoder: _Encoder | None = None
+        self.passthrough = False
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        self.send = send
+        await self.app(scope, receive, self.on_send)
+
+    async def on_send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            headers = Headers(raw=message["headers"])
+            content_type = headers.get("content-type", "")
+            self.passthrough = (
+                "content-encoding" in headers
+                or "content-range" in headers
+                or message["status"] in (204, 206, 304)
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            )
+            if self.passthrough:
+                await self.send(message)
+            else:
+                self.start = message
+            return
+        if message["type"] != "http.response.body" or self.passthrough:
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.start is not None:
+            start, self.start = self.start, None
+            headers = MutableHeaders(raw=start["headers"])
+            if not more_body and len(body) < self.minimum_size:
+                self.passthrough = True
+                await self.send(start)
+                await self.send(message)
+                return
+            self.encoder = _Encoder(self.encoding)
+            headers["Content-Encoding"] = self.encoding
+            headers.add_vary_header("Accept-Encoding")
+            if more_body:
+                del headers["Content-Length"]
+                await self.send(start)
+                await self.send({"type": "http.response.body", "body": self.encoder.compress(body), "more_body": True})
+                return
+            payload = self.encoder.compress(body) + self.encoder.finish()
+            headers["Content-Length"] = str(len(payload))
+            await self.send(start)
+            await self.send({"type": "http.response.body", "body": payload})
+            return
+
+        chunk = self.encoder.compress(body)
+        if not more_body:
+            chunk += self.encoder.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
@@ -10,15 +10,82 @@ class Settings(BaseSettings):
     jwt_algorithm: str = "HS256"
     jwt_exp_minutes: int = 30
     refresh_exp_minutes: int = 7 * 24 * 60
+    auth_cache_size: int = 1024
+    auth_cache_ttl_sec: int = 60  # 0 disables the principal cache
+    token_cache_size: int = 4096
     database_url: str = "sqlite:///./data/app.db"
+    database_read_url: str | None = None  # e.g. a Postgres replica; defaults to database_url
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+    db_pool_recycle_sec: int = 1800
+    sqlite_journal_mode: str = "WAL"
+    sqlite_synchronous: str = "NORMAL"
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_mmap_size: int = 256 * 1024 * 1024
+    sqlite_cache_size_kib: int = 64 * 1024
     embeddings_dir: str = "data/embeddings"
-    embedder_name: str = "facenet"
+    embedder_name: str = "facenet"  # facenet | facenet-ts | facenet-compile | facenet-onnx | hashed
+    embedder_warmup: bool = False
+    facenet_weights_path: str = "data/models/facenet-vggface2.pt"
+    # Weights are read from facenet_weights_path only; fetch them once with
+    # `python -m backend.app.services.facenet_embedder`, or set True to download on first use.
+    facenet_allow_download: bool = False
+    facenet_channels_last: bool = False
+    facenet_onnx_path: str = "data/models/facenet.onnx"
+    face_detector: str = "mtcnn"  # mtcnn | mtcnn-fast | none
+    face_mode: str = "largest"  # largest | all
+    face_margin: float = 0.15
+    embedding_dtype: str = "float32"  # float32 | float16
+    embedding_migration_batch_size: int = 500
+    reembed_batch_size: int = 32
+    reembed_pause_ms: int = 200  # sleep between batches; doubled while live inference is queued
+    reembed_poll_sec: int = 10  # how often workers look for jobs and a changed active model
+    reembed_stale_sec: int = 300  # a running job without progress for this long is taken over
+    embedding_bundle_dtype: str = "float16"  # float32 | float16, for the device sync bundle
+    embed_batch_size: int = 16
+    embed_batch_wait_ms: int = 5
+    inference_executor: str = "thread"  # thread | process
+    inference_workers: int = 1
+    inference_queue_size: int = 32
+    inference_torch_threads: int = 0  # 0 keeps the torch default
+    max_upload_bytes: int = 10 * 1024 * 1024  # per file; 0 disables the limit
+    max_request_bytes: int = 64 * 1024 * 1024  # whole body, refused while it arrives; 0 disables
+    upload_chunk_size: int = 1024 * 1024
+    thumbnail_size: int = 256
+    thumbnail_quality: int = 75
+    derivative_queue_size: int = 1000
+    sync_photo_variant: str = "face"  # face | thumb | original
+    sync_capture_variant: str = "thumb"  # thumb | original
+    compression_min_bytes: int = 1024
     cors_origins: list[str] = ["*"]
+    metrics_token: str | None = None  # bearer token /metrics requires; unset leaves the scrape open
     throttling_per_minute: int = 60
     threshold: float = 0.6
+    match_metric: str = "cosine"  # cosine | l2
+    vector_index: str = "flat"  # flat | ivf | hnsw
+    match_mode: str = "embeddings"  # embeddings | templates (centroid + exemplars per user)
+    template_exemplars: int = 4
+    template_outlier_distance: float = 0.4  # cosine distance to the centroid
+    template_min_embeddings: int = 3  # users with fewer embeddings are never pruned
+    template_auto_prune: bool = False  # prune outliers on every enrollment
+    ivf_nlist: int = 0  # 0 = sqrt(gallery size)
+    ivf_nprobe: int = 8
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 100
+    hnsw_ef_search: int = 64
     gpio_pin: int = 17
     gpio_pulse_ms: int = 800
     sync_interval_sec: int = 300
+    sync_tombstone_retention_days: int = 30
+    sync_snapshot_ttl_sec: int = 60  # bounds staleness across worker processes
+    event_write_behind: bool = False  # /raspberry/events/log answers 202 and writes in batches
+    event_flush_batch_size: int = 200
+    event_flush_interval_ms: int = 200
+    event_queue_size: int = 10000
+    event_batch_max: int = 1000
+    event_retention_days: int = 90  # raw events older than this are archived; 0 keeps everything
+    event_archive_dir: str = "data/archive/events"
+    event_compaction_interval_sec: int = 3600  # 0 disables the background job
     default_admin_identifier: str = "admin"
     default_admin_password: str = "admin"
 
@@ -1,21 +1,83 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine, make_url
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from .config import get_settings
+from .config import Settings, get_settings
 
 settings = get_settings()
 
-engine = create_engine(settings.database_url, connect_args={"check_same_thread": False} if "sqlite" in settings.database_url else {})
+
+def create_db_engine(url: str, read_only: bool = False, config: Settings | None = None) -> Engine:
+    """
+    Engine with per-backend tuning: PRAGMAs on every new SQLite connection, pool sizing and
+    pre-ping for server databases. ``read_only`` SQLite connections refuse writes via query_only.
+    """
+    config = config or settings
+    if make_url(url).get_backend_name() != "sqlite":
+        return create_engine(
+            url,
+            pool_size=config.db_pool_size,
+            max_overflow=config.db_max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=config.db_pool_recycle_sec,
+        )
+
+    engine = create_engine(
+        url,
+        connect_args={"check_same_thread": False, "timeout": config.sqlite_busy_timeout_ms / 1000},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, _):
+        cursor = dbapi_connection.cursor()
+        try:
+            # WAL lets readers run alongside the single writer instead of waiting on its lock.
+            if not read_only:
+                cursor.execute(f"PRAGMA journal_mode={config.sqlite_journal_mode}")
+            cursor.execute(f"PRAGMA synchronous={config.sqlite_synchronous}")
+            cursor.execute(f"PRAGMA busy_timeout={int(config.sqlite_busy_timeout_ms)}")
+            cursor.execute(f"PRAGMA mmap_size={int(config.sqlite_mmap_size)}")
+            cursor.execute(f"PRAGMA cache_size=-{int(config.sqlite_cache_size_kib)}")
+            cursor.execute("PRAGMA temp_store=MEMORY")
+            if read_only:
+                cursor.execute("PRAGMA query_only=ON")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def _is_memory_sqlite(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+engine = create_db_engine(settings.database_url)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Read-heavy paths (sync, event listing) use their own pool so they never queue behind writers.
+# An in-memory SQLite database is private to its connection, so it has to share the write engine.
+if settings.database_read_url is None and _is_memory_sqlite(settings.database_url):
+    read_engine = engine
+else:
+    read_engine = create_db_engine(settings.database_read_url or settings.database_url, read_only=True)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
 Base = declarative_base()
 
 
 def init_db() -> None:
     import backend.app.models  # noqa: F401
 
+    from backend.app.services import generation
+
     Base.metadata.create_all(bind=engine)
     _maybe_add_columns()
+    _maybe_enable_autoincrement()
+    _ensure_indexes()
+    _maybe_convert_vector_column()
+    with engine.begin() as conn:
+        generation.seed(conn)
 
 
 def _maybe_add_columns() -> None:
@@ -29,3 +91,63 @@ def _maybe_add_columns() -> None:
         columns = {row[1] for row in info}
         if "expires_at" not in columns:
             conn.execute(text("ALTER TABLE users ADD COLUMN expires_at DATETIME"))
+        info = conn.execute(text("PRAGMA table_info(device_sync)")).fetchall()
+        columns = {row[1] for row in info}
+        if "last_cursor" not in columns:
+            conn.execute(text("ALTER TABLE device_sync ADD COLUMN last_cursor VARCHAR(64)"))
+        info = conn.execute(text("PRAGMA table_info(embeddings)")).fetchall()
+        columns = {row[1] for row in info}
+        if "photo_id" not in columns:
+            conn.execute(text("ALTER TABLE embeddings ADD COLUMN photo_id INTEGER"))
+
+
+def _maybe_enable_autoincrement() -> None:
+    """
+    Rebuild SQLite tables created before they were declared ``sqlite_autoincrement``, which
+    cannot be switched on in place. Follows SQLite's create-copy-drop-rename recipe, so
+    foreign keys elsewhere keep pointing at the table name; indexes are recreated afterwards.
+    """
+    if "sqlite" not in settings.database_url:
+        return
+    from sqlalchemy import text
+    from sqlalchemy.schema import CreateTable
+
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if not table.dialect_options["sqlite"]["autoincrement"]:
+                continue
+            sql = conn.execute(
+                text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table.name}
+            ).scalar()
+            if sql is None or "AUTOINCREMENT" in sql.upper():
+                continue
+            existing = {row[1] for row in conn.execute(text(f"PRAGMA table_info({table.name})"))}
+            columns = ", ".join(column.name for column in table.columns if column.name in existing)
+            staging = f"{table.name}__rebuild"
+            create = str(CreateTable(table).compile(dialect=engine.dialect))
+            conn.execute(text(create.replace(f"CREATE TABLE {table.name} ", f"CREATE TABLE {staging} ", 1)))
+            conn.execute(text(f"INSERT INTO {staging} ({columns}) SELECT {columns} FROM {table.name}"))
+            conn.execute(text(f"DROP TABLE {table.name}"))
+            conn.execute(text(f"ALTER TABLE {staging} RENAME TO {table.name}"))
+
+
+def _ensure_indexes() -> None:
+    """create_all skips tables that already exist, so add indexes introduced later."""
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            index.create(bind=engine, checkfirst=True)
+
+
+def _maybe_convert_vector_column() -> None:
+    """Switch embeddings.vector from TEXT to BYTEA on servers that enforce column types."""
+    if "sqlite" in settings.database_url:
+        # SQLite stores BLOBs in the old TEXT column as-is; rows are rewritten lazily.
+        return
+    from sqlalchemy import inspect, text
+
+    columns = {col["name"]: col for col in inspect(engine).get_columns("embeddings")}
+    vector = columns.get("vector")
+    if vector is None or vector["type"].python_type is bytes:
+        return
+    with engine.begin() as conn:
+        conn.execute(text("ALTER TABLE embeddings ALTER COLUMN vector TYPE BYTEA USING convert_to(vector, 'UTF8')"))
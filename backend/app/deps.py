@@ -1,5 +1,6 @@
 import logging
-from functools import lru_cache
+from functools import lru_cache, partial
+from importlib.util import find_spec
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -7,9 +8,18 @@ from sqlalchemy.orm import Session
 
 from . import models
 from .config import get_settings
-from .db import SessionLocal
+from .db import ReadSessionLocal, SessionLocal
 from .security import decode_token
-from .services.model_registry import FaceEmbedderRegistry, HashedEmbedder
+from .services import active_model, auth_cache
+from .services.auth_cache import Principal
+from .services.batching import MicroBatcher
+from .services.derivative_service import DerivativeWorker
+from .services.face_detector import facenet_model_name
+from .services.event_buffer import EventWriteBuffer
+from .services.inference_executor import InferenceExecutor
+from .services.model_registry import BaseEmbedder, FaceEmbedderRegistry, HashedEmbedder, LazyEmbedder
+from .services.reembed_service import ReembedWorker
+from .services.retention_service import CompactionScheduler
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 logger = logging.getLogger(__name__)
@@ -23,34 +33,191 @@ def get_db():
         db.close()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> models.User:
-    payload = decode_token(token)
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    payload = auth_cache.get_token_payload(token)
+    if payload is None:
+        payload = decode_token(token)
+        auth_cache.remember_token_payload(token, payload)
     identifier: str | None = payload.get("sub")  # type: ignore
     if not identifier:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token payload")
-    user = db.query(models.User).filter(models.User.identifier == identifier).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    principal = auth_cache.get_principal(identifier)
+    if principal is not None:
+        return principal
+    # Only a cache miss opens a session, so cached requests never touch the database.
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.identifier == identifier).first()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = Principal.from_user(user)
+    finally:
+        db.close()
+    auth_cache.remember_principal(principal)
+    return principal
+
+
+# Registry name -> FaceNetEmbedder inference mode. All variants share one vector space.
+FACENET_VARIANTS = {
+    "facenet": "fp32",
+    "facenet-ts": "torchscript",
+    "facenet-compile": "compile",
+    "facenet-onnx": "onnx",
+}
+
+
+def _build_facenet(inference_mode: str = "fp32"):
+    from .services.facenet_embedder import FaceNetEmbedder
+
+    settings = get_settings()
+    return FaceNetEmbedder(
+        face_detector=settings.face_detector,
+        face_margin=settings.face_margin,
+        weights_path=settings.facenet_weights_path,
+        allow_download=settings.facenet_allow_download,
+        inference_mode=inference_mode,
+        channels_last=settings.facenet_channels_last,
+        onnx_path=settings.facenet_onnx_path,
+    )
 
 
 @lru_cache()
-def get_embedder():
+def get_embedder_registry() -> FaceEmbedderRegistry:
     # Registry allows swapping FaceNet to another model later.
     registry = FaceEmbedderRegistry()
-    settings = get_settings()
-
-    try:
-        from .services.facenet_embedder import FaceNetEmbedder
 
-        registry.register("facenet", FaceNetEmbedder())
-    except Exception as exc:
-        logger.warning("FaceNet not available, falling back to hashed embedder: %s", exc)
+    # Only probe for the packages here; torch is imported when the model is first needed.
+    if find_spec("torch") and find_spec("facenet_pytorch"):
+        model_name = facenet_model_name(get_settings().face_detector)
+        for variant, mode in FACENET_VARIANTS.items():
+            if mode == "onnx" and not find_spec("onnxruntime"):
+                continue  # not in requirements.txt; install onnxruntime to enable facenet-onnx
+            registry.register(variant, LazyEmbedder(model_name, partial(_build_facenet, mode)))
+    else:
+        logger.warning("FaceNet not available, falling back to hashed embedder: torch/facenet-pytorch not installed")
 
     registry.register("hashed", HashedEmbedder())
+    return registry
 
+
+def get_embedder_by_name(name: str) -> BaseEmbedder:
+    registry = get_embedder_registry()
     try:
-        return registry.get(settings.embedder_name)
-    except Exception:
-        logger.warning("Embedder %s not found, using default", settings.embedder_name)
+        return registry.get(name)
+    except KeyError:
+        logger.warning("Embedder %s not found, using default", name)
         return registry.get_default()
+
+
+def _stored_active_model() -> active_model.ActiveModel | None:
+    db = SessionLocal()
+    try:
+        return active_model.get_active_model(db)
+    except Exception:
+        return None  # tables not created yet
+    finally:
+        db.close()
+
+
+def _active_embedder_name() -> str:
+    active = _stored_active_model()
+    # The database wins over settings.embedder_name: switching models goes through a re-embedding job.
+    return active.embedder_name if active else get_settings().embedder_name
+
+
+@lru_cache()
+def get_embedder() -> BaseEmbedder:
+    return get_embedder_by_name(_active_embedder_name())
+
+
+@lru_cache()
+def get_model_name() -> str:
+    """
+    Partition that probes are matched against and enrollments join. Usually the embedder's
+    own space; after an upgrade changed that space it stays on the stored one until the
+    queued re-embedding cuts over.
+    """
+    active = _stored_active_model()
+    return active.model_name if active else get_embedder().name
+
+
+def switch_embedder(embedder_name: str) -> None:
+    """Serve new requests with ``embedder_name``; batches already dispatched finish on the old one."""
+    batcher = get_batcher()
+    if batcher.embedder.registry_name == embedder_name or embedder_name not in get_embedder_registry().names():
+        return
+    get_embedder.cache_clear()
+    batcher.embedder = get_embedder()
+    logger.info("Active embedder is now %s (%s)", batcher.embedder.registry_name, batcher.embedder.name)
+
+
+def sync_active_embedder(db: Session) -> None:
+    active = active_model.get_active_model(db)
+    if active is not None:
+        switch_embedder(active.embedder_name)
+    get_model_name.cache_clear()
+
+
+@lru_cache()
+def get_inference_executor() -> InferenceExecutor:
+    settings = get_settings()
+    return InferenceExecutor(
+        kind=settings.inference_executor,
+        workers=settings.inference_workers,
+        max_queue=settings.inference_queue_size,
+        torch_threads=settings.inference_torch_threads,
+    )
+
+
+@lru_cache()
+def get_batcher() -> MicroBatcher:
+    settings = get_settings()
+    return MicroBatcher(
+        get_embedder(),
+        get_inference_executor(),
+        settings.embed_batch_size,
+        settings.embed_batch_wait_ms,
+    )
+
+
+@lru_cache()
+def get_event_buffer() -> EventWriteBuffer:
+    settings = get_settings()
+    return EventWriteBuffer(
+        SessionLocal,
+        max_batch=settings.event_flush_batch_size,
+        flush_interval_ms=settings.event_flush_interval_ms,
+        max_queue=settings.event_queue_size,
+    )
+
+
+@lru_cache
+def get_compaction_scheduler() -> CompactionScheduler:
+    return CompactionScheduler(SessionLocal, interval_sec=get_settings().event_compaction_interval_sec)
+
+
+@lru_cache
+def get_derivative_worker() -> DerivativeWorker:
+    return DerivativeWorker(max_queue=get_settings().derivative_queue_size)
+
+
+@lru_cache
+def get_reembed_worker() -> ReembedWorker:
+    settings = get_settings()
+    return ReembedWorker(
+        SessionLocal,
+        resolve_embedder=get_embedder_by_name,
+        on_active=sync_active_embedder,
+        # Live traffic first: back off while identify/enroll requests are queued.
+        busy=lambda: get_inference_executor().stats()["queue_depth"] > 0,
+        poll_sec=settings.reembed_poll_sec,
+        pause_ms=settings.reembed_pause_ms,
+    )
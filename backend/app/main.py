@@ -1,15 +1,45 @@
+import hmac
+import logging
+import threading
 from pathlib import Path
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Header, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 from fastapi.staticfiles import StaticFiles
+from sqlalchemy import text
 
+from backend.app import metrics
+from backend.app.compression import CompressionMiddleware
 from backend.app.config import get_settings
-from backend.app.db import SessionLocal, init_db
-from backend.app.routers import auth, events, raspberry, users
+from backend.app.db import SessionLocal, engine, init_db, read_engine
+from backend.app.deps import (
+    FACENET_VARIANTS,
+    get_compaction_scheduler,
+    get_derivative_worker,
+    get_embedder,
+    get_event_buffer,
+    get_inference_executor,
+    get_reembed_worker,
+)
+from backend.app.routers import auth, events, gallery, media, raspberry, stats, users
+from backend.app.services import (
+    active_model,
+    auth_cache,
+    gallery_service,
+    media_service,
+    reembed_service,
+    template_service,
+)
+from backend.app.services.embedding_service import migrate_legacy_vectors
+from backend.app.services.gallery_service import persist_galleries
+from backend.app.services.inference_executor import InferenceQueueFull
+from backend.app.services.sync_service import invalidate_sync_snapshot, prune_tombstones
+from backend.app.services.upload_service import BodyLimitMiddleware, UploadTooLarge
 from backend.app.services.user_service import ensure_default_admin
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
 
 # Ensure required directories exist before mounting static files
 DATA_DIR = Path("data")
@@ -23,6 +53,8 @@ EMBED_DIR.mkdir(parents=True, exist_ok=True)
 
 app = FastAPI(title=settings.app_name)
 
+app.add_middleware(BodyLimitMiddleware, max_bytes=settings.max_request_bytes)
+app.add_middleware(CompressionMiddleware, minimum_size=settings.compression_min_bytes)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.cors_origins,
@@ -30,6 +62,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it wraps everything else and times the whole request, compression and CORS included.
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_engine(engine, "write")
+if read_engine is not engine:
+    metrics.instrument_engine(read_engine, "read")
+
+
+def _pool_stats() -> dict:
+    pool = engine.pool
+    return {name: getattr(pool, name)() for name in ("size", "checkedout", "overflow") if hasattr(pool, name)}
+
+
+for prefix, collect in (
+    ("inference", lambda: get_inference_executor().stats()),
+    ("event_buffer", lambda: get_event_buffer().stats()),
+    ("auth_cache", auth_cache.stats),
+    ("derivatives", lambda: get_derivative_worker().stats()),
+    ("reembed", lambda: get_reembed_worker().stats()),
+    ("db_pool", _pool_stats),
+):
+    metrics.REGISTRY.register_collector(metrics.stats_collector(prefix, collect))
+
+
+@app.exception_handler(InferenceQueueFull)
+def inference_queue_full(_: Request, exc: InferenceQueueFull):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Inference queue is full, retry later"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(UploadTooLarge)
+def upload_too_large(_: Request, exc: UploadTooLarge):
+    return JSONResponse(status_code=413, content={"detail": f"File exceeds the {exc.limit} byte upload limit"})
 
 
 @app.on_event("startup")
@@ -42,6 +110,103 @@ def startup():
     db = SessionLocal()
     try:
         ensure_default_admin(db, settings.default_admin_identifier, settings.default_admin_password)
+        prune_tombstones(db)
+        _record_active_model(db)
+    finally:
+        db.close()
+    if _missing_weights():
+        logger.error(
+            "FaceNet weights are missing at %s and downloads are off; run "
+            "`python -m backend.app.services.facenet_embedder` or set FACENET_ALLOW_DOWNLOAD=true",
+            settings.facenet_weights_path,
+        )
+    threading.Thread(target=_migrate_embeddings, name="embedding-migration", daemon=True).start()
+    if settings.event_write_behind:
+        get_event_buffer().start()
+    get_compaction_scheduler().start()
+    get_derivative_worker().start()
+    get_reembed_worker().start()
+    if settings.embedder_warmup:
+        threading.Thread(target=_warmup_embedder, name="embedder-warmup", daemon=True).start()
+
+
+def _record_active_model(db) -> None:
+    embedder = get_embedder()
+    if active_model.get_active_model(db) is None:
+        # First start. The vectors already stored (plain "facenet" before the aligned variant,
+        # say) keep matching; _migrate_embeddings queues their move into the embedder's space.
+        stored = active_model.stored_model_name(db)
+        active_model.set_active_model(db, embedder.registry_name, stored or embedder.name)
+        db.commit()
+    elif embedder.registry_name != settings.embedder_name:
+        logger.warning(
+            "EMBEDDER_NAME=%s is ignored, the active embedder is %s; switch with POST /gallery/reembed",
+            settings.embedder_name,
+            embedder.registry_name,
+        )
+
+
+def _queue_changed_space(db) -> None:
+    embedder = get_embedder()
+    job = reembed_service.queue_for_changed_space(db, embedder.registry_name, embedder.name)
+    if job is not None:
+        logger.warning("%s now embeds into %s; queued re-embedding job %d", job.embedder_name, job.model_name, job.id)
+        get_reembed_worker().wake()
+
+
+def _warmup_embedder() -> None:
+    try:
+        get_embedder().warmup()
+        logger.info("Embedder warm-up finished")
+    except Exception:
+        logger.exception("Embedder warm-up failed")
+
+
+@app.on_event("shutdown")
+def shutdown():
+    # Flush buffered events before anything else goes away.
+    get_event_buffer().stop()
+    get_compaction_scheduler().stop()
+    get_derivative_worker().stop()
+    get_reembed_worker().stop()
+    persist_galleries()
+    get_inference_executor().shutdown()
+
+
+def _migrate_embeddings() -> None:
+    db = SessionLocal()
+    try:
+        migrate_legacy_vectors(db)
+    except Exception:
+        logger.exception("Embedding migration failed")
+    try:
+        # First start after upgrading: index the files already on disk.
+        if media_service.is_empty(db):
+            counts = media_service.reindex(db)
+            if any(counts.values()):
+                invalidate_sync_snapshot()
+                logger.info("Indexed existing media: %s", counts)
+    except Exception:
+        logger.exception("Media reindex failed")
+    try:
+        # Only after the reindex: the job re-embeds indexed photos and cuts over once none are left.
+        _queue_changed_space(db)
+    except Exception:
+        logger.exception("Queueing the re-embedding failed")
+    try:
+        # Templates are new; build them once for every model that already has embeddings.
+        if template_service.is_empty(db):
+            for partition in gallery_service.partition_stats(db):
+                template_service.rebuild_model(db, partition["model_name"])
+    except Exception:
+        logger.exception("Template build failed")
+    try:
+        # Load or start building the active gallery now instead of on the first identify.
+        active = active_model.get_active_model(db)
+        if active is not None:
+            gallery_service.get_gallery(active.model_name).refresh(db)
+    except Exception:
+        logger.exception("Gallery warm-up failed")
     finally:
         db.close()
 
@@ -51,10 +216,53 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint(authorization: str | None = Header(default=None)):
+    """
+    Prometheus scrape target; see app.metrics. Scrapers cannot refresh user tokens, so this
+    takes the static ``metrics_token`` instead of get_current_user when one is configured.
+    """
+    expected = f"Bearer {settings.metrics_token}"
+    if settings.metrics_token and not hmac.compare_digest((authorization or "").encode(), expected.encode()):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+    return Response(metrics.REGISTRY.render(), media_type=metrics.CONTENT_TYPE)
+
+
+def _missing_weights() -> bool:
+    """FaceNet serves but has no weights file and may not download one, so it can never load."""
+    return (
+        get_embedder().registry_name in FACENET_VARIANTS
+        and not settings.facenet_allow_download
+        and not Path(settings.facenet_weights_path).exists()
+    )
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: the database answers and, when warm-up is enabled, the model is loaded."""
+    database = True
+    db = SessionLocal()
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception:
+        database = False
+    finally:
+        db.close()
+    embedder = get_embedder()
+    embedder_state = "missing_weights" if _missing_weights() else getattr(embedder, "state", "loaded")
+    is_ready = database and embedder_state != "missing_weights"
+    is_ready = is_ready and (not settings.embedder_warmup or embedder_state == "loaded")
+    body = {"status": "ready" if is_ready else "starting", "database": database, "embedder": embedder_state}
+    return JSONResponse(status_code=200 if is_ready else 503, content=body)
+
+
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(raspberry.router)
 app.include_router(events.router)
+app.include_router(stats.router)
+app.include_router(media.router)
+app.include_router(gallery.router)
 
 frontend_path = Path(__file__).resolve().parents[2] / "frontend"
 if frontend_path.exists():
@@ -0,0 +1,320 @@
+"""
+In-process metrics rendered in the Prometheus text exposition format (0.0.4), without a
+client library. A series is created once per label set; after that an update is a dict
+lookup plus a per-series lock, which only contends when two threads hit the very same
+series at once. Values live in this process: with several API workers, or
+``inference_executor=process`` for the embedder timings, every process reports its own.
+
+Also here: the ASGI middleware that times requests, the SQLAlchemy hooks that count
+queries (globally and per request, via a context variable), and ``stats_collector`` for
+folding the existing ``stats()`` dicts into the scrape.
+"""
+import bisect
+import contextvars
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = tuple(1024 * 4**i for i in range(10))  # 1 KiB .. 256 MiB
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Sample(NamedTuple):
+    name: str
+    kind: str  # counter | gauge | histogram | untyped
+    documentation: str
+    labels: dict
+    value: float
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Iterable[str], values: Iterable[str]) -> str:
+    pairs = [f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Value:
+    __slots__ = ("_lock", "value")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+
+class _Buckets:
+    __slots__ = ("_lock", "_upper", "counts", "sum", "count")
+
+    def __init__(self, upper: tuple[float, ...]):
+        self._lock = threading.Lock()
+        self._upper = upper
+        self.counts = [0] * (len(upper) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        slot = bisect.bisect_left(self._upper, value)
+        with self._lock:
+            self.counts[slot] += 1
+            self.sum += value
+            self.count += 1
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = labelnames
+        self._series: dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _new(self):
+        return _Value()
+
+    def labels(self, *values: str):
+        series = self._series.get(values)
+        if series is None:
+            with self._lock:
+                series = self._series.setdefault(values, self._new())
+        return series
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, series in list(self._series.items()):
+            yield f"{self.name}{_labels(self.labelnames, values)} {_number(series.value)}"
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new(self):
+        return _Buckets(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def time(self):
+        return self.labels().time()
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        names = (*self.labelnames, "le")
+        for values, series in list(self._series.items()):
+            with series._lock:
+                counts, total, count = list(series.counts), series.sum, series.count
+            cumulative = 0
+            for upper, bucket in zip((*self.buckets, float("inf")), counts):
+                cumulative += bucket
+                yield f"{self.name}_bucket{_labels(names, (*values, _number(upper)))} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, values)} {_number(total)}"
+            yield f"{self.name}_count{_labels(self.labelnames, values)} {count}"
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+        self._collectors: list[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Gauge:
+        return self._add(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets=LATENCY_BUCKETS
+    ) -> Histogram:
+        return self._add(Histogram(name, documentation, labelnames, buckets))
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]) -> None:
+        """``collector`` is called on every scrape, for values that already live elsewhere."""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        seen: set[str] = set()
+        for collector in self._collectors:
+            try:
+                samples = list(collector())
+            except Exception:
+                continue  # a broken collector must not take the whole scrape down
+            for sample in samples:
+                if sample.name not in seen:
+                    seen.add(sample.name)
+                    lines.append(f"# HELP {sample.name} {sample.documentation}")
+                    lines.append(f"# TYPE {sample.name} {sample.kind}")
+                lines.append(
+                    f"{sample.name}{_labels(sample.labels.keys(), sample.labels.values())} {_number(sample.value)}"
+                )
+        return "\n".join(lines) + "\n"
+
+
+def stats_collector(prefix: str, stats: Callable[[], dict]) -> Callable[[], Iterator[Sample]]:
+    """Expose every numeric field of a ``stats()`` dict (nested dicts flattened) as ``prefix_field``."""
+
+    def collect() -> Iterator[Sample]:
+        yield from _flatten(prefix, stats())
+
+    return collect
+
+
+def _flatten(prefix: str, values: dict) -> Iterator[Sample]:
+    for key, value in values.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            yield from _flatten(name, value)
+        elif isinstance(value, (int, float)):
+            yield Sample(name, "untyped", f"{key} from {prefix} stats", {}, float(value))
+
+
+REGISTRY = Registry()
+
+HTTP_REQUESTS = REGISTRY.counter("http_requests_total", "Requests by route template and status.", ("method", "route", "status"))
+HTTP_LATENCY = REGISTRY.histogram("http_request_duration_seconds", "Request latency, body included.", ("method", "route"))
+HTTP_IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "Requests currently being served.")
+DB_QUERIES = REGISTRY.counter("db_queries_total", "SQL statements executed.", ("engine",))
+DB_QUERY_SECONDS = REGISTRY.histogram("db_query_duration_seconds", "SQL statement execution time.", ("engine",))
+REQUEST_DB_QUERIES = REGISTRY.histogram(
+    "http_request_db_queries", "SQL statements per request.", ("route",), COUNT_BUCKETS
+)
+REQUEST_DB_SECONDS = REGISTRY.histogram("http_request_db_seconds", "Time in SQL per request.", ("route",))
+EMBEDDER_PREPROCESS = REGISTRY.histogram(
+    "embedder_preprocess_seconds", "Decode, detect and align time per image.", ("mode",)
+)
+EMBEDDER_FORWARD = REGISTRY.histogram("embedder_forward_seconds", "Model forward time per batch.", ("mode",))
+EMBEDDER_BATCH = REGISTRY.histogram("embedder_batch_size", "Faces per forward batch.", ("mode",), COUNT_BUCKETS)
+SYNC_BUILD = REGISTRY.histogram("sync_payload_build_seconds", "Time to build a sync payload.", ("kind",))
+SYNC_BYTES = REGISTRY.histogram(
+    "sync_payload_bytes", "Serialized sync payload size.", ("kind", "encoding"), SIZE_BUCKETS
+)
+UPLOAD_BYTES = REGISTRY.histogram("upload_size_bytes", "Accepted upload sizes.", (), SIZE_BUCKETS)
+UPLOAD_REJECTED = REGISTRY.counter("upload_rejected_total", "Uploads refused for exceeding max_upload_bytes.")
+
+# [statement count, seconds in SQL] for the request being served, shared into worker threads.
+_request_db: contextvars.ContextVar[list | None] = contextvars.ContextVar("request_db", default=None)
+
+
+def instrument_engine(engine: Engine, label: str) -> None:
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("metrics_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["metrics_started"].pop()
+        DB_QUERIES.labels(label).inc()
+        DB_QUERY_SECONDS.labels(label).observe(elapsed)
+        usage = _request_db.get()
+        if usage is not None:
+            usage[0] += 1
+            usage[1] += elapsed
+
+    @event.listens_for(engine, "handle_error")
+    def _error(context):
+        started = context.connection.info.get("metrics_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+
+class MetricsMiddleware:
+    """Per-route latency, status counts, in-flight requests and SQL use per request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        usage = [0, 0.0]
+        token = _request_db.set(usage)
+        HTTP_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            HTTP_IN_FLIGHT.dec()
+            _request_db.reset(token)
+            # The route template, not the raw path, keeps label cardinality bounded.
+            route = getattr(scope.get("route"), "path", None) or "unmatched"
+            HTTP_REQUESTS.labels(scope["method"], route, str(status)).inc()
+            HTTP_LATENCY.labels(scope["method"], route).observe(elapsed)
+            REQUEST_DB_QUERIES.labels(route).observe(usage[0])
+            REQUEST_DB_SECONDS.labels(route).observe(usage[1])
@@ -1,7 +1,7 @@
 from datetime import datetime, time
 from typing import Optional
 
-from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Integer, String, Text, Time
+from sqlalchemy import Boolean, Column, DateTime, Float, ForeignKey, Index, Integer, LargeBinary, String, Text, Time
 from sqlalchemy.orm import relationship
 
 from .db import Base
@@ -21,20 +21,48 @@ class User(Base):
 
     embeddings = relationship("Embedding", back_populates="user", cascade="all, delete-orphan")
     access_windows = relationship("AccessWindow", back_populates="user", cascade="all, delete-orphan")
+    templates = relationship("UserTemplate", back_populates="user", cascade="all, delete-orphan")
     events = relationship("EventLog", back_populates="user")
 
+    # Without AUTOINCREMENT SQLite hands the id of a deleted last row to the next insert, and
+    # galleries, bundles and photo paths all key on ids. Same for embeddings and photos.
+    __table_args__ = (Index("ix_users_created_id", "created_at", "id"), {"sqlite_autoincrement": True})
+
 
 class Embedding(Base):
     __tablename__ = "embeddings"
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
-    vector = Column(Text, nullable=False)
+    vector = Column(LargeBinary, nullable=False)  # see services.vector_codec
     model_name = Column(String(64), default="facenet")
+    photo_id = Column(Integer, nullable=True, index=True)  # set by re-embedding, see Photo.embedding_id
     created_at = Column(DateTime, default=datetime.utcnow)
 
     user = relationship("User", back_populates="embeddings")
 
+    __table_args__ = (Index("ix_embeddings_model_id", "model_name", "id"), {"sqlite_autoincrement": True})
+
+
+class UserTemplate(Base):
+    """Per-user, per-model summary of the user's embeddings; see services.template_service."""
+
+    __tablename__ = "user_templates"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    model_name = Column(String(64), nullable=False)
+    centroid = Column(LargeBinary, nullable=False)  # L2-normalized, see services.vector_codec
+    vector_sum = Column(LargeBinary, nullable=False)  # sum of normalized members, for incremental updates
+    embedding_count = Column(Integer, nullable=False, default=0)
+    exemplar_ids = Column(Text, nullable=False, default="[]")  # JSON list of Embedding ids
+    exemplars = Column(LargeBinary, nullable=False)  # float32[len(exemplar_ids), dim], normalized rows
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    user = relationship("User", back_populates="templates")
+
+    __table_args__ = (Index("ix_user_templates_user_model", "user_id", "model_name", unique=True),)
+
 
 class AccessWindow(Base):
     __tablename__ = "access_windows"
@@ -48,6 +76,86 @@ class AccessWindow(Base):
     user = relationship("User", back_populates="access_windows")
 
 
+class AppSetting(Base):
+    """Runtime state that has to survive restarts and be shared by every worker process."""
+
+    __tablename__ = "app_settings"
+
+    key = Column(String(64), primary_key=True)
+    value = Column(Text, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ReembedJob(Base):
+    """Background re-embedding of enrolled photos with another model; see services.reembed_service."""
+
+    __tablename__ = "reembed_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    embedder_name = Column(String(64), nullable=False)  # registry name, e.g. facenet-ts
+    model_name = Column(String(64), nullable=False)  # vector space the new rows are stored under
+    status = Column(String(16), nullable=False, default="pending")  # pending | running | paused | completed | failed | cancelled
+    batch_size = Column(Integer, nullable=False)
+    last_photo_id = Column(Integer, nullable=False, default=0)  # checkpoint, committed with each batch
+    total = Column(Integer, nullable=False, default=0)
+    processed = Column(Integer, nullable=False, default=0)
+    failed = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    finished_at = Column(DateTime, nullable=True)
+
+
+class Blob(Base):
+    """Content-addressed file under data/blobs; photos and captures are hardlinks to it."""
+
+    __tablename__ = "blobs"
+
+    checksum = Column(String(64), primary_key=True)  # sha256 hex
+    size_bytes = Column(Integer, nullable=False)
+    ref_count = Column(Integer, nullable=False, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class Photo(Base):
+    """Enrollment photo stored under data/photos; ``path`` is relative to that directory."""
+
+    __tablename__ = "photos"
+
+    id = Column(Integer, primary_key=True, index=True)
+    # No FK: reindexed files can name a user that no longer exists; sync reports those without an owner.
+    user_id = Column(Integer, nullable=False, index=True)
+    embedding_id = Column(Integer, nullable=True)
+    path = Column(String(512), nullable=False, unique=True)
+    filename = Column(String(255), nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    checksum = Column(String(64), nullable=False, index=True)  # sha256 hex, see Blob
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    captured_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+    __table_args__ = {"sqlite_autoincrement": True}
+
+
+class Capture(Base):
+    """Raw device capture stored under data/captures; ``path`` is relative to that directory."""
+
+    __tablename__ = "captures"
+
+    id = Column(Integer, primary_key=True, index=True)
+    device_id = Column(String(64), nullable=False, index=True)
+    person_name = Column(String(255), nullable=True)
+    path = Column(String(512), nullable=False, unique=True)
+    filename = Column(String(255), nullable=False)
+    size_bytes = Column(Integer, nullable=False)
+    checksum = Column(String(64), nullable=False)
+    width = Column(Integer, nullable=True)
+    height = Column(Integer, nullable=True)
+    captured_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
+
 class EventLog(Base):
     __tablename__ = "event_logs"
 
@@ -61,6 +169,32 @@ class EventLog(Base):
 
     user = relationship("User", back_populates="events")
 
+    # Keyset pagination walks (created_at, id); filters lead with their column.
+    __table_args__ = (
+        Index("ix_event_logs_created_id", "created_at", "id"),
+        Index("ix_event_logs_device_created", "device_id", "created_at", "id"),
+        Index("ix_event_logs_user_created", "user_id", "created_at", "id"),
+        Index("ix_event_logs_status_created", "status", "created_at", "id"),
+    )
+
+
+class EventRollup(Base):
+    """Pre-aggregated event counts per bucket, device, user and status for dashboards."""
+
+    __tablename__ = "event_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String(8), nullable=False)  # hour | day
+    bucket_start = Column(DateTime, nullable=False)
+    device_id = Column(String(64), nullable=True)
+    user_id = Column(Integer, nullable=True)
+    status = Column(String(32), nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    confidence_sum = Column(Float, nullable=False, default=0.0)
+    confidence_count = Column(Integer, nullable=False, default=0)
+
+    __table_args__ = (Index("ix_event_rollups_bucket", "granularity", "bucket_start"),)
+
 
 class DeviceSync(Base):
     __tablename__ = "device_sync"
@@ -69,3 +203,15 @@ class DeviceSync(Base):
     device_id = Column(String(64), unique=True, nullable=False)
     last_sync_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     last_payload_hash = Column(String(128), nullable=True)
+    last_cursor = Column(String(64), nullable=True)
+
+
+class SyncTombstone(Base):
+    """Records deletions so delta syncs can tell devices what to drop."""
+
+    __tablename__ = "sync_tombstones"
+
+    id = Column(Integer, primary_key=True, index=True)
+    entity = Column(String(32), nullable=False)
+    entity_id = Column(String(255), nullable=False)
+    deleted_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
@@ -1,14 +1,98 @@
-from fastapi import APIRouter, Depends
+import json
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 
 from backend.app import schemas
-from backend.app.deps import get_current_user, get_db
-from backend.app.services import event_service
+from backend.app.db import ReadSessionLocal
+from backend.app.deps import get_current_user, get_db, get_read_db
+from backend.app.services import event_service, retention_service
+from backend.app.services.auth_cache import Principal
 
 router = APIRouter(prefix="/events", tags=["events"])
 
 
+def event_filters(
+    device_id: str | None = None,
+    user_id: int | None = None,
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> dict:
+    return {"device_id": device_id, "user_id": user_id, "status": status, "since": since, "until": until}
+
+
 @router.get("/", response_model=list[schemas.EventOut])
-def list_events(db: Session = Depends(get_db), _: str = Depends(get_current_user)):
-    events = event_service.list_events(db)
+def list_events(
+    response: Response,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str | None = None,
+    filters: dict = Depends(event_filters),
+    db: Session = Depends(get_read_db),
+    _: Principal = Depends(get_current_user),
+):
+    """Newest-first events; pass the X-Next-Cursor response header back as ``cursor`` for the next page."""
+    try:
+        events, next_cursor = event_service.list_events(db, limit=limit, cursor=cursor, **filters)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     return [schemas.EventOut.model_validate(ev) for ev in events]
+
+
+@router.get("/export")
+def export_events(filters: dict = Depends(event_filters), _: Principal = Depends(get_current_user)):
+    """Stream every matching event as NDJSON, one object per line."""
+
+    def generate():
+        # The request-scoped session is closed before streaming starts, so use our own.
+        db = ReadSessionLocal()
+        try:
+            for row in event_service.iter_events(db, **filters):
+                yield json.dumps(row, default=_json_default) + "\n"
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="events.ndjson"'},
+    )
+
+
+@router.get("/rollups", response_model=list[schemas.EventRollupOut])
+def list_rollups(
+    granularity: str = Query(default="hour", pattern="^(hour|day)$"),
+    filters: dict = Depends(event_filters),
+    db: Session = Depends(get_read_db),
+    _: Principal = Depends(get_current_user),
+):
+    """Pre-aggregated counts per bucket; only complete buckets are present."""
+    rollups = retention_service.list_rollups(db, granularity=granularity, **filters)
+    return [
+        schemas.EventRollupOut(
+            granularity=r.granularity,
+            bucket_start=r.bucket_start,
+            device_id=r.device_id,
+            user_id=r.user_id,
+            status=r.status,
+            count=r.count,
+            avg_confidence=r.confidence_sum / r.confidence_count if r.confidence_count else None,
+        )
+        for r in rollups
+    ]
+
+
+@router.post("/compact", response_model=schemas.CompactionResult)
+def compact_events(db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
+    """Run rollups and archiving now instead of waiting for the scheduled job."""
+    return retention_service.run_compaction(db)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
@@ -0,0 +1,182 @@
+import json
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from backend.app import models, schemas
+from backend.app.config import get_settings
+from backend.app.deps import get_current_user, get_db, get_embedder_registry, get_read_db, get_reembed_worker
+from backend.app.services import active_model, embedding_service, gallery_service, reembed_service, template_service
+from backend.app.services.vector_codec import decode_vector
+from backend.app.services.auth_cache import Principal
+
+router = APIRouter(prefix="/gallery", tags=["gallery"])
+
+
+@router.get("/models", response_model=schemas.GalleryModelsOut)
+def list_models(db: Session = Depends(get_read_db), _: Principal = Depends(get_current_user)):
+    active = active_model.get_active_model(db)
+    active_name = active.model_name if active else None
+    return schemas.GalleryModelsOut(
+        active_embedder=active.embedder_name if active else None,
+        active_model=active_name,
+        available_embedders=get_embedder_registry().names(),
+        partitions=[
+            schemas.ModelPartitionOut(**partition, active=partition["model_name"] == active_name)
+            for partition in gallery_service.partition_stats(db)
+        ],
+    )
+
+
+@router.delete("/models/{model_name}")
+def delete_model(model_name: str, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
+    """Drop an inactive partition, e.g. the previous model after a cutover."""
+    active = active_model.get_active_model(db)
+    if active is not None and active.model_name == model_name:
+        raise HTTPException(status_code=409, detail="Cannot delete the active model")
+    job = reembed_service.open_job(db)
+    if job is not None and job.model_name == model_name:
+        raise HTTPException(status_code=409, detail=f"Re-embedding job {job.id} is building this model")
+    return {"status": "deleted", "embeddings": embedding_service.remove_model(db, model_name)}
+
+
+def _model_or_active(db: Session, model_name: str | None) -> str:
+    if model_name is not None:
+        return model_name
+    active = active_model.get_active_model(db)
+    if active is None:
+        raise HTTPException(status_code=400, detail="No active model yet; pass model_name")
+    return active.model_name
+
+
+def _template_out(template: models.UserTemplate) -> schemas.TemplateOut:
+    centroid = decode_vector(template.centroid)
+    return schemas.TemplateOut(
+        user_id=template.user_id,
+        model_name=template.model_name,
+        embedding_count=template.embedding_count,
+        exemplar_ids=json.loads(template.exemplar_ids),
+        dim=centroid.shape[0],
+        centroid=centroid.tolist(),
+        updated_at=template.updated_at,
+    )
+
+
+@router.get("/templates/{user_id}", response_model=list[schemas.TemplateOut])
+def get_templates(
+    user_id: int,
+    model_name: str | None = None,
+    db: Session = Depends(get_read_db),
+    _: Principal = Depends(get_current_user),
+):
+    """The user's template per model, or for ``model_name`` only."""
+    return [_template_out(template) for template in template_service.list_templates(db, user_id, model_name)]
+
+
+@router.post("/templates/rebuild")
+def rebuild_templates(
+    model_name: str | None = None, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)
+):
+    """Recompute every template of a model (default: the active one) from its embeddings."""
+    model_name = _model_or_active(db, model_name)
+    return {"model_name": model_name, "templates": template_service.rebuild_model(db, model_name)}
+
+
+@router.post("/templates/{user_id}/prune", response_model=schemas.TemplatePruneResult)
+def prune_template(
+    user_id: int,
+    model_name: str | None = None,
+    max_distance: float | None = Query(default=None, gt=0, le=2),
+    dry_run: bool = False,
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+):
+    """
+    Delete the user's embeddings farther than ``max_distance`` (cosine, default
+    ``template_outlier_distance``) from their centroid, e.g. mislabeled or occluded photos.
+    """
+    if db.get(models.User, user_id) is None:
+        raise HTTPException(status_code=404, detail="User not found")
+    model_name = _model_or_active(db, model_name)
+    max_distance = get_settings().template_outlier_distance if max_distance is None else max_distance
+    pruned = template_service.outliers(db, user_id, model_name, max_distance)
+    if pruned and not dry_run:
+        embedding_service.remove_embeddings(db, [embedding_id for embedding_id, _ in pruned])
+    return schemas.TemplatePruneResult(
+        user_id=user_id,
+        model_name=model_name,
+        max_distance=max_distance,
+        dry_run=dry_run,
+        pruned=[schemas.PrunedEmbedding(embedding_id=embedding_id, distance=distance) for embedding_id, distance in pruned],
+    )
+
+
+@router.post("/reembed", response_model=schemas.ReembedJobOut)
+def start_reembed(
+    payload: schemas.ReembedRequest, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)
+):
+    """
+    Re-embed every enrolled photo with ``embedder_name`` in the background. Matching stays on
+    the current model until the job finishes, then switches over in one transaction.
+    """
+    registry = get_embedder_registry()
+    if payload.embedder_name not in registry.names():
+        raise HTTPException(status_code=400, detail=f"Embedder {payload.embedder_name} is not available")
+    job = reembed_service.open_job(db)
+    if job is not None:
+        raise HTTPException(status_code=409, detail=f"Re-embedding job {job.id} is still {job.status}")
+    model_name = registry.get(payload.embedder_name).name
+    active = active_model.get_active_model(db)
+    if active is not None and active.model_name == model_name:
+        # Variants of one model (e.g. facenet and facenet-ts) share a vector space.
+        raise HTTPException(status_code=400, detail=f"{model_name} is already the active model")
+    job = reembed_service.create_job(db, payload.embedder_name, model_name, payload.batch_size)
+    get_reembed_worker().wake()
+    return job
+
+
+@router.get("/reembed", response_model=list[schemas.ReembedJobOut])
+def list_reembed_jobs(db: Session = Depends(get_read_db), _: Principal = Depends(get_current_user)):
+    return reembed_service.list_jobs(db)
+
+
+def _job_or_404(db: Session, job_id: int):
+    job = reembed_service.get_job(db, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/reembed/{job_id}", response_model=schemas.ReembedJobOut)
+def get_reembed_job(job_id: int, db: Session = Depends(get_read_db), _: Principal = Depends(get_current_user)):
+    return _job_or_404(db, job_id)
+
+
+@router.post("/reembed/{job_id}/pause", response_model=schemas.ReembedJobOut)
+def pause_reembed_job(job_id: int, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
+    job = _job_or_404(db, job_id)
+    if not reembed_service.set_status(db, job, "paused", ("pending", "running")):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job
+
+
+@router.post("/reembed/{job_id}/resume", response_model=schemas.ReembedJobOut)
+def resume_reembed_job(job_id: int, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
+    """Continue from the last checkpoint; also retries a failed job."""
+    job = _job_or_404(db, job_id)
+    other = reembed_service.open_job(db)
+    if other is not None and other.id != job.id:
+        raise HTTPException(status_code=409, detail=f"Re-embedding job {other.id} is still {other.status}")
+    if not reembed_service.set_status(db, job, "pending", ("paused", "failed")):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    get_reembed_worker().wake()
+    return job
+
+
+@router.post("/reembed/{job_id}/cancel", response_model=schemas.ReembedJobOut)
+def cancel_reembed_job(job_id: int, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
+    """Stop the job and drop the partial partition it built."""
+    job = _job_or_404(db, job_id)
+    if not reembed_service.cancel_job(db, job):
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return job
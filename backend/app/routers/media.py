@@ -0,0 +1,40 @@
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+
+from backend.app.deps import get_read_db
+from backend.app.services import derivative_service, media_service
+
+router = APIRouter(prefix="/media", tags=["media"])
+
+
+@router.get("/{variant}/{kind}/{path:path}")
+def get_variant(
+    variant: str,
+    kind: str,
+    path: str,
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Resized variant of ``/{kind}/{path}`` (kind is ``uploads`` or ``captures``), rendered on
+    first request and cached on disk. The ETag derives from the original's checksum.
+    """
+    if variant not in derivative_service.VARIANTS:
+        raise HTTPException(status_code=404, detail="Unknown variant")
+    source = media_service.find_source(db, kind, path)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Image not found")
+    checksum, original = source
+    etag = f'"{checksum[:32]}-{variant}"'
+    headers = {"ETag": etag, "Cache-Control": "public, max-age=86400"}
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    try:
+        file_path = derivative_service.ensure(checksum, original, variant)
+    except FileNotFoundError as exc:
+        raise HTTPException(status_code=404, detail="Image not found") from exc
+    except Exception as exc:
+        raise HTTPException(status_code=422, detail=f"Could not render {variant}: {exc}") from exc
+    # FileResponse adds Last-Modified from the cached file.
+    return FileResponse(file_path, media_type="image/jpeg", headers=headers)
@@ -1,40 +1,144 @@
+import json
+import logging
 import re
 from datetime import datetime
 from pathlib import Path
+from typing import Literal
 
-from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, UploadFile
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from backend.app import models, schemas
-from backend.app.deps import get_db
-from backend.app.services import event_service
-from backend.app.services.sync_service import build_sync_payload
+from backend.app.compression import negotiate
+from backend.app.config import get_settings
+from backend.app.deps import (
+    get_batcher,
+    get_db,
+    get_derivative_worker,
+    get_event_buffer,
+    get_model_name,
+    get_read_db,
+)
+from backend.app.metrics import SYNC_BYTES
+from backend.app.services import bundle_service, event_service, media_service, upload_service
+from backend.app.services.access_service import check_access
+from backend.app.services.gallery_service import get_gallery
+from backend.app.services.template_service import get_template_gallery
+from backend.app.services.batching import MicroBatcher
+from backend.app.services.derivative_service import CAPTURE_VARIANTS, DerivativeWorker
+from backend.app.services.face_detector import NoFaceDetected
+from backend.app.services.inference_executor import InferenceQueueFull
+from backend.app.services.upload_service import StoredFile, UploadTooLarge
+from backend.app.services.sync_service import (
+    build_sync_payload,
+    get_sync_snapshot,
+    invalidate_sync_snapshot,
+    parse_cursor,
+)
 
 router = APIRouter(prefix="/raspberry", tags=["raspberry"])
-CAPTURES_DIR = Path("data") / "captures"
+logger = logging.getLogger(__name__)
+CAPTURES_DIR = media_service.CAPTURES_ROOT
 _SAFE_CHARS = re.compile(r"[^A-Za-z0-9._-]+")
 
 
 @router.get("/sync", response_model=schemas.SyncPayload)
-def sync(device_id: str | None = Header(default=None, alias="X-Device-Id"), db: Session = Depends(get_db)):
-    payload, payload_hash = build_sync_payload(db)
+def sync(
+    since: str | None = Query(default=None, description="Cursor from a previous sync; returns only changes"),
+    device_id: str | None = Header(default=None, alias="X-Device-Id"),
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    accept_encoding: str | None = Header(default=None, alias="Accept-Encoding"),
+    db: Session = Depends(get_db),
+    read_db: Session = Depends(get_read_db),
+):
+    snapshot = None
+    payload = None
+    if since:
+        try:
+            since_at = parse_cursor(since)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="Invalid sync cursor") from exc
+        payload, payload_hash = build_sync_payload(read_db, since=since_at)
+        cursor = payload.cursor
+    else:
+        snapshot = get_sync_snapshot(read_db)
+        payload_hash, cursor = snapshot.payload_hash, snapshot.cursor
+    # Weak: the identity, gzip, br and zstd bodies differ byte for byte but share this tag.
+    etag = f'W/"{payload_hash}"'
     if device_id:
         existing = db.query(models.DeviceSync).filter(models.DeviceSync.device_id == device_id).first()
         if existing:
             existing.last_payload_hash = payload_hash
+            existing.last_cursor = cursor
+            existing.last_sync_at = datetime.utcnow()
             db.add(existing)
         else:
-            db.add(models.DeviceSync(device_id=device_id, last_payload_hash=payload_hash))
+            db.add(models.DeviceSync(device_id=device_id, last_payload_hash=payload_hash, last_cursor=cursor))
         db.commit()
-    response = payload
-    return response
+    if if_none_match and _weak_match(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if snapshot is not None:
+        headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+        encoding = negotiate(accept_encoding)
+        if encoding in snapshot.encoded:
+            # Compressed once per snapshot; the middleware leaves encoded responses alone.
+            headers["Content-Encoding"] = encoding
+            return Response(content=snapshot.encoded[encoding], media_type="application/json", headers=headers)
+        return Response(content=snapshot.body, media_type="application/json", headers=headers)
+    # Already a validated model; dump it directly instead of letting FastAPI re-validate it.
+    body = payload.model_dump_json()
+    SYNC_BYTES.labels("delta", "identity").observe(len(body))
+    return Response(content=body, media_type="application/json", headers={"ETag": etag, "Vary": "Accept-Encoding"})
+
+
+def _weak_match(if_none_match: str, etag: str) -> bool:
+    """RFC 9110 weak comparison, so devices still holding the earlier strong tag get their 304."""
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+@router.get("/embeddings/manifest", response_model=list[schemas.EmbeddingBundleManifest])
+def embedding_manifest(db: Session = Depends(get_read_db)):
+    return bundle_service.get_manifests(db)
+
+
+@router.get("/embeddings/{model_name}/bundle")
+def embedding_bundle(
+    model_name: str,
+    kind: Literal["embeddings", "templates"] = "embeddings",
+    compressed: bool = False,
+    if_none_match: str | None = Header(default=None, alias="If-None-Match"),
+    db: Session = Depends(get_read_db),
+):
+    """
+    Packed embedding matrix for ``model_name`` (layout in services.bundle_service). Supports
+    Range requests; ``compressed=true`` serves the gzip file, which is also range-addressable.
+    """
+    bundle = bundle_service.get_bundles(db).get((model_name, kind))
+    if bundle is None:
+        raise HTTPException(status_code=404, detail=f"No {kind} for this model")
+    etag = f'"{bundle.manifest.version}{"-gz" if compressed else ""}"'
+    headers = {"ETag": etag, "X-Bundle-Version": bundle.manifest.version, "X-Bundle-Checksum": bundle.manifest.checksum}
+    if if_none_match and etag in {tag.strip() for tag in if_none_match.split(",")}:
+        return Response(status_code=304, headers=headers)
+    path = bundle.gzip_path if compressed else bundle.path
+    media_type = "application/gzip" if compressed else "application/octet-stream"
+    return FileResponse(path, media_type=media_type, filename=path.name, headers=headers)
 
 
-@router.post("/events/log", response_model=schemas.EventOut)
+@router.post("/events/log", response_model=schemas.EventOut | schemas.EventQueued)
 def log_event(
     payload: schemas.EventCreate,
+    response: Response,
     db: Session = Depends(get_db),
 ):
+    if payload.occurred_at is None:
+        payload.occurred_at = datetime.utcnow()  # not the later flush time
+    if get_settings().event_write_behind and get_event_buffer().submit(payload):
+        response.status_code = 202
+        return schemas.EventQueued()
     user = None
     if payload.user_identifier:
         user = db.query(models.User).filter(models.User.identifier == payload.user_identifier).first()
@@ -42,6 +146,97 @@ def log_event(
     return schemas.EventOut.model_validate(event)
 
 
+@router.post("/events/batch", response_model=schemas.EventBatchResult)
+def log_events_batch(payload: list[schemas.EventCreate], db: Session = Depends(get_db)):
+    """
+    Store many events in one transaction; devices use this to flush their offline backlog,
+    sending each event's ``occurred_at`` so it is not filed under the upload time.
+    """
+    if len(payload) > get_settings().event_batch_max:
+        raise HTTPException(status_code=413, detail="Too many events in one batch")
+    return schemas.EventBatchResult(accepted=event_service.log_events(db, payload))
+
+
+@router.post("/identify", response_model=schemas.IdentifyResponse)
+async def identify(
+    image: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    batcher: MicroBatcher = Depends(get_batcher),
+):
+    """
+    Embed a camera frame on the server and match it 1:N against every enrolled embedding,
+    or against per-user templates with ``match_mode=templates``.
+    With ``face_mode=all`` every face in the frame is matched and the best permitted one wins.
+    """
+    content = await upload_service.read_limited(image)
+    if not content:
+        raise HTTPException(status_code=400, detail="Uploaded image is empty")
+    settings = get_settings()
+    threshold = settings.threshold
+    try:
+        if settings.face_mode == "all":
+            vectors = await batcher.executor.embed_faces(batcher.embedder, content)
+        else:
+            vectors = [await batcher.embed(content)]
+    except InferenceQueueFull:
+        raise
+    except NoFaceDetected:
+        return schemas.IdentifyResponse(
+            matched=False, access_granted=False, reason="no_face", threshold=threshold, face_count=0
+        )
+    except Exception as exc:
+        raise HTTPException(status_code=400, detail=f"Could not process image: {exc}") from exc
+
+    if settings.match_mode == "templates":
+        gallery = get_template_gallery(get_model_name())
+    else:
+        gallery = get_gallery(get_model_name())
+    matches = sorted(
+        (m for m in (gallery.search(db, vector) for vector in vectors) if m is not None),
+        key=lambda m: m.distance,
+    )
+    best: schemas.IdentifyResponse | None = None
+    for match in matches:
+        if match.distance > threshold:
+            break
+        user = db.get(models.User, match.user_id)
+        if not user:
+            continue
+        granted, reason = check_access(user)
+        candidate = schemas.IdentifyResponse(
+            matched=True,
+            access_granted=granted,
+            reason=reason,
+            distance=match.distance,
+            threshold=threshold,
+            user_id=user.id,
+            identifier=user.identifier,
+            full_name=user.full_name,
+            face_count=len(vectors),
+        )
+        if granted:
+            return candidate
+        best = best or candidate
+    if best is not None:
+        return best
+    return schemas.IdentifyResponse(
+        matched=False,
+        access_granted=False,
+        reason="unknown",
+        distance=matches[0].distance if matches else None,
+        threshold=threshold,
+        face_count=len(vectors),
+    )
+
+
+def _record_capture(db: Session, device_slug: str, stored: StoredFile, person_name: str, ts: datetime) -> None:
+    # A second capture in the same second for the same person replaces the file, so replace its row too.
+    cleanup = media_service.forget_capture(db, stored.path)
+    media_service.record_capture(db, device_slug, stored, person_name, ts)
+    db.commit()
+    cleanup.run(db)
+
+
 def _sanitize(value: str, fallback: str) -> str:
     cleaned = _SAFE_CHARS.sub("_", value.strip())
     return cleaned or fallback
@@ -53,6 +248,8 @@ async def upload_capture(
     image: UploadFile = File(...),
     captured_at: datetime | None = Form(None),
     device_id: str | None = Header(default=None, alias="X-Device-Id"),
+    db: Session = Depends(get_db),
+    derivatives: DerivativeWorker = Depends(get_derivative_worker),
 ):
     """
     Accept a raw photo + metadata from Raspberry Pi without creating embeddings on the server.
@@ -64,38 +261,41 @@ async def upload_capture(
     device_dir = CAPTURES_DIR / device_slug
     device_dir.mkdir(parents=True, exist_ok=True)
 
-    try:
-        content = await image.read()
-    except Exception as exc:
-        raise HTTPException(status_code=400, detail=f"Could not read uploaded image: {exc}") from exc
-    if not content:
-        raise HTTPException(status_code=400, detail="Uploaded image is empty")
-
     ts = captured_at or datetime.utcnow()
     ext = Path(image.filename or "").suffix or ".jpg"
     filename = f"{ts.strftime('%Y%m%dT%H%M%S')}_{person_slug}{ext}"
     out_path = device_dir / filename
     try:
-        out_path.write_bytes(content)
+        stored = await upload_service.stream_to_file(image, out_path)
+    except UploadTooLarge:
+        raise
     except Exception as exc:
         raise HTTPException(status_code=500, detail=f"Failed to store image: {exc}") from exc
+    if not stored.size_bytes:
+        await upload_service.discard(out_path)
+        raise HTTPException(status_code=400, detail="Uploaded image is empty")
 
-    rel_url = f"/captures/{device_slug}/{filename}"
+    rel_url = media_service.capture_url(f"{device_slug}/{filename}")
     meta = {
         "person_name": person_name,
         "captured_at": ts.isoformat(),
         "device_id": device_id,
         "filename": filename,
+        "sha256": stored.checksum,
     }
     try:
-        (out_path.with_suffix(out_path.suffix + ".json")).write_text(__import__("json").dumps(meta))
+        sidecar = out_path.with_suffix(out_path.suffix + ".json")
+        await run_in_threadpool(upload_service.save_bytes, sidecar, json.dumps(meta).encode())
     except Exception:
         logger.warning("Failed to store capture metadata for %s", out_path)
+    await run_in_threadpool(_record_capture, db, device_slug, stored, person_name, ts)
+    derivatives.submit(stored.checksum, stored.path, CAPTURE_VARIANTS)
+    invalidate_sync_snapshot()
     return schemas.CaptureUploadResponse(
         device_id=device_id,
         person_name=person_name,
         captured_at=ts,
         filename=filename,
         url=rel_url,
-        size_bytes=len(content),
+        size_bytes=stored.size_bytes,
     )
@@ -0,0 +1,44 @@
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+
+from backend.app.deps import (
+    get_current_user,
+    get_derivative_worker,
+    get_event_buffer,
+    get_inference_executor,
+    get_read_db,
+    get_reembed_worker,
+)
+from backend.app.services import auth_cache, blob_service
+
+router = APIRouter(prefix="/stats", tags=["stats"], dependencies=[Depends(get_current_user)])
+
+
+@router.get("/inference")
+def inference_stats():
+    return get_inference_executor().stats()
+
+
+@router.get("/events")
+def event_buffer_stats():
+    return get_event_buffer().stats()
+
+
+@router.get("/auth-cache")
+def auth_cache_stats():
+    return auth_cache.stats()
+
+
+@router.get("/storage")
+def storage_stats(db: Session = Depends(get_read_db)):
+    return blob_service.stats(db)
+
+
+@router.get("/derivatives")
+def derivative_stats():
+    return get_derivative_worker().stats()
+
+
+@router.get("/reembed")
+def reembed_stats():
+    return get_reembed_worker().stats()
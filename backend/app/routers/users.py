@@ -1,20 +1,35 @@
-import json
+import hashlib
 from pathlib import Path
 from typing import List
 
-from fastapi import APIRouter, Depends, File, Form, HTTPException, UploadFile
+import numpy as np
+from fastapi import APIRouter, Depends, File, Form, Header, HTTPException, Query, Response, UploadFile
+from fastapi.responses import ORJSONResponse
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
 from backend.app import models, schemas
-from backend.app.deps import get_current_user, get_db, get_embedder
-from backend.app.services import embedding_service, user_service
-from backend.app.services.model_registry import BaseEmbedder
+from backend.app.deps import (
+    get_batcher,
+    get_current_user,
+    get_db,
+    get_derivative_worker,
+    get_model_name,
+    get_read_db,
+)
+from backend.app.services import bundle_service, embedding_service, media_service, upload_service, user_service
+from backend.app.services.auth_cache import Principal
+from backend.app.services.batching import MicroBatcher
+from backend.app.services.derivative_service import PHOTO_VARIANTS, DerivativeWorker
+from backend.app.services.face_detector import NoFaceDetected
+from backend.app.services.inference_executor import InferenceQueueFull
+from backend.app.services.sync_service import invalidate_sync_snapshot
 
 router = APIRouter(prefix="/users", tags=["users"])
 
 
 @router.post("/create", response_model=schemas.UserOut)
-def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
+def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
     existing = user_service.get_user_by_identifier(db, payload.identifier)
     if existing:
         raise HTTPException(status_code=400, detail="User identifier already exists")
@@ -22,8 +37,20 @@ def create_user(payload: schemas.UserCreate, db: Session = Depends(get_db), _: m
 
 
 @router.get("/", response_model=list[schemas.UserOut])
-def list_users(db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
-    return user_service.list_users(db)
+def list_users(
+    limit: int | None = Query(default=None, ge=1, le=5000),
+    cursor: str | None = None,
+    db: Session = Depends(get_read_db),
+    _: Principal = Depends(get_current_user),
+):
+    """All users, or a page of ``limit`` with the next cursor in the X-Next-Cursor header."""
+    try:
+        rows, next_cursor = user_service.list_users(db, limit=limit, cursor=cursor)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid cursor") from exc
+    # Rows come straight from a column query matching UserOut, so skip re-validation.
+    headers = {"X-Next-Cursor": next_cursor} if next_cursor else None
+    return ORJSONResponse(rows, headers=headers)
 
 
 @router.put("/update/{user_id}", response_model=schemas.UserOut)
@@ -31,7 +58,7 @@ def update_user(
     user_id: int,
     payload: schemas.UserUpdate,
     db: Session = Depends(get_db),
-    _: models.User = Depends(get_current_user),
+    _: Principal = Depends(get_current_user),
 ):
     user = db.get(models.User, user_id)
     if not user:
@@ -40,7 +67,7 @@ def update_user(
 
 
 @router.delete("/delete/{user_id}")
-def delete_user(user_id: int, db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
+def delete_user(user_id: int, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -53,62 +80,135 @@ async def upload_photo(
     user_id: int = Form(...),
     files: List[UploadFile] = File(...),
     db: Session = Depends(get_db),
-    embedder: BaseEmbedder = Depends(get_embedder),
-    _: models.User = Depends(get_current_user),
+    batcher: MicroBatcher = Depends(get_batcher),
+    derivatives: DerivativeWorker = Depends(get_derivative_worker),
+    _: Principal = Depends(get_current_user),
 ):
-    user = db.get(models.User, user_id)
+    user = await run_in_threadpool(db.get, models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
+    # The form is already parsed (BodyLimitMiddleware bounds it); this applies the per-file limit.
+    contents = [await upload_service.read_limited(file) for file in files]
+    filenames = [file.filename for file in files]
+    model_name = get_model_name()
+    checksums = [hashlib.sha256(content).hexdigest() for content in contents]
+    # Identical bytes were embedded before: reuse that vector instead of running the model again.
+    known = await run_in_threadpool(media_service.embedded_photos, db, checksums, model_name)
+    reused = [_reusable(known.get(checksum, []), user.id) for checksum in checksums]
+    pending = [i for i, item in enumerate(reused) if item is None]
+    # All new files go through the batcher together, so enrollment runs as one forward pass.
+    results = await batcher.embed_many([contents[i] for i in pending], return_exceptions=True)
+    for i, result in zip(pending, results):
+        if isinstance(result, InferenceQueueFull):
+            raise result
+        if isinstance(result, NoFaceDetected):
+            raise HTTPException(status_code=422, detail=f"No face detected in {filenames[i]}")
+        if isinstance(result, Exception):
+            raise HTTPException(status_code=400, detail=f"Could not process image {filenames[i]}: {result}")
+    vectors: list = list(reused)
+    for i, result in zip(pending, results):
+        vectors[i] = result
+    # DB commits and disk writes block, so keep them off the event loop as well.
+    return await run_in_threadpool(
+        _store_photos, db, user.id, filenames, contents, vectors, model_name, derivatives
+    )
+
+
+def _reusable(candidates: list[tuple[int, models.Embedding]], user_id: int) -> models.Embedding | None:
+    """Prefer the user's own embedding of these bytes, else anyone's."""
+    for owner_id, embedding in candidates:
+        if owner_id == user_id:
+            return embedding
+    return candidates[0][1] if candidates else None
+
+
+def _store_photos(
+    db: Session,
+    user_id: int,
+    filenames: list[str | None],
+    contents: list[bytes],
+    vectors: list[list[float] | models.Embedding],
+    model_name: str,
+    derivatives: DerivativeWorker,
+) -> list[schemas.EmbeddingOut]:
+    """
+    ``vectors`` holds fresh model output or an existing Embedding for bytes seen before.
+    Re-enrolling a photo the user already has returns the existing embedding unchanged.
+    """
     stored: list[schemas.EmbeddingOut] = []
-    photo_dir = Path("data/photos") / f"user_{user_id}"
+    saved_files: list[upload_service.StoredFile] = []
+    photo_dir = media_service.PHOTOS_ROOT / f"user_{user_id}"
     photo_dir.mkdir(parents=True, exist_ok=True)
-    for file in files:
-        content = await file.read()
-        vector = embedder.generate_embedding(content)
-        emb = embedding_service.add_embedding(db, user.id, vector, embedder.name)
+    for filename, content, vector in zip(filenames, contents, vectors):
+        if isinstance(vector, models.Embedding):
+            if vector.user_id == user_id:
+                stored.append(_embedding_out(vector, embedding_service.get_vector(vector).tolist()))
+                continue
+            vector = embedding_service.get_vector(vector).tolist()
+        emb = embedding_service.add_embedding(db, user_id, vector, model_name)
         # Save photo for preview
-        ext = Path(file.filename or "").suffix or ".jpg"
-        out_path = photo_dir / f"{emb.id}{ext}"
-        out_path.write_bytes(content)
-        stored.append(
-            schemas.EmbeddingOut(
-                id=emb.id,
-                model_name=emb.model_name,
-                created_at=emb.created_at,
-                vector=vector,
-            )
-        )
+        ext = Path(filename or "").suffix or ".jpg"
+        saved = upload_service.save_bytes(photo_dir / f"{emb.id}{ext}", content)
+        saved_files.append(saved)
+        media_service.record_photo(db, user_id, saved, embedding_id=emb.id)
+        stored.append(_embedding_out(emb, vector))
+    db.commit()
+    for saved in saved_files:
+        derivatives.submit(saved.checksum, saved.path, PHOTO_VARIANTS)
+    invalidate_sync_snapshot()
     return stored
 
 
-@router.get("/get-embeddings/{user_id}", response_model=list[schemas.EmbeddingOut])
-def get_embeddings(user_id: int, db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
+def _embedding_out(emb: models.Embedding, vector: list[float]) -> schemas.EmbeddingOut:
+    return schemas.EmbeddingOut(id=emb.id, model_name=emb.model_name, created_at=emb.created_at, vector=vector)
+
+
+@router.get(
+    "/get-embeddings/{user_id}",
+    response_model=list[schemas.EmbeddingOut],
+    responses={200: {"content": {"application/octet-stream": {}}}},
+)
+def get_embeddings(
+    user_id: int,
+    model_name: str | None = None,
+    format: str = Query(default="json", pattern="^(json|binary)$"),
+    accept: str | None = Header(default=None),
+    db: Session = Depends(get_db),
+    _: Principal = Depends(get_current_user),
+):
+    """
+    JSON by default. ``format=binary`` or ``Accept: application/octet-stream`` returns the
+    packed float32 layout of services.bundle_service for a single model.
+    """
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     embeddings = embedding_service.get_embeddings_for_user(db, user.id)
+    if model_name is not None:
+        embeddings = [emb for emb in embeddings if emb.model_name == model_name]
+    if format == "binary" or (accept and "application/octet-stream" in accept):
+        models_present = {emb.model_name for emb in embeddings}
+        if len(models_present) > 1:
+            raise HTTPException(status_code=400, detail="Embeddings span several models; pass model_name")
+        name = model_name or next(iter(models_present), "")
+        vectors = [embedding_service.get_vector(emb) for emb in embeddings]
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+        body = bundle_service.pack(name, [emb.id for emb in embeddings], [user.id] * len(embeddings), matrix, "float32")
+        return Response(content=body, media_type="application/octet-stream")
     return [
         schemas.EmbeddingOut(
             id=emb.id,
             model_name=emb.model_name,
             created_at=emb.created_at,
-            vector=json.loads(emb.vector),
+            vector=embedding_service.get_vector(emb).tolist(),
         )
         for emb in embeddings
     ]
 
 
 @router.get("/photos/{user_id}", response_model=list[str])
-def list_photos(user_id: int, db: Session = Depends(get_db), _: models.User = Depends(get_current_user)):
+def list_photos(user_id: int, db: Session = Depends(get_db), _: Principal = Depends(get_current_user)):
     user = db.get(models.User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    photo_dir = Path("data/photos") / f"user_{user_id}"
-    if not photo_dir.exists():
-        return []
-    base_url = "/uploads"
-    files = []
-    for path in photo_dir.iterdir():
-        if path.is_file():
-            files.append(f"{base_url}/user_{user_id}/{path.name}")
-    return files
+    return media_service.list_photo_urls(db, user_id)
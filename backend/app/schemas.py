@@ -49,6 +49,7 @@ class UserUpdate(BaseModel):
     full_name: Optional[str] = None
     password: Optional[str] = None
     is_active: Optional[bool] = None
+    expires_at: Optional[datetime] = None
     access_windows: list[AccessWindowCreate] | None = None
 
 
@@ -78,6 +79,15 @@ class EventCreate(BaseModel):
     message: Optional[str] = None
     device_id: Optional[str] = None
     confidence: Optional[float] = None
+    occurred_at: Optional[datetime] = None  # when the device saw it; a replayed backlog keeps its times
+
+
+class EventQueued(BaseModel):
+    status: str = "queued"
+
+
+class EventBatchResult(BaseModel):
+    accepted: int
 
 
 class EventOut(BaseModel):
@@ -93,11 +103,134 @@ class EventOut(BaseModel):
         from_attributes = True
 
 
+class EventRollupOut(BaseModel):
+    granularity: str
+    bucket_start: datetime
+    device_id: Optional[str]
+    user_id: Optional[int]
+    status: str
+    count: int
+    avg_confidence: Optional[float] = None
+
+
+class CompactionResult(BaseModel):
+    hourly_buckets: int
+    daily_buckets: int
+    archived_events: int
+    archive_files: list[str]
+
+
+class EmbeddingBundleManifest(BaseModel):
+    model_name: str
+    kind: str = "embeddings"  # embeddings | templates
+    version: str
+    checksum: str
+    dtype: str
+    dim: int
+    count: int
+    size_bytes: int
+    gzip_size_bytes: int
+    url: str
+    gzip_url: str
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ModelPartitionOut(BaseModel):
+    model_name: str
+    embeddings: int
+    users: int
+    dim: int
+    active: bool
+
+    class Config:
+        protected_namespaces = ()
+
+
+class GalleryModelsOut(BaseModel):
+    active_embedder: str | None
+    active_model: str | None
+    available_embedders: list[str]
+    partitions: list[ModelPartitionOut]
+
+
+class TemplateOut(BaseModel):
+    user_id: int
+    model_name: str
+    embedding_count: int
+    exemplar_ids: list[int]
+    dim: int
+    centroid: list[float]
+    updated_at: datetime
+
+    class Config:
+        protected_namespaces = ()
+
+
+class PrunedEmbedding(BaseModel):
+    embedding_id: int
+    distance: float
+
+
+class TemplatePruneResult(BaseModel):
+    user_id: int
+    model_name: str
+    max_distance: float
+    dry_run: bool
+    pruned: list[PrunedEmbedding]
+
+    class Config:
+        protected_namespaces = ()
+
+
+class ReembedRequest(BaseModel):
+    embedder_name: str
+    batch_size: int | None = Field(default=None, ge=1, le=1024)
+
+
+class ReembedJobOut(BaseModel):
+    id: int
+    embedder_name: str
+    model_name: str
+    status: str
+    batch_size: int
+    last_photo_id: int
+    total: int
+    processed: int
+    failed: int
+    error: str | None = None
+    created_at: datetime
+    updated_at: datetime
+    finished_at: datetime | None = None
+
+    class Config:
+        from_attributes = True
+        protected_namespaces = ()
+
+
+class SyncTombstoneOut(BaseModel):
+    entity: str
+    entity_id: str
+    deleted_at: datetime
+
+    class Config:
+        from_attributes = True
+
+
 class SyncPayload(BaseModel):
     photos: list["PhotoMeta"]
     users: list[UserOut]
+    # In a delta (full=False) this is the complete window set of every user in `users`.
     access_windows: list[AccessWindowOut]
     config: dict
+    full: bool = True
+    cursor: str | None = None
+    deleted: list[SyncTombstoneOut] = []
+    # Fetch a bundle only when its version differs from the one the device already holds.
+    embedding_bundles: list[EmbeddingBundleManifest] = []
+    # Bundle to match against; others are partitions of a model being migrated to or from.
+    active_model: str | None = None
 
 
 class CaptureUploadResponse(BaseModel):
@@ -109,11 +242,24 @@ class CaptureUploadResponse(BaseModel):
     size_bytes: int
 
 
+class IdentifyResponse(BaseModel):
+    matched: bool
+    access_granted: bool
+    reason: str
+    distance: float | None = None
+    threshold: float
+    user_id: int | None = None
+    identifier: str | None = None
+    full_name: str | None = None
+    face_count: int = 1
+
+
 class PhotoMeta(BaseModel):
     user_id: int | None = None
     person_name: str | None = None
     filename: str
     url: str
+    original_url: str | None = None
     captured_at: datetime | None = None
 
 
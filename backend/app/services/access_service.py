@@ -0,0 +1,31 @@
+from datetime import datetime
+
+from backend.app import models
+
+
+def is_within_window(window: models.AccessWindow, at: datetime) -> bool:
+    if window.day_of_week != at.weekday():
+        return False
+    now = at.time()
+    if window.start_time <= window.end_time:
+        return window.start_time <= now <= window.end_time
+    # Overnight window, e.g. 22:00-06:00.
+    return now >= window.start_time or now <= window.end_time
+
+
+def check_access(user: models.User, at: datetime | None = None) -> tuple[bool, str]:
+    """
+    Decide whether an identified user may pass right now.
+    Users without access windows are allowed at any time.
+    """
+    if not user.is_active:
+        return False, "inactive"
+    if user.expires_at and user.expires_at <= datetime.utcnow():
+        return False, "expired"
+    windows = user.access_windows
+    if not windows:
+        return True, "granted"
+    local_now = at or datetime.now()
+    if any(is_within_window(w, local_now) for w in windows):
+        return True, "granted"
+    return False, "outside_access_window"
@@ -0,0 +1,47 @@
+from dataclasses import dataclass
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.app import models
+
+EMBEDDER_KEY = "active_embedder"
+MODEL_KEY = "active_model"
+
+
+@dataclass(frozen=True)
+class ActiveModel:
+    embedder_name: str  # registry name that embeds new enrollments and probes
+    model_name: str  # gallery partition matched against
+
+
+def get_active_model(db: Session) -> ActiveModel | None:
+    rows = dict(
+        db.query(models.AppSetting.key, models.AppSetting.value).filter(
+            models.AppSetting.key.in_((EMBEDDER_KEY, MODEL_KEY))
+        )
+    )
+    if EMBEDDER_KEY not in rows or MODEL_KEY not in rows:
+        return None
+    return ActiveModel(embedder_name=rows[EMBEDDER_KEY], model_name=rows[MODEL_KEY])
+
+
+def set_active_model(db: Session, embedder_name: str, model_name: str) -> None:
+    """Stage both keys; the caller commits, so a cutover lands together with its job update."""
+    for key, value in ((EMBEDDER_KEY, embedder_name), (MODEL_KEY, model_name)):
+        row = db.get(models.AppSetting, key)
+        if row is None:
+            db.add(models.AppSetting(key=key, value=value))
+        else:
+            row.value = value
+
+
+def stored_model_name(db: Session) -> str | None:
+    """The model that computed most of the stored embeddings, or None when there are none."""
+    row = (
+        db.query(models.Embedding.model_name)
+        .group_by(models.Embedding.model_name)
+        .order_by(func.count(models.Embedding.id).desc())
+        .first()
+    )
+    return row[0] if row else None
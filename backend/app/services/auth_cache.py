@@ -0,0 +1,137 @@
+"""
+In-process caches for authentication: decoded JWT payloads keyed by the token's SHA-256
+(kept until the token's ``exp``) and resolved principals keyed by subject (kept for
+``auth_cache_ttl_sec``). Together they let protected endpoints skip both signature checks
+and the users query on repeat calls. ``user_service`` drops principals on update/delete;
+other worker processes pick up changes when the TTL runs out.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Hashable
+
+from backend.app.config import get_settings
+
+
+@dataclass(frozen=True)
+class Principal:
+    """Detached snapshot of the authenticated user; safe to share across requests."""
+
+    id: int
+    identifier: str
+    full_name: str
+    is_active: bool
+    expires_at: datetime | None
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        return cls(
+            id=user.id,
+            identifier=user.identifier,
+            full_name=user.full_name,
+            is_active=user.is_active,
+            expires_at=user.expires_at,
+        )
+
+
+class TTLCache:
+    """Thread-safe LRU map whose entries also expire at a per-entry monotonic deadline."""
+
+    def __init__(self, maxsize: int, ttl_sec: float):
+        self.maxsize = max(1, maxsize)
+        self.ttl_sec = ttl_sec
+        self._data: OrderedDict[Hashable, tuple[float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def get(self, key: Hashable) -> Any | None:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            deadline, value = entry
+            if deadline <= now:
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl_sec: float | None = None) -> None:
+        ttl = self.ttl_sec if ttl_sec is None else min(ttl_sec, self.ttl_sec)
+        if ttl <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
+
+
+_settings = get_settings()
+principal_cache = TTLCache(_settings.auth_cache_size, _settings.auth_cache_ttl_sec)
+# Bounded by each token's own exp; the TTL here is only a ceiling.
+token_cache = TTLCache(_settings.token_cache_size, _settings.refresh_exp_minutes * 60)
+
+
+def token_key(token: str) -> str:
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def get_token_payload(token: str) -> dict | None:
+    return token_cache.get(token_key(token))
+
+
+def remember_token_payload(token: str, payload: dict) -> None:
+    exp = payload.get("exp")
+    if exp is None:
+        return
+    token_cache.set(token_key(token), payload, ttl_sec=float(exp) - time.time())
+
+
+def get_principal(identifier: str) -> Principal | None:
+    return principal_cache.get(identifier)
+
+
+def remember_principal(principal: Principal) -> None:
+    principal_cache.set(principal.identifier, principal)
+
+
+def invalidate_principal(identifier: str) -> None:
+    principal_cache.invalidate(identifier)
+
+
+def stats() -> dict:
+    return {"principals": principal_cache.stats(), "tokens": token_cache.stats()}
@@ -0,0 +1,72 @@
+import asyncio
+import logging
+
+from backend.app.services.inference_executor import InferenceExecutor, InferenceQueueFull
+from backend.app.services.model_registry import BaseEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent embedding requests into batched ``generate_embeddings`` calls.
+    A batch is dispatched when ``max_batch_size`` images are waiting or ``max_wait_ms``
+    after the first one arrived, whichever comes first.
+    """
+
+    def __init__(
+        self,
+        embedder: BaseEmbedder,
+        executor: InferenceExecutor,
+        max_batch_size: int = 16,
+        max_wait_ms: int = 5,
+    ):
+        self.embedder = embedder
+        self.executor = executor
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait_ms = max_wait_ms
+        self._pending: list[tuple[bytes, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+
+    async def embed(self, image: bytes) -> list[float]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future))
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_ms / 1000, self._flush)
+        return await future
+
+    async def embed_many(self, images: list[bytes], return_exceptions: bool = False) -> list:
+        return list(await asyncio.gather(*(self.embed(image) for image in images), return_exceptions=return_exceptions))
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._pending:
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            asyncio.ensure_future(self._run(batch))
+
+    async def _run(self, batch: list[tuple[bytes, asyncio.Future]]) -> None:
+        try:
+            vectors = await self._call([image for image, _ in batch])
+        except Exception as exc:
+            # A full queue is not the images' fault, so fail fast instead of retrying.
+            if len(batch) == 1 or isinstance(exc, InferenceQueueFull):
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                return
+            # Retry one by one so a single unreadable image only fails its own request.
+            logger.debug("Batch of %d images failed, retrying individually", len(batch), exc_info=True)
+            await asyncio.gather(*(self._run([item]) for item in batch))
+            return
+        for (_, future), vector in zip(batch, vectors):
+            if not future.done():
+                future.set_result(vector)
+
+    async def _call(self, images: list[bytes]) -> list[list[float]]:
+        return await self.executor.embed(self.embedder, images)
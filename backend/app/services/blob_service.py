@@ -0,0 +1,138 @@
+"""
+Content-addressed storage for photos and captures. Every distinct file is kept once under
+``data/blobs/<sha[:2]>/<sha>`` and the per-user / per-device paths (which the existing
+``/uploads`` and ``/captures`` URLs serve) are hardlinks to it. ``Blob.ref_count`` counts
+the index rows pointing at a blob; the blob file is removed when the last one goes.
+"""
+import logging
+import os
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from backend.app import models
+from backend.app.services import derivative_service
+from backend.app.services.upload_service import StoredFile
+
+logger = logging.getLogger(__name__)
+
+BLOBS_ROOT = Path("data") / "blobs"
+
+
+def blob_path(checksum: str) -> Path:
+    return BLOBS_ROOT / checksum[:2] / checksum
+
+
+def adopt(db: Session, stored: StoredFile) -> bool:
+    """
+    Deduplicate a freshly written file: the first copy of some content becomes the blob,
+    later copies are replaced by a hardlink to it. Returns False when the filesystem has
+    no hardlinks, in which case the file is kept as a plain copy and not counted.
+    """
+    target = blob_path(stored.checksum)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(stored.path, target)
+    except FileExistsError:
+        if not os.path.samefile(stored.path, target):
+            tmp = stored.path.with_name(f".{stored.path.name}.{uuid.uuid4().hex}.link")
+            try:
+                os.link(target, tmp)
+                os.replace(tmp, stored.path)
+            except OSError:
+                Path(tmp).unlink(missing_ok=True)
+                logger.debug("Could not link %s to blob %s", stored.path, stored.checksum, exc_info=True)
+                return False
+    except OSError:
+        logger.debug("Hardlinks unavailable for %s", stored.path, exc_info=True)
+        return False
+    _increment(db, stored)
+    return True
+
+
+def _increment(db: Session, stored: StoredFile) -> None:
+    bump = (
+        update(models.Blob)
+        .where(models.Blob.checksum == stored.checksum)
+        .values(ref_count=models.Blob.ref_count + 1)
+    )
+    if db.execute(bump).rowcount:
+        return
+    try:
+        # A concurrent upload of the same bytes may insert first; fall back to the update.
+        with db.begin_nested():
+            db.add(models.Blob(checksum=stored.checksum, size_bytes=stored.size_bytes, ref_count=1))
+    except IntegrityError:
+        db.execute(bump)
+
+
+@dataclass
+class Cleanup:
+    """
+    Files whose index rows a transaction dropped. They are only removed once that transaction
+    has committed, so a failed commit leaves rows and files in place together.
+    """
+
+    paths: list[Path] = field(default_factory=list)
+    blobs: list[str] = field(default_factory=list)  # checksums whose last reference went
+
+    def extend(self, other: "Cleanup") -> None:
+        self.paths.extend(other.paths)
+        self.blobs.extend(other.blobs)
+
+    def run(self, db: Session) -> None:
+        """Call after the commit."""
+        for path in self.paths:
+            path.unlink(missing_ok=True)
+        purge(db, self.blobs)
+
+
+def release(db: Session, checksums) -> Cleanup:
+    """Drop one reference per checksum. The caller commits, then runs the returned cleanup."""
+    cleanup = Cleanup()
+    for checksum in checksums:
+        blob = db.get(models.Blob, checksum)
+        if blob is None:
+            continue
+        blob.ref_count -= 1
+        if blob.ref_count > 0:
+            continue
+        db.delete(blob)
+        cleanup.blobs.append(checksum)
+    # Sessions do not autoflush; make the deletes visible to a following adopt() of the same content.
+    db.flush()
+    return cleanup
+
+
+def purge(db: Session, checksums) -> int:
+    """
+    Unlink released blob files and their derivatives, the face crops and thumbnails of people
+    who may have been removed. Content adopted again since the release keeps its files.
+    """
+    removed = 0
+    for checksum in checksums:
+        if db.get(models.Blob, checksum) is None:
+            blob_path(checksum).unlink(missing_ok=True)
+            derivative_service.remove(checksum)
+            removed += 1
+    return removed
+
+
+def stats(db: Session) -> dict:
+    count, stored_bytes, refs, referenced_bytes = db.query(
+        func.count(models.Blob.checksum),
+        func.coalesce(func.sum(models.Blob.size_bytes), 0),
+        func.coalesce(func.sum(models.Blob.ref_count), 0),
+        func.coalesce(func.sum(models.Blob.size_bytes * models.Blob.ref_count), 0),
+    ).one()
+    return {
+        "blobs": count,
+        "references": refs,
+        "stored_bytes": stored_bytes,
+        "referenced_bytes": referenced_bytes,
+        "saved_bytes": referenced_bytes - stored_bytes,
+    }
@@ -0,0 +1,220 @@
+"""
+Packed embedding bundles for edge devices, one per embedding model, so a device can match
+locally without downloading photos and re-running the model.
+
+Layout (little-endian):
+
+    header   <4sHBxIIH   magic b"FEB1", format version, dtype code (1=float32, 2=float16),
+                         pad, dim, count, model name length
+    model    utf-8 model name, zero-padded to an 8-byte boundary
+    ids      int64[count]        embedding ids
+    users    int64[count]        user ids
+    matrix   dtype[count, dim]   raw (not normalized) embeddings, row-major
+    trailer  32 bytes            sha256 of everything above
+
+The content version is the first 16 hex characters of that checksum. Files are written as
+``<model>-<version>.bin`` plus a gzip copy, and both are served with Range support, so
+interrupted downloads can resume.
+
+Each model also gets a ``templates`` bundle in the same layout, built from
+services.template_service: per user one centroid row (embedding id 0) followed by its
+exemplar rows. Devices matching against it scan users rather than photos.
+"""
+import json
+import gzip
+import hashlib
+import re
+import struct
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.app import models, schemas
+from backend.app.config import get_settings
+from backend.app.services import generation
+from backend.app.services.upload_service import save_bytes
+from backend.app.services.vector_codec import decode_vector
+
+MAGIC = b"FEB1"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHBxIIH")
+_DTYPE_CODES = {"float32": (1, np.dtype("<f4")), "float16": (2, np.dtype("<f2"))}
+_SAFE_NAME = re.compile(r"[^A-Za-z0-9._-]+")
+# Older files are kept so devices mid-download of the previous version can finish.
+_KEEP_VERSIONS = 2
+
+
+@dataclass(frozen=True)
+class Bundle:
+    fingerprint: tuple
+    manifest: schemas.EmbeddingBundleManifest
+    path: Path
+    gzip_path: Path
+
+
+_bundles: dict[tuple[str, str], Bundle] = {}
+# (write generations, bundles, manifests) as of the last check, see services.generation.
+_checked: tuple | None = None
+_lock = threading.Lock()
+
+
+def bundle_root() -> Path:
+    return Path(get_settings().embeddings_dir) / "bundles"
+
+
+def pack(model_name: str, embedding_ids, user_ids, matrix: np.ndarray, dtype: str = "float16") -> bytes:
+    code, np_dtype = _DTYPE_CODES[dtype]
+    matrix = np.ascontiguousarray(matrix, dtype=np_dtype)
+    count, dim = matrix.shape if matrix.size else (len(embedding_ids), 0)
+    name = model_name.encode()
+    head = HEADER.pack(MAGIC, FORMAT_VERSION, code, dim, count, len(name))
+    name += b"\0" * (-(len(head) + len(name)) % 8)
+    body = b"".join(
+        (
+            head,
+            name,
+            np.asarray(embedding_ids, dtype="<i8").tobytes(),
+            np.asarray(user_ids, dtype="<i8").tobytes(),
+            matrix.tobytes(),
+        )
+    )
+    return body + hashlib.sha256(body).digest()
+
+
+def unpack(data: bytes) -> tuple[str, np.ndarray, np.ndarray, np.ndarray]:
+    """Inverse of ``pack``; verifies the checksum. Mirrors what a device does."""
+    body, digest = data[:-32], data[-32:]
+    if hashlib.sha256(body).digest() != digest:
+        raise ValueError("Bundle checksum mismatch")
+    magic, version, code, dim, count, name_len = HEADER.unpack_from(body)
+    if magic != MAGIC or version != FORMAT_VERSION:
+        raise ValueError("Unrecognized bundle format")
+    np_dtype = next(dt for c, dt in _DTYPE_CODES.values() if c == code)
+    offset = HEADER.size + name_len + (-(HEADER.size + name_len) % 8)
+    model_name = body[HEADER.size : HEADER.size + name_len].decode()
+    ids = np.frombuffer(body, dtype="<i8", count=count, offset=offset)
+    users = np.frombuffer(body, dtype="<i8", count=count, offset=offset + 8 * count)
+    matrix = np.frombuffer(body, dtype=np_dtype, count=count * dim, offset=offset + 16 * count).reshape(count, dim)
+    return model_name, ids, users, matrix
+
+
+def _fingerprints(db: Session) -> dict[tuple[str, str], tuple]:
+    rows = db.query(
+        models.Embedding.model_name, func.count(models.Embedding.id), func.max(models.Embedding.id)
+    ).group_by(models.Embedding.model_name)
+    fingerprints = {(model_name, "embeddings"): (count, max_id) for model_name, count, max_id in rows if model_name}
+    rows = db.query(
+        models.UserTemplate.model_name,
+        func.count(models.UserTemplate.id),
+        func.max(models.UserTemplate.id),
+        func.max(models.UserTemplate.updated_at),
+    ).group_by(models.UserTemplate.model_name)
+    fingerprints.update({(row[0], "templates"): tuple(row[1:]) for row in rows})
+    return fingerprints
+
+
+def _embedding_rows(db: Session, model_name: str) -> tuple[list[int], list[int], list[np.ndarray]]:
+    rows = (
+        db.query(models.Embedding.id, models.Embedding.user_id, models.Embedding.vector)
+        .filter(models.Embedding.model_name == model_name)
+        .order_by(models.Embedding.id)
+        .all()
+    )
+    return [row.id for row in rows], [row.user_id for row in rows], [decode_vector(row.vector) for row in rows]
+
+
+def _template_rows(db: Session, model_name: str) -> tuple[list[int], list[int], list[np.ndarray]]:
+    ids: list[int] = []
+    users: list[int] = []
+    vectors: list[np.ndarray] = []
+    templates = (
+        db.query(models.UserTemplate)
+        .filter(models.UserTemplate.model_name == model_name)
+        .order_by(models.UserTemplate.user_id)
+    )
+    for template in templates:
+        centroid = decode_vector(template.centroid)
+        exemplars = np.frombuffer(template.exemplars, dtype="<f4").reshape(-1, centroid.shape[0])
+        ids.extend([0, *json.loads(template.exemplar_ids)])
+        users.extend([template.user_id] * (exemplars.shape[0] + 1))
+        vectors.extend([centroid, *exemplars])
+    return ids, users, vectors
+
+
+def _build(db: Session, model_name: str, kind: str, fingerprint: tuple) -> Bundle:
+    settings = get_settings()
+    ids, users, vectors = (_template_rows if kind == "templates" else _embedding_rows)(db, model_name)
+    matrix = np.vstack(vectors) if vectors else np.zeros((0, 0), dtype=np.float32)
+    data = pack(model_name, ids, users, matrix, settings.embedding_bundle_dtype)
+    checksum = data[-32:].hex()
+    version = checksum[:16]
+    root = bundle_root()
+    safe_name = _SAFE_NAME.sub("_", model_name) + (".templates" if kind == "templates" else "")
+    stem = f"{safe_name}-{version}"
+    path, gzip_path = root / f"{stem}.bin", root / f"{stem}.bin.gz"
+    if not path.exists():
+        save_bytes(path, data)
+    if not gzip_path.exists():
+        save_bytes(gzip_path, gzip.compress(data, compresslevel=9, mtime=0))
+    _prune(root, safe_name, keep=path)
+    url = f"/raspberry/embeddings/{model_name}/bundle" + ("?kind=templates" if kind == "templates" else "")
+    manifest = schemas.EmbeddingBundleManifest(
+        model_name=model_name,
+        kind=kind,
+        version=version,
+        checksum=checksum,
+        dtype=settings.embedding_bundle_dtype,
+        dim=int(matrix.shape[1]) if matrix.size else 0,
+        count=len(ids),
+        size_bytes=len(data),
+        gzip_size_bytes=gzip_path.stat().st_size,
+        url=url,
+        gzip_url=url + ("&" if "?" in url else "?") + "compressed=true",
+    )
+    return Bundle(fingerprint=fingerprint, manifest=manifest, path=path, gzip_path=gzip_path)
+
+
+def _prune(root: Path, safe_name: str, keep: Path) -> None:
+    files = sorted(root.glob(f"{safe_name}-*.bin"), key=lambda p: p.stat().st_mtime, reverse=True)
+    stale = [p for p in files if p != keep][_KEEP_VERSIONS - 1 :]
+    for old in stale:
+        old.unlink(missing_ok=True)
+        old.with_name(old.name + ".gz").unlink(missing_ok=True)
+
+
+def _current(db: Session) -> tuple[dict[tuple[str, str], Bundle], list[schemas.EmbeddingBundleManifest]]:
+    """
+    Bundles and manifests, checked against the database only after a write moved the
+    embedding or template generation; then only the (model, kind) pairs whose rows changed
+    are rebuilt. Ids are never reused, so (count, max id) per model tells those apart.
+    """
+    global _checked
+    state = generation.current_all(db)
+    checked = _checked
+    if checked is not None and checked[0] == state:
+        return checked[1], checked[2]
+    with _lock:
+        if _checked is not None and _checked[0] == state:
+            return _checked[1], _checked[2]
+        fingerprints = _fingerprints(db)
+        for key, fingerprint in fingerprints.items():
+            current = _bundles.get(key)
+            if current is None or current.fingerprint != fingerprint:
+                _bundles[key] = _build(db, *key, fingerprint)
+        bundles = {key: _bundles[key] for key in fingerprints}
+        manifests = [bundle.manifest for _, bundle in sorted(bundles.items())]
+        _checked = (state, bundles, manifests)
+        return bundles, manifests
+
+
+def get_bundles(db: Session) -> dict[tuple[str, str], Bundle]:
+    """Current bundle per (model, kind)."""
+    return _current(db)[0]
+
+
+def get_manifests(db: Session) -> list[schemas.EmbeddingBundleManifest]:
+    return _current(db)[1]
@@ -0,0 +1,178 @@
+"""
+Resized, re-encoded variants of stored photos and captures. Derivatives are keyed by the
+original's SHA-256, so identical uploads share them and the checksum doubles as an ETag.
+A background worker renders them right after upload; ``ensure`` renders on first request
+for anything the worker has not reached (or older files) and caches the result on disk.
+"""
+import io
+import logging
+import queue
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+
+from PIL import Image, ImageOps
+
+from backend.app.config import get_settings
+from backend.app.services.upload_service import save_bytes
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVES_ROOT = Path("data") / "derivatives"
+
+
+@dataclass(frozen=True)
+class Variant:
+    name: str
+    size: int
+    quality: int
+    face_crop: bool = False  # square crop around the largest face, as the device's model expects
+
+
+def _variants() -> dict[str, Variant]:
+    settings = get_settings()
+    return {
+        "thumb": Variant("thumb", settings.thumbnail_size, settings.thumbnail_quality),
+        "face": Variant("face", 160, 90, face_crop=True),
+    }
+
+
+VARIANTS = _variants()
+PHOTO_VARIANTS = ("thumb", "face")
+CAPTURE_VARIANTS = ("thumb",)
+
+
+def derivative_path(checksum: str, variant: str) -> Path:
+    return DERIVATIVES_ROOT / variant / checksum[:2] / f"{checksum}.jpg"
+
+
+def media_url(variant: str, kind: str, path: str) -> str:
+    """URL of ``variant`` for a file under /uploads or /captures; ``original`` keeps the static URL."""
+    if variant == "original":
+        return f"/{kind}/{path}"
+    return f"/media/{variant}/{kind}/{path}"
+
+
+_detector = None
+_detector_loaded = False
+_detector_lock = threading.Lock()
+
+
+def _face_detector():
+    global _detector, _detector_loaded
+    with _detector_lock:
+        if not _detector_loaded:
+            _detector_loaded = True
+            try:
+                from backend.app.services.face_detector import create_face_detector
+
+                _detector = create_face_detector(get_settings().face_detector)
+            except Exception as exc:
+                logger.info("Face crops fall back to a centre crop: %s", exc)
+        return _detector
+
+
+def _face_crop(image: Image.Image, size: int) -> Image.Image:
+    detector = _face_detector()
+    if detector is not None:
+        try:
+            faces = detector.detect(image)
+        except Exception:
+            logger.debug("Face detection failed for derivative", exc_info=True)
+            faces = []
+        if faces:
+            from backend.app.services.face_detector import align_face
+
+            return align_face(image, faces[0], size=size, margin=get_settings().face_margin)
+    return ImageOps.fit(image, (size, size), Image.LANCZOS)
+
+
+def render(source: Path, variant: Variant) -> bytes:
+    with Image.open(source) as image:
+        if not variant.face_crop:
+            # JPEG can decode straight at a reduced scale, which skips most of the work.
+            image.draft("RGB", (variant.size, variant.size))
+        image = ImageOps.exif_transpose(image).convert("RGB")
+    if variant.face_crop:
+        image = _face_crop(image, variant.size)
+    else:
+        image.thumbnail((variant.size, variant.size), Image.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=variant.quality, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+def ensure(checksum: str, source: Path, variant: str) -> Path:
+    """Path of the cached derivative, rendering it first if needed. Blocking."""
+    path = derivative_path(checksum, variant)
+    if not path.exists():
+        save_bytes(path, render(source, VARIANTS[variant]))
+    return path
+
+
+def remove(checksum: str) -> int:
+    """Delete every cached variant of ``checksum``, once nothing stored has that content any more."""
+    removed = 0
+    for variant in VARIANTS:
+        try:
+            derivative_path(checksum, variant).unlink()
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+class DerivativeWorker:
+    """Renders derivatives off the request path. A full queue drops work; ``ensure`` covers it later."""
+
+    def __init__(self, max_queue: int = 1000):
+        self._queue: queue.Queue[tuple[str, Path, tuple[str, ...]] | None] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._rendered = 0
+        self._failed = 0
+        self._dropped = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._thread = threading.Thread(target=self._run, name="derivatives", daemon=True)
+        self._thread.start()
+
+    def submit(self, checksum: str, source: Path, variants: tuple[str, ...]) -> bool:
+        if self._thread is None:
+            return False
+        try:
+            self._queue.put_nowait((checksum, source, variants))
+            return True
+        except queue.Full:
+            self._dropped += 1
+            return False
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            checksum, source, variants = item
+            for variant in variants:
+                try:
+                    ensure(checksum, source, variant)
+                    self._rendered += 1
+                except Exception:
+                    self._failed += 1
+                    logger.warning("Could not render %s for %s", variant, source, exc_info=True)
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join(10)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "rendered": self._rendered,
+            "failed": self._failed,
+            "dropped": self._dropped,
+        }
@@ -1,20 +1,48 @@
-import json
-from typing import Iterable, List
+import logging
+from datetime import datetime
+from typing import Iterable
 
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
 from backend.app import models
+from backend.app.config import get_settings
+from backend.app.services import media_service, template_service
+from backend.app.services.gallery_service import drop_gallery, invalidate_galleries
+from backend.app.services.sync_service import invalidate_sync_snapshot
+from backend.app.services.template_service import Member
+from backend.app.services.vector_codec import decode_vector, encode_vector, is_legacy
+
+logger = logging.getLogger(__name__)
+
+MIGRATED_KEY = "legacy_vectors_migrated"
 
 
 def add_embedding(db: Session, user_id: int, vector: list[float], model_name: str) -> models.Embedding:
-    serialized = json.dumps(vector)
+    serialized = encode_vector(vector, get_settings().embedding_dtype)
     embedding = models.Embedding(user_id=user_id, vector=serialized, model_name=model_name)
     db.add(embedding)
+    db.flush()
+    template_service.add_members(db, [Member(user_id, model_name, embedding.id, np.asarray(vector, dtype=np.float32))])
     db.commit()
     db.refresh(embedding)
+    if get_settings().template_auto_prune:
+        # A fresh enrollment is kept even when it is the outlier; the next one judges it.
+        pruned = template_service.outliers(db, user_id, model_name, keep=[embedding.id])
+        if pruned:
+            logger.info("Pruning %d outlier embeddings of user %d", len(pruned), user_id)
+            remove_embeddings(db, [embedding_id for embedding_id, _ in pruned])
+    invalidate_galleries()
+    invalidate_sync_snapshot()
     return embedding
 
 
+def get_vector(embedding: models.Embedding) -> np.ndarray:
+    return decode_vector(embedding.vector)
+
+
 def get_embeddings_for_user(db: Session, user_id: int) -> list[models.Embedding]:
     return db.query(models.Embedding).filter(models.Embedding.user_id == user_id).all()
 
@@ -24,5 +52,71 @@ def get_all_embeddings(db: Session) -> list[models.Embedding]:
 
 
 def remove_embeddings(db: Session, embedding_ids: Iterable[int]) -> None:
+    """Delete embeddings, e.g. pruned outliers, together with the photos they were computed from."""
+    embedding_ids = list(embedding_ids)
+    rows = (
+        db.query(models.Embedding.id, models.Embedding.user_id, models.Embedding.model_name, models.Embedding.vector)
+        .filter(models.Embedding.id.in_(embedding_ids))
+        .all()
+    )
     db.query(models.Embedding).filter(models.Embedding.id.in_(embedding_ids)).delete(synchronize_session=False)
+    template_service.remove_members(
+        db, [Member(row.user_id, row.model_name, row.id, decode_vector(row.vector)) for row in rows]
+    )
+    cleanup = media_service.forget_photos(db, models.Photo.embedding_id.in_(embedding_ids))
     db.commit()
+    cleanup.run(db)
+    invalidate_galleries()
+    invalidate_sync_snapshot()
+
+
+def remove_model(db: Session, model_name: str) -> int:
+    """Delete a whole partition, e.g. the previous model once a cutover has proven itself."""
+    removed = db.query(models.Embedding).filter(models.Embedding.model_name == model_name).delete(synchronize_session=False)
+    template_service.delete_model(db, model_name)
+    db.commit()
+    drop_gallery(model_name)
+    invalidate_sync_snapshot()
+    return removed
+
+
+def migrate_legacy_vectors(db: Session, batch_size: int | None = None) -> int:
+    """
+    Rewrite JSON-encoded vectors into the binary format in small batches.
+    Each batch is its own transaction, so the API keeps serving while this runs.
+    Nothing writes JSON any more, so a finished pass is recorded and later starts skip the scan.
+    """
+    if db.get(models.AppSetting, MIGRATED_KEY) is not None:
+        return 0
+    settings = get_settings()
+    batch_size = batch_size or settings.embedding_migration_batch_size
+    last_id = 0
+    converted = 0
+    while True:
+        rows = (
+            db.query(models.Embedding.id, models.Embedding.vector)
+            .filter(models.Embedding.id > last_id)
+            .order_by(models.Embedding.id)
+            .limit(batch_size)
+            .all()
+        )
+        if not rows:
+            break
+        last_id = rows[-1].id
+        updates = [
+            {"id": row.id, "vector": encode_vector(decode_vector(row.vector), settings.embedding_dtype)}
+            for row in rows
+            if is_legacy(row.vector)
+        ]
+        if updates:
+            db.execute(update(models.Embedding), updates)
+            db.commit()
+            converted += len(updates)
+    if converted:
+        logger.info("Converted %d legacy JSON embeddings to binary", converted)
+    try:
+        db.add(models.AppSetting(key=MIGRATED_KEY, value=datetime.utcnow().isoformat()))
+        db.commit()
+    except IntegrityError:
+        db.rollback()  # another worker process finished the same pass
+    return converted
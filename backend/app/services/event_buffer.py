@@ -0,0 +1,121 @@
+import logging
+import queue
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from backend.app.schemas import EventCreate
+from backend.app.services import event_service
+
+logger = logging.getLogger(__name__)
+
+
+class EventWriteBuffer:
+    """
+    Write-behind buffer for door events. A background thread drains the queue and writes
+    up to ``max_batch`` events per transaction, at least every ``flush_interval_ms``.
+    A failed write (SQLite busy, say) is retried with backoff and then put back in the queue;
+    devices already got their 202, so only events that no longer fit are dropped.
+    ``stop`` drains everything still queued, so a clean shutdown loses nothing.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        max_batch: int = 200,
+        flush_interval_ms: int = 200,
+        max_queue: int = 10000,
+        retries: int = 3,
+        retry_backoff_ms: int = 100,
+    ):
+        self._session_factory = session_factory
+        self.max_batch = max(1, max_batch)
+        self.flush_interval = flush_interval_ms / 1000
+        self.retries = max(0, retries)
+        self.retry_backoff = retry_backoff_ms / 1000
+        self._queue: queue.Queue[EventCreate] = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._written = 0
+        self._flushes = 0
+        self._requeued = 0
+        self._dropped = 0
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-write-behind", daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: EventCreate) -> bool:
+        """Queue an event; returns False when the buffer is full so the caller can write directly."""
+        try:
+            self._queue.put_nowait(payload)
+            return True
+        except queue.Full:
+            return False
+
+    def _next_batch(self) -> list[EventCreate]:
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 and not self._stop.is_set():
+                break
+            try:
+                batch.append(self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not (self._stop.is_set() and self._queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._flush(batch)
+
+    def _flush(self, batch: list[EventCreate]) -> None:
+        for attempt in range(self.retries + 1):
+            if attempt:
+                time.sleep(self.retry_backoff * 2 ** (attempt - 1))
+            db = self._session_factory()
+            try:
+                self._written += event_service.log_events(db, batch)
+                self._flushes += 1
+                return
+            except Exception:
+                logger.warning("Failed to write %d buffered events (attempt %d)", len(batch), attempt + 1, exc_info=True)
+            finally:
+                db.close()
+        requeued = 0
+        for payload in batch:
+            try:
+                self._queue.put_nowait(payload)
+            except queue.Full:
+                break
+            requeued += 1
+        self._requeued += requeued
+        self._dropped += len(batch) - requeued
+        logger.error("Put %d buffered events back in the queue, dropped %d", requeued, len(batch) - requeued)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "written": self._written,
+            "flushes": self._flushes,
+            "requeued": self._requeued,
+            "dropped": self._dropped,
+        }
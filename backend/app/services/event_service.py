@@ -1,8 +1,24 @@
-from sqlalchemy.orm import Session
+import base64
+from datetime import datetime, timezone
+from typing import Iterator
+
+from sqlalchemy import and_, insert, or_
+from sqlalchemy.orm import Query, Session
 
 from backend.app import models
 from backend.app.schemas import EventCreate
 
+EXPORT_COLUMNS = ("id", "user_id", "status", "message", "device_id", "confidence", "created_at")
+
+
+def occurred_at(payload: EventCreate) -> datetime:
+    """The event's time as the naive UTC ``created_at`` stores; now when the device sent none."""
+    if payload.occurred_at is None:
+        return datetime.utcnow()
+    if payload.occurred_at.tzinfo is not None:
+        return payload.occurred_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return payload.occurred_at
+
 
 def log_event(db: Session, payload: EventCreate, user: models.User | None) -> models.EventLog:
     event = models.EventLog(
@@ -11,6 +27,7 @@ def log_event(db: Session, payload: EventCreate, user: models.User | None) -> mo
         message=payload.message,
         device_id=payload.device_id,
         confidence=payload.confidence,
+        created_at=occurred_at(payload),
     )
     db.add(event)
     db.commit()
@@ -18,5 +35,95 @@ def log_event(db: Session, payload: EventCreate, user: models.User | None) -> mo
     return event
 
 
-def list_events(db: Session, limit: int = 100) -> list[models.EventLog]:
-    return db.query(models.EventLog).order_by(models.EventLog.created_at.desc()).limit(limit).all()
+def log_events(db: Session, payloads: list[EventCreate]) -> int:
+    """
+    Insert many events in one transaction with a single executemany INSERT.
+    User identifiers are resolved with one IN query instead of a lookup per event.
+    """
+    if not payloads:
+        return 0
+    identifiers = {p.user_identifier for p in payloads if p.user_identifier}
+    user_ids: dict[str, int] = {}
+    if identifiers:
+        user_ids = dict(
+            db.query(models.User.identifier, models.User.id).filter(models.User.identifier.in_(identifiers)).all()
+        )
+    rows = [
+        {
+            "user_id": user_ids.get(p.user_identifier) if p.user_identifier else None,
+            "status": p.status,
+            "message": p.message,
+            "device_id": p.device_id,
+            "confidence": p.confidence,
+            "created_at": occurred_at(p),
+        }
+        for p in payloads
+    ]
+    db.execute(insert(models.EventLog), rows)
+    db.commit()
+    return len(rows)
+
+
+def encode_cursor(created_at: datetime, event_id: int) -> str:
+    return base64.urlsafe_b64encode(f"{created_at.isoformat()}|{event_id}".encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    created_at, event_id = base64.urlsafe_b64decode(cursor.encode()).decode().split("|", 1)
+    return datetime.fromisoformat(created_at), int(event_id)
+
+
+def _filtered(
+    query: Query,
+    device_id: str | None = None,
+    user_id: int | None = None,
+    status: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Query:
+    if device_id is not None:
+        query = query.filter(models.EventLog.device_id == device_id)
+    if user_id is not None:
+        query = query.filter(models.EventLog.user_id == user_id)
+    if status is not None:
+        query = query.filter(models.EventLog.status == status)
+    if since is not None:
+        query = query.filter(models.EventLog.created_at >= since)
+    if until is not None:
+        query = query.filter(models.EventLog.created_at < until)
+    return query.order_by(models.EventLog.created_at.desc(), models.EventLog.id.desc())
+
+
+def list_events(
+    db: Session,
+    limit: int = 100,
+    cursor: str | None = None,
+    **filters,
+) -> tuple[list[models.EventLog], str | None]:
+    """
+    Newest-first page of events. Pages are keyed on (created_at, id), so each page is an
+    index range scan no matter how deep the caller has paged.
+    """
+    query = _filtered(db.query(models.EventLog), **filters)
+    if cursor:
+        created_at, event_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                models.EventLog.created_at < created_at,
+                and_(models.EventLog.created_at == created_at, models.EventLog.id < event_id),
+            )
+        )
+    events = query.limit(limit + 1).all()
+    next_cursor = None
+    if len(events) > limit:
+        events = events[:limit]
+        next_cursor = encode_cursor(events[-1].created_at, events[-1].id)
+    return events, next_cursor
+
+
+def iter_events(db: Session, batch_size: int = 1000, **filters) -> Iterator[dict]:
+    """Stream matching events as plain dicts without building ORM objects."""
+    columns = [getattr(models.EventLog, name) for name in EXPORT_COLUMNS]
+    query = _filtered(db.query(*columns), **filters).execution_options(stream_results=True, yield_per=batch_size)
+    for row in query:
+        yield dict(zip(EXPORT_COLUMNS, row))
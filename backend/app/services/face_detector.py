@@ -0,0 +1,126 @@
+import math
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image
+
+
+class NoFaceDetected(ValueError):
+    """Raised when a frame contains no detectable face; no embedding is computed for it."""
+
+
+@dataclass
+class DetectedFace:
+    box: tuple[float, float, float, float]
+    score: float
+    # Left and right eye centres, when the detector provides landmarks.
+    eyes: Optional[tuple[tuple[float, float], tuple[float, float]]] = None
+
+    @property
+    def area(self) -> float:
+        x1, y1, x2, y2 = self.box
+        return max(0.0, x2 - x1) * max(0.0, y2 - y1)
+
+
+class BaseFaceDetector(ABC):
+    name: str = "base"
+
+    @abstractmethod
+    def detect(self, image: Image.Image) -> list[DetectedFace]:
+        """Return detected faces sorted by area, largest first."""
+
+
+class MTCNNDetector(BaseFaceDetector):
+    """
+    MTCNN from facenet-pytorch. ``max_side`` downscales large frames before detection,
+    which together with a larger ``min_face_size`` gives the cheaper ``mtcnn-fast`` mode.
+    """
+
+    name = "mtcnn"
+
+    def __init__(
+        self,
+        device: Optional[str] = None,
+        min_face_size: int = 20,
+        thresholds: tuple[float, float, float] = (0.6, 0.7, 0.7),
+        max_side: Optional[int] = None,
+    ):
+        from facenet_pytorch import MTCNN
+
+        self.max_side = max_side
+        self._mtcnn = MTCNN(
+            keep_all=True,
+            min_face_size=min_face_size,
+            thresholds=list(thresholds),
+            post_process=False,
+            device=device or "cpu",
+        )
+
+    def detect(self, image: Image.Image) -> list[DetectedFace]:
+        scale = 1.0
+        probe = image
+        if self.max_side and max(image.size) > self.max_side:
+            scale = self.max_side / max(image.size)
+            probe = image.resize((round(image.width * scale), round(image.height * scale)), Image.BILINEAR)
+        boxes, probs, landmarks = self._mtcnn.detect(probe, landmarks=True)
+        if boxes is None:
+            return []
+        faces = []
+        for box, prob, points in zip(boxes, probs, landmarks):
+            x1, y1, x2, y2 = (float(v) / scale for v in box)
+            eyes = None
+            if points is not None:
+                eyes = (
+                    (float(points[0][0]) / scale, float(points[0][1]) / scale),
+                    (float(points[1][0]) / scale, float(points[1][1]) / scale),
+                )
+            faces.append(DetectedFace(box=(x1, y1, x2, y2), score=float(prob), eyes=eyes))
+        return sorted(faces, key=lambda face: face.area, reverse=True)
+
+
+def align_face(image: Image.Image, face: DetectedFace, size: int = 160, margin: float = 0.15) -> Image.Image:
+    """
+    Rotate the face so the eyes are level, then crop it with ``margin`` (fraction of the
+    box size) and resize to ``size`` x ``size``.
+    """
+    x1, y1, x2, y2 = face.box
+    side = max(x2 - x1, y2 - y1)
+    # Work on a region around the face so rotation never touches the full frame.
+    left, top = max(0, int(x1 - side)), max(0, int(y1 - side))
+    right, bottom = min(image.width, int(x2 + side)), min(image.height, int(y2 + side))
+    region = image.crop((left, top, right, bottom))
+    x1, y1, x2, y2 = x1 - left, y1 - top, x2 - left, y2 - top
+    if face.eyes is not None:
+        (lx, ly), (rx, ry) = face.eyes
+        angle = math.degrees(math.atan2(ry - ly, rx - lx))
+        region = region.rotate(angle, resample=Image.BILINEAR, center=((x1 + x2) / 2, (y1 + y2) / 2))
+    pad = margin * side
+    crop = region.crop(
+        (
+            max(0, int(x1 - pad)),
+            max(0, int(y1 - pad)),
+            min(region.width, int(x2 + pad)),
+            min(region.height, int(y2 + pad)),
+        )
+    )
+    return crop.resize((size, size), Image.BILINEAR)
+
+
+def create_face_detector(name: str, device: Optional[str] = None) -> BaseFaceDetector | None:
+    """``none`` keeps the legacy behaviour of embedding the whole frame."""
+    if name == "none":
+        return None
+    if name == "mtcnn":
+        return MTCNNDetector(device=device)
+    if name == "mtcnn-fast":
+        return MTCNNDetector(device=device, min_face_size=60, thresholds=(0.7, 0.8, 0.9), max_side=640)
+    raise KeyError(f"Face detector {name} is not registered")
+
+
+def facenet_model_name(detector_name: str) -> str:
+    """
+    Vector space FaceNet embeddings land in. Aligned crops and whole frames do not match each
+    other, so enabling detection moves them to a new gallery partition and re-embedding.
+    """
+    return "facenet" if detector_name == "none" else "facenet-aligned"
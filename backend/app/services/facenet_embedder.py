@@ -1,5 +1,7 @@
+import argparse
 import io
 import logging
+from pathlib import Path
 from typing import Optional
 
 import torch
@@ -7,23 +9,51 @@ from facenet_pytorch import InceptionResnetV1, fixed_image_standardization
 from PIL import Image
 from torchvision import transforms
 
+from backend.app.metrics import EMBEDDER_BATCH, EMBEDDER_FORWARD, EMBEDDER_PREPROCESS
+from backend.app.services.face_detector import NoFaceDetected, align_face, create_face_detector, facenet_model_name
 from backend.app.services.model_registry import BaseEmbedder
 
 logger = logging.getLogger(__name__)
 
+INFERENCE_MODES = ("fp32", "torchscript", "compile", "onnx")
+
 
 class FaceNetEmbedder(BaseEmbedder):
     """
     Face embedding generator based on facenet-pytorch (InceptionResnetV1).
     Returns 512-dim vectors compatible with FaceNet pipelines.
+    Faces are detected and aligned first; frames without a face are rejected before
+    the network runs. ``inference_mode`` trades exactness for CPU speed; every mode keeps
+    the same ``name`` because the vectors live in the same space as fp32. The name does
+    depend on the detector, see ``facenet_model_name``.
     """
 
-    name = "facenet"
+    name = "facenet-aligned"
 
-    def __init__(self, device: Optional[str] = None):
+    def __init__(
+        self,
+        device: Optional[str] = None,
+        max_batch_size: int = 32,
+        face_detector: str = "mtcnn",
+        face_margin: float = 0.15,
+        weights_path: Optional[str] = None,
+        allow_download: bool = False,
+        inference_mode: str = "fp32",
+        channels_last: bool = False,
+        onnx_path: Optional[str] = None,
+    ):
+        if inference_mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown FaceNet inference mode {inference_mode}")
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
+        self.inference_mode = inference_mode
+        self.channels_last = channels_last
+        self._onnx_session = None
+        self.max_batch_size = max_batch_size
+        self.face_margin = face_margin
+        self.detector = create_face_detector(face_detector, self.device)
+        self.name = facenet_model_name(face_detector)
         self.model = (
-            InceptionResnetV1(pretrained="vggface2")
+            self._load_model(weights_path, allow_download)
             .eval()
             .to(self.device)
         )
@@ -34,15 +64,140 @@ class FaceNetEmbedder(BaseEmbedder):
                 fixed_image_standardization,
             ]
         )
-        logger.info("FaceNetEmbedder initialized on device=%s", self.device)
+        self._optimize(onnx_path)
+        logger.info(
+            "FaceNetEmbedder initialized on device=%s detector=%s mode=%s channels_last=%s",
+            self.device,
+            self.detector.name if self.detector else "none",
+            self.inference_mode,
+            self.channels_last,
+        )
 
-    def _preprocess(self, image_bytes: bytes) -> torch.Tensor:
+    @staticmethod
+    def _load_model(weights_path: Optional[str], allow_download: bool) -> InceptionResnetV1:
+        path = Path(weights_path) if weights_path else None
+        if path and path.exists():
+            model = InceptionResnetV1(pretrained=None)
+            state = torch.load(path, map_location="cpu", weights_only=True)
+            # The vggface2 checkpoint carries a classifier head the embedding model does not use.
+            model.load_state_dict({k: v for k, v in state.items() if not k.startswith("logits.")})
+            return model
+        if not allow_download:
+            raise FileNotFoundError(
+                f"FaceNet weights not found at {path}; fetch them with "
+                "`python -m backend.app.services.facenet_embedder` or set FACENET_ALLOW_DOWNLOAD=true"
+            )
+        model = InceptionResnetV1(pretrained="vggface2")
+        if path:
+            # Keep a local copy so later starts never touch the network.
+            path.parent.mkdir(parents=True, exist_ok=True)
+            torch.save(model.state_dict(), path)
+            logger.info("Saved FaceNet weights to %s", path)
+        return model
+
+    def _example(self) -> torch.Tensor:
+        return torch.zeros(1, 3, 160, 160, device=self.device)
+
+    def _optimize(self, onnx_path: Optional[str]) -> None:
+        mode = self.inference_mode
+        if mode == "onnx":
+            self._onnx_session = self._load_onnx(onnx_path or "data/models/facenet.onnx")
+            return
+        if self.channels_last:
+            self.model = self.model.to(memory_format=torch.channels_last)
+        # No int8 mode: dynamic quantization only rewrites nn.Linear, and InceptionResnetV1's one
+        # Linear is the final projection, so the convolutions doing the work stayed fp32.
+        if mode == "torchscript":
+            with torch.no_grad():
+                traced = torch.jit.trace(self.model, self._batch_layout(self._example()))
+            self.model = torch.jit.optimize_for_inference(torch.jit.freeze(traced))
+        elif mode == "compile":
+            self.model = torch.compile(self.model)
+
+    def _load_onnx(self, onnx_path: str):
+        import onnxruntime
+
+        path = Path(onnx_path)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            torch.onnx.export(
+                self.model,
+                self._example(),
+                str(path),
+                input_names=["input"],
+                output_names=["embedding"],
+                dynamic_axes={"input": {0: "batch"}, "embedding": {0: "batch"}},
+                opset_version=17,
+            )
+            logger.info("Exported FaceNet to ONNX at %s", path)
+        return onnxruntime.InferenceSession(str(path), providers=["CPUExecutionProvider"])
+
+    def _batch_layout(self, batch: torch.Tensor) -> torch.Tensor:
+        if self.channels_last:
+            return batch.contiguous(memory_format=torch.channels_last)
+        return batch
+
+    def _run_model(self, batch: torch.Tensor) -> list[list[float]]:
+        if self._onnx_session is not None:
+            return self._onnx_session.run(None, {"input": batch.cpu().numpy()})[0].tolist()
+        return self.model(self._batch_layout(batch)).cpu().tolist()
+
+    def warmup(self) -> None:
+        with torch.inference_mode():
+            self._run_model(self._example())
+
+    def _faces(self, image_bytes: bytes, all_faces: bool = False) -> list[torch.Tensor]:
+        with EMBEDDER_PREPROCESS.labels(self.inference_mode).time():
+            return self._detect_and_align(image_bytes, all_faces)
+
+    def _detect_and_align(self, image_bytes: bytes, all_faces: bool) -> list[torch.Tensor]:
         img = Image.open(io.BytesIO(image_bytes)).convert("RGB")
-        tensor = self.transform(img).unsqueeze(0).to(self.device)
-        return tensor
+        if self.detector is None:
+            return [self.transform(img)]
+        faces = self.detector.detect(img)
+        if not faces:
+            raise NoFaceDetected("No face detected in image")
+        if not all_faces:
+            faces = faces[:1]
+        return [self.transform(align_face(img, face, 160, self.face_margin)) for face in faces]
 
-    def generate_embedding(self, image_bytes: bytes) -> list[float]:
+    def _preprocess(self, image_bytes: bytes) -> torch.Tensor:
+        return self._faces(image_bytes)[0]
+
+    def _forward(self, tensors: list[torch.Tensor]) -> list[list[float]]:
+        vectors: list[list[float]] = []
         with torch.inference_mode():
-            tensor = self._preprocess(image_bytes)
-            embedding = self.model(tensor)
-        return embedding.squeeze(0).cpu().tolist()
+            for start in range(0, len(tensors), self.max_batch_size):
+                batch = torch.stack(tensors[start : start + self.max_batch_size]).to(self.device)
+                EMBEDDER_BATCH.labels(self.inference_mode).observe(batch.shape[0])
+                with EMBEDDER_FORWARD.labels(self.inference_mode).time():
+                    vectors.extend(self._run_model(batch))
+        return vectors
+
+    def generate_embedding(self, image_bytes: bytes) -> list[float]:
+        return self.generate_embeddings([image_bytes])[0]
+
+    def generate_embeddings(self, images: list[bytes]) -> list[list[float]]:
+        # Detection runs for the whole batch first, so a faceless frame costs no forward pass.
+        return self._forward([self._preprocess(image) for image in images])
+
+    def generate_face_embeddings(self, image_bytes: bytes) -> list[list[float]]:
+        return self._forward(self._faces(image_bytes, all_faces=True))
+
+
+def main() -> None:
+    from backend.app.config import get_settings
+
+    parser = argparse.ArgumentParser(
+        description="Download the vggface2 FaceNet weights once, for servers that run without network access."
+    )
+    parser.add_argument("--path", default=get_settings().facenet_weights_path)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    FaceNetEmbedder._load_model(args.path, allow_download=True)
+    logger.info("FaceNet weights are at %s", args.path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,277 @@
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from backend.app import models
+from backend.app.config import get_settings
+from backend.app.services import generation
+from backend.app.services.vector_codec import decode_vector
+from backend.app.services.vector_index import BaseVectorIndex, index_registry, load_index
+
+logger = logging.getLogger(__name__)
+_LOAD_CHUNK = 500
+
+
+@dataclass
+class Match:
+    user_id: int
+    embedding_id: int
+    distance: float
+
+
+def _index_params(name: str) -> dict:
+    settings = get_settings()
+    if name == "ivf":
+        return {"nlist": settings.ivf_nlist, "nprobe": settings.ivf_nprobe}
+    if name == "hnsw":
+        return {
+            "m": settings.hnsw_m,
+            "ef_construction": settings.hnsw_ef_construction,
+            "ef_search": settings.hnsw_ef_search,
+        }
+    return {}
+
+
+def _index_name() -> str:
+    name = get_settings().vector_index
+    if name not in index_registry.names():
+        logger.warning("Vector index %s not found, using flat", name)
+        return "flat"
+    return name
+
+
+class EmbeddingGallery:
+    """
+    Search structure over all enrolled embeddings of one model, backed by a vector index
+    from ``vector_index``. The index is persisted to ``settings.embeddings_dir`` and on
+    reload only the rows added or removed since it was saved are applied.
+
+    A full build of an approximate index takes seconds per thousand vectors, so it runs on a
+    background thread; until it finishes, searches go to an exact flat index of the same rows.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.RLock()
+        self._fingerprint: int | None = None
+        self._index: BaseVectorIndex | None = None
+        self._user_by_embedding: dict[int, int] = {}
+        self._dirty = False
+        self._builder: threading.Thread | None = None
+
+    def __len__(self) -> int:
+        return len(self._user_by_embedding)
+
+    @property
+    def index_path(self) -> Path:
+        return Path(get_settings().embeddings_dir) / f"{self.model_name}.{_index_name()}.npz"
+
+    def invalidate(self) -> None:
+        self._fingerprint = None
+
+    def refresh(self, db: Session) -> None:
+        fingerprint = generation.current(db, models.Embedding.__tablename__)
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            if self._index is None:
+                self._load_or_build(db)
+            else:
+                self._apply_changes(db)
+            self._fingerprint = fingerprint
+
+    def _load_vectors(self, db: Session, ids: list[int]) -> tuple[list[int], list[np.ndarray]]:
+        found_ids: list[int] = []
+        vectors: list[np.ndarray] = []
+        for start in range(0, len(ids), _LOAD_CHUNK):
+            rows = (
+                db.query(models.Embedding.id, models.Embedding.vector)
+                .filter(models.Embedding.id.in_(ids[start : start + _LOAD_CHUNK]))
+                .all()
+            )
+            for row in rows:
+                found_ids.append(row.id)
+                vectors.append(decode_vector(row.vector))
+        return found_ids, vectors
+
+    def _load_or_build(self, db: Session) -> None:
+        path = self.index_path
+        if path.exists():
+            try:
+                index, meta = load_index(path)
+                if index.name == _index_name() and "owners" in meta:
+                    self._index = index
+                    self._user_by_embedding = {int(emb_id): owner for emb_id, owner in meta["owners"]}
+                    self._apply_changes(db)
+                    return
+            except Exception:
+                logger.warning("Could not load vector index %s, rebuilding", path, exc_info=True)
+
+        rows = (
+            db.query(models.Embedding.id, models.Embedding.user_id, models.Embedding.vector)
+            .filter(models.Embedding.model_name == self.model_name)
+            .all()
+        )
+        if not rows:
+            self._index = None
+            self._user_by_embedding = {}
+            return
+        vectors = [decode_vector(row.vector) for row in rows]
+        # Keep the dominant dimension; stray rows come from a different model config.
+        dims = [v.shape[0] for v in vectors]
+        dim = max(set(dims), key=dims.count)
+        keep = [i for i, d in enumerate(dims) if d == dim]
+        matrix = np.stack([vectors[i] for i in keep]).astype(np.float32, copy=False)
+        labels = np.array([rows[i].id for i in keep], dtype=np.int64)
+        owners = {rows[i].id: rows[i].user_id for i in keep}
+        name = _index_name()
+        index = index_registry.create("flat", dim)
+        index.build(matrix, labels)
+        self._index = index
+        self._user_by_embedding = owners
+        if name == "flat":
+            self._dirty = True
+            self.persist()
+        elif self._builder is None:
+            self._builder = threading.Thread(
+                target=self._build_in_background,
+                args=(name, dim, matrix, labels, dict(owners)),
+                name=f"gallery-build-{self.model_name}",
+                daemon=True,
+            )
+            self._builder.start()
+
+    def _build_in_background(self, name: str, dim: int, matrix, labels, owners: dict[int, int]) -> None:
+        try:
+            started = time.perf_counter()
+            index = index_registry.create(name, dim, **_index_params(name))
+            index.build(matrix, labels)
+            with self._lock:
+                # Swap in the snapshot it was built from; the next refresh diffs it against the database.
+                self._index = index
+                self._user_by_embedding = owners
+                self._fingerprint = None
+                self._dirty = True
+            elapsed = time.perf_counter() - started
+            logger.info("Built %s index for %s: %d vectors in %.1fs", name, self.model_name, len(owners), elapsed)
+            self.persist()
+        except Exception:
+            logger.exception("Building the %s index for %s failed, staying on flat search", name, self.model_name)
+        finally:
+            self._builder = None
+
+    def _apply_changes(self, db: Session) -> None:
+        current = dict(
+            db.query(models.Embedding.id, models.Embedding.user_id)
+            .filter(models.Embedding.model_name == self.model_name)
+            .all()
+        )
+        # An id now owned by someone else is a reused id: its indexed vector is not that user's.
+        removed = [emb_id for emb_id, owner in self._user_by_embedding.items() if current.get(emb_id) != owner]
+        added = [emb_id for emb_id, owner in current.items() if self._user_by_embedding.get(emb_id) != owner]
+        if removed:
+            self._index.remove(removed)
+        if added:
+            ids, vectors = self._load_vectors(db, added)
+            keep = [i for i, v in enumerate(vectors) if v.shape[0] == self._index.dim]
+            if keep:
+                self._index.add(
+                    np.stack([vectors[i] for i in keep]).astype(np.float32, copy=False),
+                    np.array([ids[i] for i in keep], dtype=np.int64),
+                )
+            skipped = set(added) - {ids[i] for i in keep}
+            for emb_id in skipped:
+                current.pop(emb_id, None)
+        self._user_by_embedding = current
+        self._dirty = self._dirty or bool(removed or added)
+
+    def persist(self) -> None:
+        with self._lock:
+            if not self._dirty or self._index is None or self._index.name != _index_name():
+                return
+            try:
+                owners = [[emb_id, owner] for emb_id, owner in self._user_by_embedding.items()]
+                self._index.save(self.index_path, {"model_name": self.model_name, "owners": owners})
+                self._dirty = False
+            except Exception:
+                logger.warning("Could not persist vector index for %s", self.model_name, exc_info=True)
+
+    def search(self, db: Session, vector: list[float]) -> Match | None:
+        self.refresh(db)
+        with self._lock:
+            index = self._index
+            if index is None or not self._user_by_embedding:
+                return None
+            probe = np.asarray(vector, dtype=np.float32)
+            if probe.shape[0] != index.dim:
+                return None
+            similarities, labels = index.search(probe, 1)
+            if not labels.shape[0]:
+                return None
+            embedding_id = int(labels[0])
+            return Match(
+                user_id=self._user_by_embedding[embedding_id],
+                embedding_id=embedding_id,
+                distance=similarity_to_distance(float(similarities[0])),
+            )
+
+
+def similarity_to_distance(similarity: float) -> float:
+    if get_settings().match_metric == "l2":
+        # Both sides are unit vectors: ||a - b||^2 = 2 - 2 * a.b
+        return float(np.sqrt(max(0.0, 2.0 - 2.0 * similarity)))
+    return 1.0 - similarity
+
+
+_galleries: dict[str, EmbeddingGallery] = {}
+_galleries_lock = threading.Lock()
+
+
+def get_gallery(model_name: str) -> EmbeddingGallery:
+    gallery = _galleries.get(model_name)
+    if gallery is None:
+        with _galleries_lock:
+            gallery = _galleries.setdefault(model_name, EmbeddingGallery(model_name))
+    return gallery
+
+
+def drop_gallery(model_name: str) -> None:
+    """Forget the in-memory and persisted index of a partition whose rows were deleted or rebuilt."""
+    with _galleries_lock:
+        gallery = _galleries.pop(model_name, None) or EmbeddingGallery(model_name)
+    gallery.index_path.unlink(missing_ok=True)
+
+
+def partition_stats(db: Session) -> list[dict]:
+    """Embedding and user counts per model, with the vector dimension of the newest row."""
+    rows = db.query(
+        models.Embedding.model_name,
+        func.count(models.Embedding.id),
+        func.count(func.distinct(models.Embedding.user_id)),
+        func.max(models.Embedding.id),
+    ).group_by(models.Embedding.model_name)
+    partitions = []
+    for model_name, count, users, newest in rows:
+        vector = db.query(models.Embedding.vector).filter(models.Embedding.id == newest).scalar()
+        partitions.append(
+            {"model_name": model_name, "embeddings": count, "users": users, "dim": int(decode_vector(vector).shape[0])}
+        )
+    return partitions
+
+
+def invalidate_galleries() -> None:
+    for gallery in list(_galleries.values()):
+        gallery.invalidate()
+
+
+def persist_galleries() -> None:
+    for gallery in list(_galleries.values()):
+        gallery.persist()
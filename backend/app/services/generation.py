@@ -0,0 +1,78 @@
+"""
+Write generations: one counter per tracked table in ``app_settings``, bumped inside the same
+transaction as every ORM insert, update or delete on that table, bulk statements included.
+In-memory caches key on it rather than on (count, max id), which a delete followed by an
+insert that reuses the id leaves unchanged.
+"""
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import Integer, Text, cast, event, insert, update
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import ORMExecuteState, Session
+
+from backend.app import models
+
+TRACKED = frozenset({"embeddings", "user_templates"})
+
+
+def _key(table: str) -> str:
+    return f"generation:{table}"
+
+
+def bump(connection: Connection, tables: Iterable[str]) -> None:
+    settings = models.AppSetting.__table__
+    for table in sorted(tables):
+        bumped = connection.execute(
+            update(settings)
+            .where(settings.c.key == _key(table))
+            .values(value=cast(cast(settings.c.value, Integer) + 1, Text), updated_at=datetime.utcnow())
+        ).rowcount
+        if not bumped:
+            connection.execute(insert(settings).values(key=_key(table), value="1", updated_at=datetime.utcnow()))
+
+
+def current(db: Session, table: str) -> int:
+    value = db.query(models.AppSetting.value).filter(models.AppSetting.key == _key(table)).scalar()
+    return int(value) if value is not None else 0
+
+
+def current_all(db: Session) -> tuple[int, ...]:
+    """Every tracked counter in one query, in ``sorted(TRACKED)`` order."""
+    rows = dict(
+        db.query(models.AppSetting.key, models.AppSetting.value).filter(
+            models.AppSetting.key.in_([_key(table) for table in TRACKED])
+        )
+    )
+    return tuple(int(rows.get(_key(table), 0)) for table in sorted(TRACKED))
+
+
+def seed(connection: Connection) -> None:
+    """Create the missing counters up front, so concurrent first writers only ever UPDATE."""
+    settings = models.AppSetting.__table__
+    keys = [_key(table) for table in TRACKED]
+    existing = {row.key for row in connection.execute(settings.select().where(settings.c.key.in_(keys)))}
+    for table in sorted(TRACKED):
+        if _key(table) not in existing:
+            connection.execute(insert(settings).values(key=_key(table), value="0", updated_at=datetime.utcnow()))
+
+
+@event.listens_for(Session, "after_flush")
+def _after_flush(session: Session, _flush_context) -> None:
+    touched = {
+        obj.__table__.name
+        for obj in (*session.new, *session.dirty, *session.deleted)
+        if getattr(obj, "__table__", None) is not None
+    }
+    touched &= TRACKED
+    if touched:
+        bump(session.connection(), touched)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _bulk_write(state: ORMExecuteState) -> None:
+    if not (state.is_insert or state.is_update or state.is_delete):
+        return
+    table = getattr(state.statement, "table", None)
+    if table is not None and table.name in TRACKED:
+        bump(state.session.connection(), [table.name])
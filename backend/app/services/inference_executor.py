@@ -0,0 +1,133 @@
+import asyncio
+import logging
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable
+
+from backend.app.services.model_registry import BaseEmbedder
+
+logger = logging.getLogger(__name__)
+
+
+class InferenceQueueFull(Exception):
+    """Raised when the inference queue is at capacity; maps to 429 with Retry-After."""
+
+    def __init__(self, retry_after: int):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+def _init_worker(torch_threads: int) -> None:
+    if torch_threads <= 0:
+        return
+    try:
+        import torch
+
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+
+
+def _embed_in_worker(embedder_name: str, images: list[bytes]) -> list[list[float]]:
+    # Process workers build their own embedder; it cannot be pickled across processes.
+    # The name travels with each call so a model cutover reaches the workers too.
+    from backend.app.deps import get_embedder_by_name
+
+    return get_embedder_by_name(embedder_name).generate_embeddings(images)
+
+
+def _embed_faces_in_worker(embedder_name: str, image: bytes) -> list[list[float]]:
+    from backend.app.deps import get_embedder_by_name
+
+    return get_embedder_by_name(embedder_name).generate_face_embeddings(image)
+
+
+class InferenceExecutor:
+    """
+    Runs CPU-heavy model calls on a dedicated thread or process pool so the event loop
+    stays responsive. At most ``workers + max_queue`` tasks are admitted; beyond that
+    callers get ``InferenceQueueFull`` instead of piling up unbounded work.
+    """
+
+    def __init__(self, kind: str = "thread", workers: int = 1, max_queue: int = 32, torch_threads: int = 0):
+        self.kind = kind
+        self.workers = max(1, workers)
+        self.max_queue = max(0, max_queue)
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._rejected = 0
+        self._failed = 0
+        self._completed = 0
+        self._busy_seconds = 0.0
+        self._executor: Executor
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(
+                self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(torch_threads,),
+            )
+        else:
+            self._executor = ThreadPoolExecutor(
+                self.workers,
+                thread_name_prefix="inference",
+                initializer=_init_worker,
+                initargs=(torch_threads,),
+            )
+
+    def _retry_after(self) -> int:
+        avg = self._busy_seconds / self._completed if self._completed else 1.0
+        return max(1, math.ceil(avg * self._pending / self.workers))
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self._rejected += 1
+                raise InferenceQueueFull(self._retry_after())
+            self._pending += 1
+            self._submitted += 1
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wrap_future(self._executor.submit(fn, *args))
+        except Exception:
+            with self._lock:
+                self._failed += 1
+            raise
+        finally:
+            with self._lock:
+                self._pending -= 1
+        with self._lock:
+            self._completed += 1
+            self._busy_seconds += time.perf_counter() - started
+        return result
+
+    async def embed(self, embedder: BaseEmbedder, images: list[bytes]) -> list[list[float]]:
+        if self.kind == "process":
+            return await self.run(_embed_in_worker, embedder.registry_name, images)
+        return await self.run(embedder.generate_embeddings, images)
+
+    async def embed_faces(self, embedder: BaseEmbedder, image: bytes) -> list[list[float]]:
+        if self.kind == "process":
+            return await self.run(_embed_faces_in_worker, embedder.registry_name, image)
+        return await self.run(embedder.generate_face_embeddings, image)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "max_queue": self.max_queue,
+                "in_flight": min(self._pending, self.workers),
+                "queue_depth": max(0, self._pending - self.workers),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+            }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
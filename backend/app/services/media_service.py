@@ -0,0 +1,300 @@
+"""
+Index of stored photos and captures. Upload paths record a row per file, so sync and
+listing run indexed queries instead of walking ``data/photos`` and ``data/captures``.
+``reindex`` backfills the tables from an existing tree:
+
+    python -m backend.app.services.media_service
+"""
+import argparse
+import hashlib
+import json
+import logging
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.orm import Session
+
+from backend.app import models, schemas
+from backend.app.config import get_settings
+from backend.app.services import blob_service
+from backend.app.services.derivative_service import media_url
+from backend.app.services.upload_service import StoredFile
+
+logger = logging.getLogger(__name__)
+
+DATA_ROOT = Path("data")
+PHOTOS_ROOT = DATA_ROOT / "photos"
+CAPTURES_ROOT = DATA_ROOT / "captures"
+IMAGE_SUFFIXES = {".jpg", ".jpeg", ".png"}
+
+
+def image_dimensions(path: Path) -> tuple[int | None, int | None]:
+    """Width and height from the image header; the pixel data is not decoded."""
+    try:
+        from PIL import Image
+
+        with Image.open(path) as img:
+            return img.size
+    except Exception:
+        return None, None
+
+
+def _file_fields(stored: StoredFile) -> dict:
+    width, height = image_dimensions(stored.path)
+    return {"size_bytes": stored.size_bytes, "checksum": stored.checksum, "width": width, "height": height}
+
+
+def _stored_from_disk(path: Path, chunk_size: int = 1024 * 1024) -> StoredFile:
+    digest = hashlib.sha256()
+    with path.open("rb") as fh:
+        while chunk := fh.read(chunk_size):
+            digest.update(chunk)
+    return StoredFile(path=path, size_bytes=path.stat().st_size, checksum=digest.hexdigest())
+
+
+def photo_url(path: str) -> str:
+    return f"/uploads/{path}"
+
+
+def capture_url(path: str) -> str:
+    return f"/captures/{path}"
+
+
+def record_photo(db: Session, user_id: int, stored: StoredFile, embedding_id: int | None = None) -> models.Photo:
+    """Add the index row for a photo just written under PHOTOS_ROOT; the caller commits."""
+    blob_service.adopt(db, stored)
+    photo = models.Photo(
+        user_id=user_id,
+        embedding_id=embedding_id,
+        path=stored.path.relative_to(PHOTOS_ROOT).as_posix(),
+        filename=stored.path.name,
+        captured_at=datetime.utcnow(),
+        **_file_fields(stored),
+    )
+    db.add(photo)
+    return photo
+
+
+def record_capture(
+    db: Session, device_id: str, stored: StoredFile, person_name: str | None, captured_at: datetime | None
+) -> models.Capture:
+    blob_service.adopt(db, stored)
+    capture = models.Capture(
+        device_id=device_id,
+        person_name=person_name,
+        path=stored.path.relative_to(CAPTURES_ROOT).as_posix(),
+        filename=stored.path.name,
+        captured_at=captured_at,
+        **_file_fields(stored),
+    )
+    db.add(capture)
+    return capture
+
+
+def find_source(db: Session, kind: str, path: str) -> tuple[str, Path] | None:
+    """Checksum and file of an indexed original addressed by its /uploads or /captures path."""
+    if kind == "uploads":
+        model, root = models.Photo, PHOTOS_ROOT
+    elif kind == "captures":
+        model, root = models.Capture, CAPTURES_ROOT
+    else:
+        return None
+    checksum = db.query(model.checksum).filter(model.path == path).scalar()
+    return (checksum, root / path) if checksum else None
+
+
+def forget_capture(db: Session, path: Path) -> blob_service.Cleanup:
+    """
+    Drop the index row (and its blob reference) for a capture file about to be replaced.
+    The caller commits, then runs the returned cleanup.
+    """
+    rel = path.relative_to(CAPTURES_ROOT).as_posix()
+    rows = db.query(models.Capture.id, models.Capture.checksum).filter(models.Capture.path == rel).all()
+    if not rows:
+        return blob_service.Cleanup()
+    db.query(models.Capture).filter(models.Capture.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    return blob_service.release(db, [row.checksum for row in rows])
+
+
+def forget_photos(db: Session, *criteria) -> blob_service.Cleanup:
+    """
+    Delete the photos matching ``criteria``: index rows and blob references now, their files
+    through the returned cleanup, which the caller runs after committing.
+    """
+    rows = db.query(models.Photo.id, models.Photo.path, models.Photo.checksum).filter(*criteria).all()
+    if not rows:
+        return blob_service.Cleanup()
+    db.query(models.Photo).filter(models.Photo.id.in_([row.id for row in rows])).delete(synchronize_session=False)
+    cleanup = blob_service.release(db, [row.checksum for row in rows])
+    cleanup.paths.extend(PHOTOS_ROOT / row.path for row in rows)
+    return cleanup
+
+
+def embedded_photos(db: Session, checksums: list[str], model_name: str) -> dict[str, list[tuple[int, models.Embedding]]]:
+    """Existing embeddings computed by ``model_name`` from photos with these checksums, by checksum."""
+    found: dict[str, list[tuple[int, models.Embedding]]] = {}
+    if not checksums:
+        return found
+    rows = (
+        db.query(models.Photo.checksum, models.Photo.user_id, models.Embedding)
+        .join(models.Embedding, models.Embedding.id == models.Photo.embedding_id)
+        .filter(models.Photo.checksum.in_(set(checksums)), models.Embedding.model_name == model_name)
+        .order_by(models.Embedding.id)
+    )
+    for checksum, user_id, embedding in rows:
+        found.setdefault(checksum, []).append((user_id, embedding))
+    return found
+
+
+def list_photo_urls(db: Session, user_id: int) -> list[str]:
+    rows = db.query(models.Photo.path).filter(models.Photo.user_id == user_id).order_by(models.Photo.id)
+    return [photo_url(path) for (path,) in rows]
+
+
+def sync_photo_metas(db: Session, since: datetime | None = None) -> list[schemas.PhotoMeta]:
+    """Photos (with their owner's name, if the owner still exists) followed by captures."""
+    photo_query = db.query(
+        models.Photo.path, models.Photo.filename, models.Photo.captured_at, models.User.id, models.User.full_name
+    ).outerjoin(models.User, models.User.id == models.Photo.user_id)
+    capture_query = db.query(
+        models.Capture.path, models.Capture.filename, models.Capture.captured_at, models.Capture.person_name
+    )
+    if since is not None:
+        photo_query = photo_query.filter(models.Photo.created_at >= since)
+        capture_query = capture_query.filter(models.Capture.created_at >= since)
+    # Devices get the smallest variant that serves their purpose; the original stays reachable.
+    settings = get_settings()
+    metas = [
+        schemas.PhotoMeta(
+            user_id=user_id,
+            person_name=full_name,
+            filename=filename,
+            url=media_url(settings.sync_photo_variant, "uploads", path),
+            original_url=photo_url(path),
+            captured_at=captured_at,
+        )
+        for path, filename, captured_at, user_id, full_name in photo_query.order_by(models.Photo.id)
+    ]
+    metas.extend(
+        schemas.PhotoMeta(
+            user_id=None,
+            person_name=person_name,
+            filename=filename,
+            url=media_url(settings.sync_capture_variant, "captures", path),
+            original_url=capture_url(path),
+            captured_at=captured_at,
+        )
+        for path, filename, captured_at, person_name in capture_query.order_by(models.Capture.id)
+    )
+    return metas
+
+
+def _read_sidecar(file_path: Path) -> dict:
+    meta_path = file_path.with_suffix(file_path.suffix + ".json")
+    try:
+        return json.loads(meta_path.read_text()) if meta_path.exists() else {}
+    except Exception:
+        return {}
+
+
+def _images(root: Path):
+    for file_path in sorted(root.glob("*/*")):
+        if file_path.is_file() and file_path.suffix.lower() in IMAGE_SUFFIXES:
+            yield file_path
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.Photo.id).first() is None and db.query(models.Capture.id).first() is None
+
+
+def reindex(db: Session, batch_size: int = 500) -> dict[str, int]:
+    """
+    Bring the index in line with the files on disk: add rows for unindexed files and drop
+    rows whose file is gone. New files are adopted into the blob store, so the first run
+    also deduplicates an existing tree. Safe to re-run; existing rows are left untouched.
+    """
+    counts = {"photos_added": 0, "photos_removed": 0, "captures_added": 0, "captures_removed": 0}
+    known_photos = {row.path: row for row in db.query(models.Photo.path, models.Photo.id, models.Photo.checksum)}
+    known_captures = {
+        row.path: row for row in db.query(models.Capture.path, models.Capture.id, models.Capture.checksum)
+    }
+    embedding_ids = {eid for (eid,) in db.query(models.Embedding.id)}
+    pending = 0
+
+    def flush() -> None:
+        nonlocal pending
+        pending += 1
+        if pending >= batch_size:
+            db.commit()
+            pending = 0
+
+    for file_path in _images(PHOTOS_ROOT) if PHOTOS_ROOT.exists() else ():
+        rel = file_path.relative_to(PHOTOS_ROOT).as_posix()
+        if known_photos.pop(rel, None) is not None:
+            continue
+        dir_name = file_path.parent.name
+        if not dir_name.startswith("user_") or not dir_name[5:].isdigit():
+            continue
+        # Upload names photos after their embedding id.
+        embedding_id = int(file_path.stem) if file_path.stem.isdigit() else None
+        photo = record_photo(
+            db,
+            int(dir_name[5:]),
+            _stored_from_disk(file_path),
+            embedding_id if embedding_id in embedding_ids else None,
+        )
+        photo.captured_at = datetime.utcfromtimestamp(file_path.stat().st_mtime)
+        counts["photos_added"] += 1
+        flush()
+
+    for file_path in _images(CAPTURES_ROOT) if CAPTURES_ROOT.exists() else ():
+        rel = file_path.relative_to(CAPTURES_ROOT).as_posix()
+        if known_captures.pop(rel, None) is not None:
+            continue
+        meta = _read_sidecar(file_path)
+        captured_at = None
+        if meta.get("captured_at"):
+            try:
+                captured_at = datetime.fromisoformat(str(meta["captured_at"]))
+            except ValueError:
+                pass
+        record_capture(db, file_path.parent.name, _stored_from_disk(file_path), meta.get("person_name"), captured_at)
+        counts["captures_added"] += 1
+        flush()
+
+    cleanup = blob_service.Cleanup()
+    if known_photos:
+        ids = [row.id for row in known_photos.values()]
+        db.query(models.Photo).filter(models.Photo.id.in_(ids)).delete(synchronize_session=False)
+        cleanup.extend(blob_service.release(db, [row.checksum for row in known_photos.values()]))
+        counts["photos_removed"] = len(known_photos)
+    if known_captures:
+        ids = [row.id for row in known_captures.values()]
+        db.query(models.Capture).filter(models.Capture.id.in_(ids)).delete(synchronize_session=False)
+        cleanup.extend(blob_service.release(db, [row.checksum for row in known_captures.values()]))
+        counts["captures_removed"] = len(known_captures)
+    db.commit()
+    cleanup.run(db)
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Backfill the photo/capture index from data/photos and data/captures.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    args = parser.parse_args()
+
+    from backend.app.db import SessionLocal, init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    db = SessionLocal()
+    try:
+        counts = reindex(db, batch_size=args.batch_size)
+    finally:
+        db.close()
+    # Running API workers pick the new rows up within sync_snapshot_ttl_sec.
+    logger.info("Reindex finished: %s", counts)
+
+
+if __name__ == "__main__":
+    main()
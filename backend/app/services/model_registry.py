@@ -1,16 +1,29 @@
 import hashlib
 import json
+import threading
 from abc import ABC, abstractmethod
-from typing import Dict, Optional
+from typing import Callable, Dict, Optional
 
 
 class BaseEmbedder(ABC):
-    name: str = "base"
+    name: str = "base"  # vector space; embeddings are stored and matched under this name
+    registry_name: str | None = None  # key in FaceEmbedderRegistry, set on registration
 
     @abstractmethod
     def generate_embedding(self, image_bytes: bytes) -> list[float]:
         raise NotImplementedError
 
+    def generate_embeddings(self, images: list[bytes]) -> list[list[float]]:
+        """Embed several images at once. Subclasses override this to run a single batched pass."""
+        return [self.generate_embedding(image) for image in images]
+
+    def generate_face_embeddings(self, image_bytes: bytes) -> list[list[float]]:
+        """One vector per face in the frame, largest first. Embedders without detection see one face."""
+        return [self.generate_embedding(image_bytes)]
+
+    def warmup(self) -> None:
+        """Pay one-off initialization costs ahead of the first real request."""
+
 
 class HashedEmbedder(BaseEmbedder):
     """
@@ -29,12 +42,56 @@ class HashedEmbedder(BaseEmbedder):
         return repeated
 
 
+class LazyEmbedder(BaseEmbedder):
+    """
+    Builds the wrapped embedder on first use, so heavy imports (torch) and weight loading
+    are paid by the first embedding request or an explicit warm-up, not by process start.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], BaseEmbedder]):
+        self.name = name
+        self.state = "lazy"  # lazy | loading | loaded | failed
+        self._factory = factory
+        self._instance: Optional[BaseEmbedder] = None
+        self._lock = threading.Lock()
+
+    @property
+    def loaded(self) -> bool:
+        return self._instance is not None
+
+    def load(self) -> BaseEmbedder:
+        if self._instance is None:
+            with self._lock:
+                if self._instance is None:
+                    self.state = "loading"
+                    try:
+                        self._instance = self._factory()
+                    except Exception:
+                        self.state = "failed"
+                        raise
+                    self.state = "loaded"
+        return self._instance
+
+    def generate_embedding(self, image_bytes: bytes) -> list[float]:
+        return self.load().generate_embedding(image_bytes)
+
+    def generate_embeddings(self, images: list[bytes]) -> list[list[float]]:
+        return self.load().generate_embeddings(images)
+
+    def generate_face_embeddings(self, image_bytes: bytes) -> list[list[float]]:
+        return self.load().generate_face_embeddings(image_bytes)
+
+    def warmup(self) -> None:
+        self.load().warmup()
+
+
 class FaceEmbedderRegistry:
     def __init__(self):
         self._registry: Dict[str, BaseEmbedder] = {}
         self._default: Optional[str] = None
 
     def register(self, name: str, embedder: BaseEmbedder) -> None:
+        embedder.registry_name = name
         self._registry[name] = embedder
         if not self._default:
             self._default = name
@@ -44,6 +101,9 @@ class FaceEmbedderRegistry:
             raise KeyError(f"Embedder {name} is not registered")
         return self._registry[name]
 
+    def names(self) -> list[str]:
+        return list(self._registry)
+
     def get_default(self) -> BaseEmbedder:
         if not self._default:
             raise KeyError("No embedder registered")
@@ -0,0 +1,376 @@
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Callable
+
+import numpy as np
+from sqlalchemy import func, select, update
+from sqlalchemy.orm import Session
+
+from backend.app import models
+from backend.app.config import get_settings
+from backend.app.services import template_service
+from backend.app.services.active_model import get_active_model, set_active_model
+from backend.app.services.gallery_service import drop_gallery, invalidate_galleries
+from backend.app.services.media_service import PHOTOS_ROOT
+from backend.app.services.model_registry import BaseEmbedder
+from backend.app.services.sync_service import invalidate_sync_snapshot
+from backend.app.services.template_service import Member
+from backend.app.services.vector_codec import encode_vector
+
+logger = logging.getLogger(__name__)
+
+OPEN_STATUSES = ("pending", "running", "paused")
+
+
+def _pending_photos(db: Session, job: models.ReembedJob, limit: int) -> list:
+    """Enrolled photos past the checkpoint whose current embedding is not yet in the target space."""
+    return (
+        db.query(models.Photo.id, models.Photo.user_id, models.Photo.path, models.Photo.checksum)
+        .join(models.Embedding, models.Embedding.id == models.Photo.embedding_id)
+        .filter(models.Photo.id > job.last_photo_id, models.Embedding.model_name != job.model_name)
+        .order_by(models.Photo.id)
+        .limit(limit)
+        .all()
+    )
+
+
+def create_job(db: Session, embedder_name: str, model_name: str, batch_size: int | None = None) -> models.ReembedJob:
+    """
+    Queue a re-embedding into ``model_name``. That partition is not the active one, so rows
+    left in it by an earlier job or model are dropped and the job rebuilds it from scratch.
+    """
+    db.query(models.Embedding).filter(models.Embedding.model_name == model_name).delete(synchronize_session=False)
+    template_service.delete_model(db, model_name)
+    total = (
+        db.query(func.count(models.Photo.id))
+        .join(models.Embedding, models.Embedding.id == models.Photo.embedding_id)
+        .scalar()
+    )
+    job = models.ReembedJob(
+        embedder_name=embedder_name,
+        model_name=model_name,
+        status="pending",
+        batch_size=batch_size or get_settings().reembed_batch_size,
+        total=total or 0,
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    drop_gallery(model_name)
+    return job
+
+
+def queue_for_changed_space(db: Session, embedder_name: str, model_name: str) -> models.ReembedJob | None:
+    """
+    Queue a re-embedding when the active embedder now produces ``model_name`` instead of the
+    stored active model, e.g. FaceNet after face alignment was enabled. New enrollments and
+    probes already use the new space; the job brings the existing photos over.
+    """
+    active = get_active_model(db)
+    if active is None or active.embedder_name != embedder_name or active.model_name == model_name:
+        return None
+    if open_job(db) is not None:
+        return None
+    return create_job(db, embedder_name, model_name)
+
+
+def get_job(db: Session, job_id: int) -> models.ReembedJob | None:
+    return db.get(models.ReembedJob, job_id)
+
+
+def list_jobs(db: Session, limit: int = 20) -> list[models.ReembedJob]:
+    return db.query(models.ReembedJob).order_by(models.ReembedJob.id.desc()).limit(limit).all()
+
+
+def open_job(db: Session) -> models.ReembedJob | None:
+    return db.query(models.ReembedJob).filter(models.ReembedJob.status.in_(OPEN_STATUSES)).first()
+
+
+def set_status(db: Session, job: models.ReembedJob, status: str, expected: tuple[str, ...]) -> bool:
+    """Compare-and-set on the status column, so a worker and an API call never both win."""
+    changed = (
+        db.query(models.ReembedJob)
+        .filter(models.ReembedJob.id == job.id, models.ReembedJob.status.in_(expected))
+        .update(
+            {
+                models.ReembedJob.status: status,
+                models.ReembedJob.updated_at: datetime.utcnow(),
+                models.ReembedJob.finished_at: datetime.utcnow() if status in ("completed", "failed", "cancelled") else None,
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    db.refresh(job)
+    return bool(changed)
+
+
+def cancel_job(db: Session, job: models.ReembedJob) -> bool:
+    if not set_status(db, job, "cancelled", OPEN_STATUSES):
+        return False
+    # A batch in flight re-checks the status before committing, so nothing lands after this.
+    db.query(models.Embedding).filter(models.Embedding.model_name == job.model_name).delete(synchronize_session=False)
+    template_service.delete_model(db, job.model_name)
+    db.commit()
+    drop_gallery(job.model_name)
+    return True
+
+
+def claim_job(db: Session) -> models.ReembedJob | None:
+    """Take the oldest pending job, or a running one whose owner stopped making progress."""
+    stale_before = datetime.utcnow() - timedelta(seconds=get_settings().reembed_stale_sec)
+    candidates = (
+        db.query(models.ReembedJob)
+        .filter(
+            (models.ReembedJob.status == "pending")
+            | ((models.ReembedJob.status == "running") & (models.ReembedJob.updated_at < stale_before))
+        )
+        .order_by(models.ReembedJob.id)
+        .all()
+    )
+    for job in candidates:
+        claimed = db.execute(
+            update(models.ReembedJob)
+            .where(
+                models.ReembedJob.id == job.id,
+                models.ReembedJob.status == job.status,
+                models.ReembedJob.updated_at == job.updated_at,
+            )
+            .values(status="running", updated_at=datetime.utcnow())
+        ).rowcount
+        db.commit()
+        if claimed:
+            db.refresh(job)
+            return job
+    return None
+
+
+def _embed(embedder: BaseEmbedder, images: list[bytes]) -> list[list[float] | None]:
+    try:
+        return list(embedder.generate_embeddings(images))
+    except Exception:
+        # Same fallback as the request batcher: one bad photo must not sink its batch.
+        vectors: list[list[float] | None] = []
+        for image in images:
+            try:
+                vectors.append(embedder.generate_embedding(image))
+            except Exception:
+                logger.debug("Re-embedding failed for one photo", exc_info=True)
+                vectors.append(None)
+        return vectors
+
+
+def run_batch(db: Session, job: models.ReembedJob, embedder: BaseEmbedder, link: bool = False) -> int | None:
+    """
+    Embed the next ``job.batch_size`` photos and advance the checkpoint in the same
+    transaction, so a crash repeats at most the batch in progress. Returns how many photos
+    were handled, 0 when none are left, or None when the job stopped being ``job.status``.
+    With ``link`` the photos are repointed at their new embedding straight away.
+    """
+    expected = job.status
+    rows = _pending_photos(db, job, job.batch_size)
+    if not rows:
+        # End the read transaction so a pause or cancel committed meanwhile is visible.
+        db.rollback()
+        db.refresh(job)
+        return 0 if job.status == expected else None
+    images: dict[str, bytes] = {}
+    for row in rows:
+        if row.checksum not in images:
+            try:
+                images[row.checksum] = (PHOTOS_ROOT / row.path).read_bytes()
+            except OSError:
+                logger.warning("Photo %s is missing, skipping it", row.path)
+    checksums = list(images)
+    # Identical bytes are embedded once per batch, like enrollment deduplication.
+    by_checksum = dict(zip(checksums, _embed(embedder, [images[c] for c in checksums])))
+    dtype = get_settings().embedding_dtype
+    added: list[tuple] = []  # (photo row, new embedding)
+    for row in rows:
+        vector = by_checksum.get(row.checksum)
+        if vector is None:
+            continue
+        embedding = models.Embedding(
+            user_id=row.user_id, vector=encode_vector(vector, dtype), model_name=job.model_name, photo_id=row.id
+        )
+        db.add(embedding)
+        added.append((row, embedding))
+    db.flush()
+    # Templates of the new partition grow with it, so they are ready at cutover.
+    template_service.add_members(
+        db,
+        [
+            Member(row.user_id, job.model_name, embedding.id, np.asarray(by_checksum[row.checksum], dtype=np.float32))
+            for row, embedding in added
+        ],
+    )
+    if link:
+        for row, embedding in added:
+            db.query(models.Photo).filter(models.Photo.id == row.id).update(
+                {models.Photo.embedding_id: embedding.id}, synchronize_session=False
+            )
+    advanced = (
+        db.query(models.ReembedJob)
+        .filter(models.ReembedJob.id == job.id, models.ReembedJob.status == expected)
+        .update(
+            {
+                models.ReembedJob.last_photo_id: rows[-1].id,
+                models.ReembedJob.processed: models.ReembedJob.processed + len(added),
+                models.ReembedJob.failed: models.ReembedJob.failed + len(rows) - len(added),
+                models.ReembedJob.updated_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    if not advanced:
+        db.rollback()
+        return None
+    db.commit()
+    db.refresh(job)
+    return len(rows)
+
+
+def cut_over(db: Session, job: models.ReembedJob) -> bool:
+    """
+    Switch matching to the new partition in one transaction: drop copies of photos that were
+    un-enrolled while the job ran, repoint photos at their new embeddings, mark the job done
+    and store the new active model. Returns False if photos arrived since the last batch.
+    """
+    if _pending_photos(db, job, 1):
+        return False
+    enrolled = select(models.Photo.id).join(models.Embedding, models.Embedding.id == models.Photo.embedding_id)
+    dropped = db.query(models.Embedding).filter(
+        models.Embedding.model_name == job.model_name,
+        models.Embedding.photo_id.is_not(None),
+        models.Embedding.photo_id.not_in(enrolled),
+    ).delete(synchronize_session=False)
+    replacement = (
+        select(func.max(models.Embedding.id))
+        .where(models.Embedding.photo_id == models.Photo.id, models.Embedding.model_name == job.model_name)
+        .scalar_subquery()
+    )
+    db.execute(
+        update(models.Photo)
+        .where(replacement.is_not(None))
+        .values(embedding_id=replacement)
+        .execution_options(synchronize_session=False)
+    )
+    done = (
+        db.query(models.ReembedJob)
+        .filter(models.ReembedJob.id == job.id, models.ReembedJob.status == "running")
+        .update(
+            {
+                models.ReembedJob.status: "completed",
+                models.ReembedJob.updated_at: datetime.utcnow(),
+                models.ReembedJob.finished_at: datetime.utcnow(),
+            },
+            synchronize_session=False,
+        )
+    )
+    if not done:
+        db.rollback()
+        return False
+    set_active_model(db, job.embedder_name, job.model_name)
+    db.commit()
+    db.refresh(job)
+    if dropped:
+        template_service.rebuild_model(db, job.model_name)
+    invalidate_galleries()
+    invalidate_sync_snapshot()
+    logger.info("Cut over to %s (%s): %d photos re-embedded", job.embedder_name, job.model_name, job.processed)
+    return True
+
+
+class ReembedWorker:
+    """
+    Daemon thread that runs re-embedding jobs batch by batch, pausing ``pause_ms`` between
+    batches (twice that while ``busy`` reports queued live inference). Every ``poll_sec`` it
+    also hands the active model stored in the database to ``on_active``, which is how worker
+    processes that did not run the job pick up a cutover.
+    """
+
+    def __init__(
+        self,
+        session_factory,
+        resolve_embedder: Callable[[str], BaseEmbedder],
+        on_active: Callable[[Session], None],
+        busy: Callable[[], bool],
+        poll_sec: int,
+        pause_ms: int,
+    ):
+        self._session_factory = session_factory
+        self._resolve_embedder = resolve_embedder
+        self._on_active = on_active
+        self._busy = busy
+        self.poll_sec = poll_sec
+        self.pause_ms = pause_ms
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: threading.Thread | None = None
+        self._current: int | None = None
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="reembed", daemon=True)
+        self._thread.start()
+
+    def wake(self) -> None:
+        self._wake.set()
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            db = self._session_factory()
+            try:
+                self._on_active(db)
+                job = claim_job(db)
+                if job is not None:
+                    self._work(db, job)
+            except Exception:
+                logger.exception("Re-embedding worker failed")
+            finally:
+                db.close()
+            self._wake.wait(self.poll_sec)
+            self._wake.clear()
+
+    def _work(self, db: Session, job: models.ReembedJob) -> None:
+        self._current = job.id
+        try:
+            embedder = self._resolve_embedder(job.embedder_name)
+            logger.info("Re-embedding job %d into %s started at photo %d", job.id, job.model_name, job.last_photo_id)
+            while not self._stop.is_set():
+                handled = run_batch(db, job, embedder)
+                if handled is None:
+                    return  # paused or cancelled through the API
+                if handled == 0:
+                    if cut_over(db, job):
+                        self._on_active(db)
+                        # Enrollments that raced the cutover still carry the old model.
+                        while run_batch(db, job, embedder, link=True):
+                            pass
+                        return
+                    if job.status != "running":
+                        return  # paused or cancelled after the last batch
+                    # Photos enrolled since the last batch; take them after the usual pause.
+                pause = self.pause_ms * (2 if self._busy() else 1)
+                self._stop.wait(pause / 1000)
+        except Exception as exc:
+            db.rollback()
+            logger.exception("Re-embedding job %d failed", job.id)
+            job.error = str(exc)
+            set_status(db, job, "failed", ("running",))
+        finally:
+            self._current = None
+
+    def stats(self) -> dict:
+        return {"running": self._thread is not None, "current_job": self._current}
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(5)
+        self._thread = None
@@ -0,0 +1,251 @@
+"""
+Event log retention: hourly/daily rollups and archiving of old raw events.
+
+Hourly rollups are aggregated from ``event_logs`` and daily rollups from the hourly ones,
+so dashboards keep full history after raw rows are archived. Raw events older than
+``event_retention_days`` are written to one gzip CSV per day under ``event_archive_dir``
+and then deleted. Only complete buckets are rolled up, and rollups always run before
+archiving, so no event leaves the table without being counted.
+"""
+import csv
+import gzip
+import logging
+import os
+import threading
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+
+from backend.app import models
+from backend.app.config import get_settings
+from backend.app.services.event_service import EXPORT_COLUMNS
+
+logger = logging.getLogger(__name__)
+
+_STEP = {"hour": timedelta(hours=1), "day": timedelta(days=1)}
+
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    value = value.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        value = value.replace(hour=0)
+    return value
+
+
+def _bucket_expr(db: Session, column, granularity: str):
+    if db.get_bind().dialect.name == "sqlite":
+        fmt = "%Y-%m-%d %H:00:00" if granularity == "hour" else "%Y-%m-%d 00:00:00"
+        return func.strftime(fmt, column)
+    return func.date_trunc(granularity, column)
+
+
+def _as_datetime(value) -> datetime:
+    return value if isinstance(value, datetime) else datetime.fromisoformat(str(value))
+
+
+def _rollup_range(db: Session, granularity: str, now: datetime) -> tuple[datetime, datetime] | None:
+    end = truncate(now, granularity)
+    watermark = (
+        db.query(func.max(models.EventRollup.bucket_start)).filter(models.EventRollup.granularity == granularity).scalar()
+    )
+    if watermark is not None:
+        start = _as_datetime(watermark) + _STEP[granularity]
+    elif granularity == "hour":
+        first = db.query(func.min(models.EventLog.created_at)).scalar()
+        if first is None:
+            return None
+        start = truncate(_as_datetime(first), granularity)
+    else:
+        first = (
+            db.query(func.min(models.EventRollup.bucket_start)).filter(models.EventRollup.granularity == "hour").scalar()
+        )
+        if first is None:
+            return None
+        start = truncate(_as_datetime(first), granularity)
+    return (start, end) if start < end else None
+
+
+def rollup_hourly(db: Session, now: datetime | None = None) -> int:
+    window = _rollup_range(db, "hour", now or datetime.utcnow())
+    if window is None:
+        return 0
+    start, end = window
+    ev = models.EventLog
+    bucket = _bucket_expr(db, ev.created_at, "hour")
+    rows = (
+        db.query(
+            bucket,
+            ev.device_id,
+            ev.user_id,
+            ev.status,
+            func.count(ev.id),
+            func.coalesce(func.sum(ev.confidence), 0.0),
+            func.count(ev.confidence),
+        )
+        .filter(ev.created_at >= start, ev.created_at < end)
+        .group_by(bucket, ev.device_id, ev.user_id, ev.status)
+        .all()
+    )
+    return _store(db, "hour", start, end, rows)
+
+
+def rollup_daily(db: Session, now: datetime | None = None) -> int:
+    window = _rollup_range(db, "day", now or datetime.utcnow())
+    if window is None:
+        return 0
+    start, end = window
+    ru = models.EventRollup
+    bucket = _bucket_expr(db, ru.bucket_start, "day")
+    rows = (
+        db.query(
+            bucket,
+            ru.device_id,
+            ru.user_id,
+            ru.status,
+            func.sum(ru.count),
+            func.sum(ru.confidence_sum),
+            func.sum(ru.confidence_count),
+        )
+        .filter(ru.granularity == "hour", ru.bucket_start >= start, ru.bucket_start < end)
+        .group_by(bucket, ru.device_id, ru.user_id, ru.status)
+        .all()
+    )
+    return _store(db, "day", start, end, rows)
+
+
+def _store(db: Session, granularity: str, start: datetime, end: datetime, rows) -> int:
+    # Replace the window wholesale so a re-run after a crash cannot double count.
+    db.query(models.EventRollup).filter(
+        models.EventRollup.granularity == granularity,
+        models.EventRollup.bucket_start >= start,
+        models.EventRollup.bucket_start < end,
+    ).delete(synchronize_session=False)
+    values = [
+        {
+            "granularity": granularity,
+            "bucket_start": _as_datetime(bucket_start),
+            "device_id": device_id,
+            "user_id": user_id,
+            "status": status,
+            "count": int(count),
+            "confidence_sum": float(conf_sum or 0.0),
+            "confidence_count": int(conf_count or 0),
+        }
+        for bucket_start, device_id, user_id, status, count, conf_sum, conf_count in rows
+    ]
+    if values:
+        db.execute(insert(models.EventRollup), values)
+    db.commit()
+    return len(values)
+
+
+def archive_events(db: Session, now: datetime | None = None) -> tuple[int, list[str]]:
+    """Move raw events older than the retention window into per-day gzip CSV files."""
+    settings = get_settings()
+    if settings.event_retention_days <= 0:
+        return 0, []
+    cutoff = truncate((now or datetime.utcnow()) - timedelta(days=settings.event_retention_days), "day")
+    # Never archive what the hourly rollup has not covered yet.
+    rolled = db.query(func.max(models.EventRollup.bucket_start)).filter(models.EventRollup.granularity == "hour").scalar()
+    if rolled is None:
+        return 0, []
+    cutoff = min(cutoff, truncate(_as_datetime(rolled) + _STEP["hour"], "day"))
+    archive_dir = Path(settings.event_archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    archived = 0
+    files: list[str] = []
+    while True:
+        first = db.query(func.min(models.EventLog.created_at)).filter(models.EventLog.created_at < cutoff).scalar()
+        if first is None:
+            break
+        day_start = truncate(_as_datetime(first), "day")
+        day_end = day_start + _STEP["day"]
+        in_day = (models.EventLog.created_at >= day_start, models.EventLog.created_at < day_end)
+        columns = [getattr(models.EventLog, name) for name in EXPORT_COLUMNS]
+        path = archive_dir / f"events-{day_start:%Y-%m-%d}.csv.gz"
+        is_new = not path.exists()
+        count = 0
+        # Appending adds a new gzip member; readers see one continuous CSV.
+        with gzip.open(path, "at", newline="") as fh:
+            writer = csv.writer(fh)
+            if is_new:
+                writer.writerow(EXPORT_COLUMNS)
+            for row in db.query(*columns).filter(*in_day).order_by(models.EventLog.id).yield_per(1000):
+                writer.writerow(row)
+                count += 1
+        with open(path, "rb") as fh:
+            os.fsync(fh.fileno())
+        db.query(models.EventLog).filter(*in_day).delete(synchronize_session=False)
+        db.commit()
+        archived += count
+        files.append(str(path))
+    return archived, files
+
+
+def run_compaction(db: Session, now: datetime | None = None) -> dict:
+    now = now or datetime.utcnow()
+    hourly = rollup_hourly(db, now)
+    daily = rollup_daily(db, now)
+    archived, files = archive_events(db, now)
+    if hourly or daily or archived:
+        logger.info("Event compaction: %d hourly, %d daily buckets, %d events archived", hourly, daily, archived)
+    return {"hourly_buckets": hourly, "daily_buckets": daily, "archived_events": archived, "archive_files": files}
+
+
+def list_rollups(
+    db: Session,
+    granularity: str = "hour",
+    since: datetime | None = None,
+    until: datetime | None = None,
+    device_id: str | None = None,
+    user_id: int | None = None,
+    status: str | None = None,
+) -> list[models.EventRollup]:
+    query = db.query(models.EventRollup).filter(models.EventRollup.granularity == granularity)
+    if since is not None:
+        query = query.filter(models.EventRollup.bucket_start >= since)
+    if until is not None:
+        query = query.filter(models.EventRollup.bucket_start < until)
+    if device_id is not None:
+        query = query.filter(models.EventRollup.device_id == device_id)
+    if user_id is not None:
+        query = query.filter(models.EventRollup.user_id == user_id)
+    if status is not None:
+        query = query.filter(models.EventRollup.status == status)
+    return query.order_by(models.EventRollup.bucket_start).all()
+
+
+class CompactionScheduler:
+    """Runs ``run_compaction`` every ``interval_sec`` on a daemon thread."""
+
+    def __init__(self, session_factory, interval_sec: int):
+        self._session_factory = session_factory
+        self.interval_sec = interval_sec
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is not None or self.interval_sec <= 0:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="event-compaction", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_sec):
+            db = self._session_factory()
+            try:
+                run_compaction(db)
+            except Exception:
+                logger.exception("Event compaction failed")
+            finally:
+                db.close()
+
+    def stop(self) -> None:
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._thread.join(5)
+        self._thread = None
@@ -1,85 +1,83 @@
 import hashlib
-from datetime import datetime
-from pathlib import Path
-from typing import Tuple
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
 
+from pydantic import TypeAdapter
 from sqlalchemy.orm import Session
 
 from backend.app import models, schemas
+from backend.app.compression import encode_all
 from backend.app.config import get_settings
+from backend.app.metrics import SYNC_BUILD, SYNC_BYTES
+from backend.app.services.active_model import get_active_model
+from backend.app.services.bundle_service import get_manifests
+from backend.app.services.media_service import sync_photo_metas
 
-BASE_DIR = Path(__file__).resolve().parents[3]
-PHOTOS_ROOT = BASE_DIR / "data" / "photos"
-CAPTURES_ROOT = BASE_DIR / "data" / "captures"
+# Exactly the UserOut / AccessWindowOut fields, so rows serialize without loading ORM objects.
+USER_OUT_COLUMNS = (
+    models.User.id,
+    models.User.full_name,
+    models.User.identifier,
+    models.User.is_active,
+    models.User.expires_at,
+    models.User.created_at,
+    models.User.updated_at,
+)
+WINDOW_OUT_COLUMNS = (
+    models.AccessWindow.id,
+    models.AccessWindow.day_of_week,
+    models.AccessWindow.start_time,
+    models.AccessWindow.end_time,
+)
+_USER_LIST = TypeAdapter(list[schemas.UserOut])
+_WINDOW_LIST = TypeAdapter(list[schemas.AccessWindowOut])
+# Cursors lag the clock slightly so rows committed while a payload is built are re-sent, never lost.
+CURSOR_SKEW = timedelta(seconds=5)
 
 
-def build_sync_payload(db: Session) -> tuple[schemas.SyncPayload, str]:
+def parse_cursor(raw: str) -> datetime:
+    value = datetime.fromisoformat(raw)
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def build_sync_payload(db: Session, since: datetime | None = None) -> tuple[schemas.SyncPayload, str]:
+    """
+    Build the device sync payload. With ``since`` only users, windows and photos changed
+    after that cursor are returned, together with tombstones of deleted entities. A cursor
+    older than the tombstone retention falls back to a full payload.
+    """
+    started = time.perf_counter()
     settings = get_settings()
-    users = [schemas.UserOut.model_validate(user) for user in db.query(models.User).all()]
-    windows = [schemas.AccessWindowOut.model_validate(w) for w in db.query(models.AccessWindow).all()]
-    photos: list[schemas.PhotoMeta] = []
-    user_lookup = {user.id: user for user in users}
-    if PHOTOS_ROOT.exists():
-        for user_dir in PHOTOS_ROOT.iterdir():
-            if not user_dir.is_dir():
-                continue
-            name = user_dir.name
-            if not name.startswith("user_"):
-                continue
-            try:
-                uid = int(name.split("_", 1)[1])
-            except Exception:
-                continue
-            for file_path in user_dir.iterdir():
-                if not file_path.is_file():
-                    continue
-                if file_path.suffix.lower() not in {".jpg", ".jpeg", ".png"}:
-                    continue
-                stat = file_path.stat()
-                user_obj = user_lookup.get(uid)
-                photos.append(
-                    schemas.PhotoMeta(
-                        user_id=uid if user_obj else None,
-                        person_name=user_obj.full_name if user_obj else None,
-                        filename=file_path.name,
-                        url=f"/uploads/user_{uid}/{file_path.name}",
-                        captured_at=datetime.fromtimestamp(stat.st_mtime),
-                    )
-                )
-    if CAPTURES_ROOT.exists():
-        for device_dir in CAPTURES_ROOT.iterdir():
-            if not device_dir.is_dir():
-                continue
-            for file_path in device_dir.iterdir():
-                if not file_path.is_file():
-                    continue
-                if file_path.suffix.lower() not in {".jpg", ".jpeg", ".png"}:
-                    continue
-                meta_path = file_path.with_suffix(file_path.suffix + ".json")
-                person_name = None
-                captured_at = None
-                try:
-                    if meta_path.exists():
-                        import json
-
-                        meta = json.loads(meta_path.read_text())
-                        person_name = meta.get("person_name")
-                        captured_at_raw = meta.get("captured_at")
-                        if captured_at_raw:
-                            captured_at = datetime.fromisoformat(str(captured_at_raw))
-                except Exception:
-                    pass
-                photos.append(
-                    schemas.PhotoMeta(
-                        user_id=None,
-                        person_name=person_name,
-                        filename=file_path.name,
-                        url=f"/captures/{device_dir.name}/{file_path.name}",
-                        captured_at=captured_at,
-                    )
-                )
+    now = datetime.utcnow()
+    if since is not None and since < now - timedelta(days=settings.sync_tombstone_retention_days):
+        since = None
+
+    # Column queries skip ORM identity-map bookkeeping; the rows are then turned into models in
+    # one pydantic-core pass, which is cheaper than a Python-level constructor call per row.
+    user_query = db.query(*USER_OUT_COLUMNS)
+    window_query = db.query(*WINDOW_OUT_COLUMNS)
+    deleted: list[schemas.SyncTombstoneOut] = []
+    if since is not None:
+        user_query = user_query.filter(models.User.updated_at >= since)
+        window_query = window_query.join(models.User).filter(models.User.updated_at >= since)
+        deleted = [
+            schemas.SyncTombstoneOut.model_construct(**row._asdict())
+            for row in db.query(
+                models.SyncTombstone.entity, models.SyncTombstone.entity_id, models.SyncTombstone.deleted_at
+            ).filter(models.SyncTombstone.deleted_at >= since)
+        ]
+    user_fields = [column.key for column in USER_OUT_COLUMNS]
+    window_fields = [column.key for column in WINDOW_OUT_COLUMNS]
+    users = _USER_LIST.validate_python([dict(zip(user_fields, row)) for row in user_query.all()])
+    windows = _WINDOW_LIST.validate_python([dict(zip(window_fields, row)) for row in window_query.all()])
+    photos = sync_photo_metas(db, since)
     config = {
         "threshold": settings.threshold,
+        "match_mode": settings.match_mode,
         "gpio_pin": settings.gpio_pin,
         "gpio_pulse_ms": settings.gpio_pulse_ms,
         "sync_interval_sec": settings.sync_interval_sec,
@@ -89,6 +87,84 @@ def build_sync_payload(db: Session) -> tuple[schemas.SyncPayload, str]:
         users=users,
         access_windows=windows,
         config=config,
+        full=since is None,
+        deleted=deleted,
+        embedding_bundles=get_manifests(db),
+        active_model=active.model_name if (active := get_active_model(db)) else None,
     )
+    # The cursor is left out of the hash so an unchanged delta still yields a stable ETag.
     payload_hash = hashlib.sha256(payload.model_dump_json().encode()).hexdigest()
+    payload.cursor = (now - CURSOR_SKEW).isoformat()
+    SYNC_BUILD.labels("full" if since is None else "delta").observe(time.perf_counter() - started)
     return payload, payload_hash
+
+
+@dataclass(frozen=True)
+class SyncSnapshot:
+    """Pre-serialized full sync response shared by every device poll."""
+
+    version: int
+    payload_hash: str
+    cursor: str
+    body: bytes
+    encoded: dict[str, bytes]  # body per content-coding, see app.compression
+    built_at: float
+
+
+_snapshot: SyncSnapshot | None = None
+_snapshot_version = 0
+_snapshot_lock = threading.Lock()
+_version_lock = threading.Lock()
+
+
+def invalidate_sync_snapshot() -> None:
+    """Called by every write path that changes what a full sync returns."""
+    global _snapshot_version
+    with _version_lock:
+        _snapshot_version += 1
+
+
+def _is_fresh(snapshot: SyncSnapshot | None) -> bool:
+    if snapshot is None or snapshot.version != _snapshot_version:
+        return False
+    ttl = get_settings().sync_snapshot_ttl_sec
+    return ttl <= 0 or time.monotonic() - snapshot.built_at < ttl
+
+
+def get_sync_snapshot(db: Session) -> SyncSnapshot:
+    """
+    Return the cached full payload, rebuilding it at most once per invalidation.
+    Concurrent callers wait on the lock and then reuse the snapshot the first one built.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if _is_fresh(snapshot):
+        return snapshot
+    with _snapshot_lock:
+        snapshot = _snapshot
+        if _is_fresh(snapshot):
+            return snapshot
+        # Read the version first: an invalidation during the build must trigger another rebuild.
+        version = _snapshot_version
+        payload, payload_hash = build_sync_payload(db)
+        body = payload.model_dump_json().encode()
+        snapshot = SyncSnapshot(
+            version=version,
+            payload_hash=payload_hash,
+            cursor=payload.cursor,
+            body=body,
+            encoded=encode_all(body),
+            built_at=time.monotonic(),
+        )
+        _snapshot = snapshot
+        SYNC_BYTES.labels("snapshot", "identity").observe(len(body))
+        for encoding, data in snapshot.encoded.items():
+            SYNC_BYTES.labels("snapshot", encoding).observe(len(data))
+        return snapshot
+
+
+def prune_tombstones(db: Session) -> int:
+    horizon = datetime.utcnow() - timedelta(days=get_settings().sync_tombstone_retention_days)
+    removed = db.query(models.SyncTombstone).filter(models.SyncTombstone.deleted_at < horizon).delete()
+    db.commit()
+    return removed
@@ -0,0 +1,298 @@
+"""
+Per-user templates: the L2-normalized centroid of a user's embeddings plus up to
+``template_exemplars`` diverse members picked by farthest-point selection. Matching against
+templates costs ``users * (exemplars + 1)`` dot products however many photos were enrolled.
+
+Templates are kept up to date incrementally. An added embedding updates the running sum
+and competes for an exemplar slot against the current exemplars only. A removal updates
+the sum and rebuilds from the user's remaining rows only when it removed an exemplar.
+"""
+import json
+import logging
+import threading
+from collections import defaultdict
+from itertools import groupby
+from typing import Iterable, NamedTuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from backend.app import models
+from backend.app.config import get_settings
+from backend.app.services import generation
+from backend.app.services.gallery_service import Match, similarity_to_distance
+from backend.app.services.vector_codec import decode_vector, encode_vector
+from backend.app.services.vector_index import FlatIndex, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+
+class Member(NamedTuple):
+    user_id: int
+    model_name: str
+    embedding_id: int
+    vector: np.ndarray
+
+
+def select_exemplars(matrix: np.ndarray, centroid: np.ndarray, k: int, max_distance: float) -> list[int]:
+    """
+    Farthest-point selection over unit rows, seeded with the row closest to the centroid.
+    Rows farther than ``max_distance`` from the centroid would always win that contest, so
+    they are only considered when nothing else is left.
+    """
+    distances = 1.0 - matrix @ centroid
+    candidates = np.flatnonzero(distances <= max_distance)
+    if not candidates.shape[0]:
+        candidates = np.arange(matrix.shape[0])
+    if candidates.shape[0] <= k:
+        return candidates.tolist()
+    chosen = [int(candidates[np.argmin(distances[candidates])])]
+    nearest = 1.0 - matrix[candidates] @ matrix[chosen[0]]
+    while len(chosen) < k:
+        pick = int(np.argmax(nearest))
+        chosen.append(int(candidates[pick]))
+        nearest = np.minimum(nearest, 1.0 - matrix[candidates] @ matrix[candidates[pick]])
+    return chosen
+
+
+def _unit(vector: np.ndarray) -> np.ndarray:
+    return normalize_rows(vector).ravel()
+
+
+def _exemplar_matrix(template: models.UserTemplate) -> np.ndarray:
+    dim = decode_vector(template.centroid).shape[0]
+    return np.frombuffer(template.exemplars, dtype="<f4").reshape(-1, dim)
+
+
+def _store(
+    db: Session,
+    template: models.UserTemplate | None,
+    user_id: int,
+    model_name: str,
+    vector_sum: np.ndarray,
+    count: int,
+    ids: list[int],
+    matrix: np.ndarray,
+) -> models.UserTemplate:
+    centroid = _unit(vector_sum)
+    chosen = select_exemplars(matrix, centroid, get_settings().template_exemplars, get_settings().template_outlier_distance)
+    if template is None:
+        template = models.UserTemplate(user_id=user_id, model_name=model_name)
+        db.add(template)
+    template.centroid = encode_vector(centroid)
+    template.vector_sum = encode_vector(vector_sum)
+    template.embedding_count = count
+    template.exemplar_ids = json.dumps([ids[i] for i in chosen])
+    template.exemplars = np.ascontiguousarray(matrix[chosen], dtype="<f4").tobytes()
+    return template
+
+
+def get_template(db: Session, user_id: int, model_name: str) -> models.UserTemplate | None:
+    return (
+        db.query(models.UserTemplate)
+        .filter(models.UserTemplate.user_id == user_id, models.UserTemplate.model_name == model_name)
+        .first()
+    )
+
+
+def list_templates(db: Session, user_id: int, model_name: str | None = None) -> list[models.UserTemplate]:
+    query = db.query(models.UserTemplate).filter(models.UserTemplate.user_id == user_id)
+    if model_name is not None:
+        query = query.filter(models.UserTemplate.model_name == model_name)
+    return query.order_by(models.UserTemplate.model_name).all()
+
+
+def _member_rows(db: Session, user_id: int, model_name: str) -> tuple[list[int], np.ndarray]:
+    rows = (
+        db.query(models.Embedding.id, models.Embedding.vector)
+        .filter(models.Embedding.user_id == user_id, models.Embedding.model_name == model_name)
+        .order_by(models.Embedding.id)
+        .all()
+    )
+    if not rows:
+        return [], np.empty((0, 0), dtype=np.float32)
+    return [row.id for row in rows], normalize_rows(np.stack([decode_vector(row.vector) for row in rows]))
+
+
+def rebuild_user(db: Session, user_id: int, model_name: str) -> models.UserTemplate | None:
+    """Recompute one template from the user's rows; the caller commits."""
+    template = get_template(db, user_id, model_name)
+    ids, matrix = _member_rows(db, user_id, model_name)
+    if not ids:
+        if template is not None:
+            db.delete(template)
+        return None
+    return _store(db, template, user_id, model_name, matrix.sum(axis=0), len(ids), ids, matrix)
+
+
+def add_members(db: Session, members: Iterable[Member]) -> None:
+    """Fold newly stored embeddings into their templates; the caller commits."""
+    grouped: dict[tuple[int, str], list[Member]] = defaultdict(list)
+    for member in members:
+        grouped[(member.user_id, member.model_name)].append(member)
+    for (user_id, model_name), added in grouped.items():
+        template = get_template(db, user_id, model_name)
+        if template is None:
+            rebuild_user(db, user_id, model_name)
+            continue
+        matrix = normalize_rows(np.stack([member.vector for member in added]))
+        if matrix.shape[1] != decode_vector(template.centroid).shape[0]:
+            logger.warning("Embedding dimension changed for user %d on %s, rebuilding", user_id, model_name)
+            rebuild_user(db, user_id, model_name)
+            continue
+        vector_sum = decode_vector(template.vector_sum).astype(np.float32) + matrix.sum(axis=0)
+        _store(
+            db,
+            template,
+            user_id,
+            model_name,
+            vector_sum,
+            template.embedding_count + len(added),
+            json.loads(template.exemplar_ids) + [member.embedding_id for member in added],
+            np.vstack([_exemplar_matrix(template), matrix]),
+        )
+
+
+def remove_members(db: Session, members: Iterable[Member]) -> None:
+    """Take deleted embeddings out of their templates; the caller commits."""
+    grouped: dict[tuple[int, str], list[Member]] = defaultdict(list)
+    for member in members:
+        grouped[(member.user_id, member.model_name)].append(member)
+    for (user_id, model_name), removed in grouped.items():
+        template = get_template(db, user_id, model_name)
+        if template is None:
+            continue
+        exemplar_ids = json.loads(template.exemplar_ids)
+        removed_ids = {member.embedding_id for member in removed}
+        count = template.embedding_count - len(removed)
+        if count <= 0 or removed_ids & set(exemplar_ids):
+            rebuild_user(db, user_id, model_name)
+            continue
+        matrix = normalize_rows(np.stack([member.vector for member in removed]))
+        vector_sum = decode_vector(template.vector_sum).astype(np.float32) - matrix.sum(axis=0)
+        _store(db, template, user_id, model_name, vector_sum, count, exemplar_ids, _exemplar_matrix(template))
+
+
+def rebuild_model(db: Session, model_name: str) -> int:
+    """Recompute every template of one model from scratch."""
+    delete_model(db, model_name)
+    rows = (
+        db.query(models.Embedding.user_id, models.Embedding.id, models.Embedding.vector)
+        .filter(models.Embedding.model_name == model_name)
+        .order_by(models.Embedding.user_id, models.Embedding.id)
+        .yield_per(1000)
+    )
+    built = 0
+    for user_id, group in groupby(rows, key=lambda row: row.user_id):
+        group = list(group)
+        matrix = normalize_rows(np.stack([decode_vector(row.vector) for row in group]))
+        ids = [row.id for row in group]
+        _store(db, None, user_id, model_name, matrix.sum(axis=0), len(ids), ids, matrix)
+        built += 1
+    db.commit()
+    return built
+
+
+def delete_model(db: Session, model_name: str) -> None:
+    db.query(models.UserTemplate).filter(models.UserTemplate.model_name == model_name).delete(
+        synchronize_session=False
+    )
+
+
+def is_empty(db: Session) -> bool:
+    return db.query(models.UserTemplate.id).first() is None
+
+
+def outliers(
+    db: Session,
+    user_id: int,
+    model_name: str,
+    max_distance: float | None = None,
+    keep: Iterable[int] = (),
+) -> list[tuple[int, float]]:
+    """
+    ``(embedding_id, distance)`` of the user's embeddings farther than ``max_distance`` from
+    the centroid, farthest first. Never leaves fewer than ``template_min_embeddings`` rows and
+    never lists ids in ``keep``.
+    """
+    settings = get_settings()
+    max_distance = settings.template_outlier_distance if max_distance is None else max_distance
+    ids, matrix = _member_rows(db, user_id, model_name)
+    if len(ids) <= settings.template_min_embeddings:
+        return []
+    distances = 1.0 - matrix @ _unit(matrix.sum(axis=0))
+    keep = set(keep)
+    order = np.argsort(-distances)
+    found = [(ids[i], float(distances[i])) for i in order if distances[i] > max_distance and ids[i] not in keep]
+    return found[: len(ids) - settings.template_min_embeddings]
+
+
+class TemplateGallery:
+    """
+    Search structure over the templates of one model: each user contributes its centroid and
+    exemplars, and a probe matches the user owning the closest of those rows.
+    """
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+        self._lock = threading.Lock()
+        self._fingerprint: int | None = None
+        self._index: FlatIndex | None = None
+        self._users = np.empty(0, dtype=np.int64)
+        self._embedding_ids = np.empty(0, dtype=np.int64)
+
+    def refresh(self, db: Session) -> None:
+        fingerprint = generation.current(db, models.UserTemplate.__tablename__)
+        if fingerprint == self._fingerprint:
+            return
+        with self._lock:
+            if fingerprint == self._fingerprint:
+                return
+            templates = db.query(models.UserTemplate).filter(models.UserTemplate.model_name == self.model_name).all()
+            blocks, users, embedding_ids = [], [], []
+            for template in templates:
+                exemplars = _exemplar_matrix(template)
+                blocks.append(np.vstack([decode_vector(template.centroid).astype(np.float32), exemplars]))
+                users.extend([template.user_id] * (exemplars.shape[0] + 1))
+                # The centroid is not a stored embedding, so its row carries id 0.
+                embedding_ids.extend([0, *json.loads(template.exemplar_ids)])
+            dims = {block.shape[1] for block in blocks}
+            if len(dims) != 1:
+                self._index = None
+            else:
+                self._index = FlatIndex(dims.pop())
+                self._index.build(np.vstack(blocks), np.arange(len(users), dtype=np.int64))
+            self._users = np.asarray(users, dtype=np.int64)
+            self._embedding_ids = np.asarray(embedding_ids, dtype=np.int64)
+            self._fingerprint = fingerprint
+
+    def search(self, db: Session, vector: list[float]) -> Match | None:
+        self.refresh(db)
+        with self._lock:
+            index = self._index
+            if index is None:
+                return None
+            probe = np.asarray(vector, dtype=np.float32)
+            if probe.shape[0] != index.dim:
+                return None
+            similarities, rows = index.search(probe, 1)
+            if not rows.shape[0]:
+                return None
+            row = int(rows[0])
+            return Match(
+                user_id=int(self._users[row]),
+                embedding_id=int(self._embedding_ids[row]),
+                distance=similarity_to_distance(float(similarities[0])),
+            )
+
+
+_galleries: dict[str, TemplateGallery] = {}
+_galleries_lock = threading.Lock()
+
+
+def get_template_gallery(model_name: str) -> TemplateGallery:
+    gallery = _galleries.get(model_name)
+    if gallery is None:
+        with _galleries_lock:
+            gallery = _galleries.setdefault(model_name, TemplateGallery(model_name))
+    return gallery
@@ -0,0 +1,138 @@
+"""
+Chunked handling of multipart uploads. Starlette parses the whole form before a route runs,
+so ``BodyLimitMiddleware`` caps the request body while it arrives; the per-file limit is then
+checked as each file is copied out of the parsed form. Files are streamed to a temp file next
+to their destination with a running SHA-256, then renamed into place, so a crash never leaves
+a half-written file behind.
+"""
+import hashlib
+import os
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiofiles
+import aiofiles.os
+from fastapi import HTTPException, UploadFile
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from backend.app.config import get_settings
+from backend.app.metrics import UPLOAD_BYTES, UPLOAD_REJECTED
+
+
+class UploadTooLarge(ValueError):
+    def __init__(self, limit: int):
+        super().__init__(f"Upload exceeds {limit} bytes")
+        self.limit = limit
+
+
+class BodyLimitMiddleware:
+    """
+    Refuses request bodies over ``max_bytes`` with 413: before reading anything when
+    Content-Length says so, otherwise as soon as a chunked body passes the limit.
+    """
+
+    def __init__(self, app: ASGIApp, max_bytes: int):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.max_bytes:
+            await self.app(scope, receive, send)
+            return
+        detail = f"Request body exceeds the {self.max_bytes} byte limit"
+        length = Headers(scope=scope).get("content-length")
+        if length is not None and length.isdigit() and int(length) > self.max_bytes:
+            UPLOAD_REJECTED.inc()
+            await JSONResponse(status_code=413, content={"detail": detail})(scope, receive, send)
+            return
+        received = 0
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    UPLOAD_REJECTED.inc()
+                    # FastAPI turns other errors raised while parsing a form into a 400.
+                    raise HTTPException(status_code=413, detail=detail)
+            return message
+
+        await self.app(scope, limited_receive, send)
+
+
+@dataclass(frozen=True)
+class StoredFile:
+    path: Path
+    size_bytes: int
+    checksum: str  # sha256 hex
+
+
+def _temp_path(dest: Path) -> Path:
+    return dest.with_name(f".{dest.name}.{uuid.uuid4().hex}.part")
+
+
+async def stream_to_file(upload: UploadFile, dest: Path, max_bytes: int | None = None) -> StoredFile:
+    """Copy ``upload`` to ``dest`` chunk by chunk; raises UploadTooLarge past ``max_bytes``."""
+    settings = get_settings()
+    limit = settings.max_upload_bytes if max_bytes is None else max_bytes
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(dest)
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        async with aiofiles.open(tmp, "wb") as out:
+            while chunk := await upload.read(settings.upload_chunk_size):
+                size += len(chunk)
+                if limit and size > limit:
+                    UPLOAD_REJECTED.inc()
+                    raise UploadTooLarge(limit)
+                digest.update(chunk)
+                await out.write(chunk)
+            await out.flush()
+            await aiofiles.os.wrap(os.fsync)(out.fileno())
+        await aiofiles.os.replace(tmp, dest)
+    except BaseException:
+        await discard(tmp)
+        raise
+    UPLOAD_BYTES.observe(size)
+    return StoredFile(path=dest, size_bytes=size, checksum=digest.hexdigest())
+
+
+async def read_limited(upload: UploadFile, max_bytes: int | None = None) -> bytes:
+    """Read an upload into memory, refusing anything over the limit without buffering it all."""
+    settings = get_settings()
+    limit = settings.max_upload_bytes if max_bytes is None else max_bytes
+    chunks: list[bytes] = []
+    size = 0
+    while chunk := await upload.read(settings.upload_chunk_size):
+        size += len(chunk)
+        if limit and size > limit:
+            UPLOAD_REJECTED.inc()
+            raise UploadTooLarge(limit)
+        chunks.append(chunk)
+    UPLOAD_BYTES.observe(size)
+    return b"".join(chunks)
+
+
+def save_bytes(dest: Path, data: bytes) -> StoredFile:
+    """Atomic write of bytes already in memory; blocking, so call it from a worker thread."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _temp_path(dest)
+    try:
+        tmp.write_bytes(data)
+        os.replace(tmp, dest)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    return StoredFile(path=dest, size_bytes=len(data), checksum=hashlib.sha256(data).hexdigest())
+
+
+async def discard(path: Path) -> None:
+    try:
+        await aiofiles.os.remove(path)
+    except FileNotFoundError:
+        pass
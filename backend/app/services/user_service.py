@@ -1,8 +1,16 @@
+from datetime import datetime
+
+from sqlalchemy import and_, or_
 from sqlalchemy.orm import Session
 
 from backend.app import models
 from backend.app.schemas import UserCreate, UserUpdate
 from backend.app.security import get_password_hash, verify_password
+from backend.app.services import media_service
+from backend.app.services.auth_cache import invalidate_principal
+from backend.app.services.event_service import decode_cursor, encode_cursor
+from backend.app.services.gallery_service import invalidate_galleries
+from backend.app.services.sync_service import USER_OUT_COLUMNS, invalidate_sync_snapshot
 
 
 def get_user_by_identifier(db: Session, identifier: str) -> models.User | None:
@@ -33,6 +41,7 @@ def create_user(db: Session, payload: UserCreate) -> models.User:
             )
     db.commit()
     db.refresh(user)
+    invalidate_sync_snapshot()
     return user
 
 
@@ -45,6 +54,8 @@ def update_user(db: Session, user: models.User, payload: UserUpdate) -> models.U
         user.is_active = payload.is_active
     if payload.expires_at is not None:
         user.expires_at = payload.expires_at
+    # Window-only edits do not touch the users row, so bump it for delta syncs.
+    user.updated_at = datetime.utcnow()
     db.add(user)
     if payload.access_windows is not None:
         db.query(models.AccessWindow).filter(models.AccessWindow.user_id == user.id).delete()
@@ -59,16 +70,44 @@ def update_user(db: Session, user: models.User, payload: UserUpdate) -> models.U
             )
     db.commit()
     db.refresh(user)
+    invalidate_principal(user.identifier)
+    invalidate_sync_snapshot()
     return user
 
 
 def delete_user(db: Session, user: models.User) -> None:
+    db.add(models.SyncTombstone(entity="user", entity_id=str(user.id)))
+    cleanup = media_service.forget_photos(db, models.Photo.user_id == user.id)
     db.delete(user)
     db.commit()
-
-
-def list_users(db: Session) -> list[models.User]:
-    return db.query(models.User).order_by(models.User.created_at.desc()).all()
+    cleanup.run(db)
+    invalidate_principal(user.identifier)
+    invalidate_galleries()
+    invalidate_sync_snapshot()
+
+
+def list_users(db: Session, limit: int | None = None, cursor: str | None = None) -> tuple[list[dict], str | None]:
+    """
+    Newest-first users as plain dicts from a single column query. With ``limit`` the result
+    is a keyset page on (created_at, id) and the cursor for the next page is returned.
+    """
+    query = db.query(*USER_OUT_COLUMNS).order_by(models.User.created_at.desc(), models.User.id.desc())
+    if cursor:
+        created_at, user_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                models.User.created_at < created_at,
+                and_(models.User.created_at == created_at, models.User.id < user_id),
+            )
+        )
+    if limit is None:
+        return [row._asdict() for row in query.all()], None
+    rows = [row._asdict() for row in query.limit(limit + 1).all()]
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["id"])
+    return rows, next_cursor
 
 
 def authenticate_user(db: Session, identifier: str, password: str) -> models.User | None:
@@ -94,3 +133,4 @@ def ensure_default_admin(db: Session, identifier: str, password: str) -> None:
     )
     db.add(admin)
     db.commit()
+    invalidate_sync_snapshot()
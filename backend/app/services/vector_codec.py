@@ -0,0 +1,46 @@
+"""
+Compact binary encoding for embedding vectors.
+
+Layout: 8-byte header ``<2sBBI`` (magic ``FV``, format version, dtype code, dimension)
+followed by the raw little-endian vector. The payload starts on an 8-byte boundary, so
+``np.frombuffer`` can return a zero-copy view. Rows written before the binary format
+hold ``json.dumps`` text and are still decoded transparently.
+"""
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"FV"
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<2sBBI")
+
+_DTYPE_CODES = {"float32": 1, "float16": 2}
+_CODE_DTYPES = {1: np.dtype("<f4"), 2: np.dtype("<f2")}
+
+
+def encode_vector(vector, dtype: str = "float32") -> bytes:
+    if dtype not in _DTYPE_CODES:
+        raise ValueError(f"Unsupported embedding dtype {dtype}")
+    code = _DTYPE_CODES[dtype]
+    array = np.asarray(vector, dtype=_CODE_DTYPES[code]).ravel()
+    return HEADER.pack(MAGIC, FORMAT_VERSION, code, array.shape[0]) + array.tobytes()
+
+
+def is_legacy(raw: bytes | str) -> bool:
+    if isinstance(raw, str):
+        return True
+    return raw[:1] == b"["
+
+
+def decode_vector(raw: bytes | str) -> np.ndarray:
+    """
+    Return the stored vector as a NumPy array. Binary rows are returned as read-only
+    views over ``raw`` in their stored dtype; legacy JSON rows are parsed to float32.
+    """
+    if is_legacy(raw):
+        return np.asarray(json.loads(raw), dtype=np.float32)
+    magic, version, code, dim = HEADER.unpack_from(raw)
+    if magic != MAGIC or version != FORMAT_VERSION or code not in _CODE_DTYPES:
+        raise ValueError("Unrecognized embedding encoding")
+    return np.frombuffer(raw, dtype=_CODE_DTYPES[code], count=dim, offset=HEADER.size)
@@ -0,0 +1,532 @@
+"""
+Nearest-neighbour indexes over L2-normalized embeddings.
+
+Every backend ranks by inner product (cosine similarity) and keys vectors by an integer
+label, which the gallery sets to ``Embedding.id``. Backends are pure NumPy so they run
+anywhere the API runs, and can be saved to / loaded from a single ``.npz`` file.
+"""
+import heapq
+import json
+import math
+import random
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Dict, Iterable, Type
+
+import numpy as np
+
+_ASSIGN_CHUNK = 16384
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    array = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(array, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return array / norms
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    if k >= scores.shape[0]:
+        return np.argsort(-scores)
+    part = np.argpartition(-scores, k - 1)[:k]
+    return part[np.argsort(-scores[part])]
+
+
+def _empty_result() -> tuple[np.ndarray, np.ndarray]:
+    return np.empty(0, dtype=np.float32), np.empty(0, dtype=np.int64)
+
+
+class BaseVectorIndex(ABC):
+    name: str = "base"
+
+    def __init__(self, dim: int):
+        self.dim = dim
+
+    def _prepare(self, vectors, labels=None) -> tuple[np.ndarray, np.ndarray | None]:
+        matrix = normalize_rows(vectors).reshape(-1, self.dim)
+        if labels is None:
+            return matrix, None
+        label_array = np.asarray(labels, dtype=np.int64).ravel()
+        if label_array.shape[0] != matrix.shape[0]:
+            raise ValueError("vectors and labels must have the same length")
+        return matrix, label_array
+
+    @abstractmethod
+    def build(self, vectors, labels) -> None:
+        """Replace the index contents with ``vectors``."""
+
+    @abstractmethod
+    def add(self, vectors, labels) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def remove(self, labels: Iterable[int]) -> int:
+        """Drop vectors by label and return how many were removed."""
+
+    @abstractmethod
+    def search(self, query, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(similarities, labels)`` of the ``k`` best matches, best first."""
+
+    @abstractmethod
+    def labels(self) -> np.ndarray:
+        raise NotImplementedError
+
+    def __len__(self) -> int:
+        return int(self.labels().shape[0])
+
+    @abstractmethod
+    def _params(self) -> dict:
+        raise NotImplementedError
+
+    @abstractmethod
+    def _arrays(self) -> dict[str, np.ndarray]:
+        raise NotImplementedError
+
+    @classmethod
+    @abstractmethod
+    def _restore(cls, dim: int, params: dict, arrays: dict[str, np.ndarray]) -> "BaseVectorIndex":
+        raise NotImplementedError
+
+    def save(self, path: str | Path, meta: dict | None = None) -> None:
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        header = json.dumps({"name": self.name, "dim": self.dim, "params": self._params(), "meta": meta or {}})
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "wb") as fh:
+            np.savez(fh, __header__=np.frombuffer(header.encode(), dtype=np.uint8), **self._arrays())
+        tmp_path.replace(path)
+
+
+class FlatIndex(BaseVectorIndex):
+    """Exact search: one matrix-vector product over every stored vector."""
+
+    name = "flat"
+
+    def __init__(self, dim: int):
+        super().__init__(dim)
+        self._vectors = np.empty((0, dim), dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int64)
+
+    def build(self, vectors, labels) -> None:
+        self._vectors, self._labels = self._prepare(vectors, labels)
+
+    def add(self, vectors, labels) -> None:
+        matrix, label_array = self._prepare(vectors, labels)
+        self._vectors = np.concatenate([self._vectors, matrix])
+        self._labels = np.concatenate([self._labels, label_array])
+
+    def remove(self, labels: Iterable[int]) -> int:
+        keep = ~np.isin(self._labels, np.fromiter(labels, dtype=np.int64))
+        removed = int(keep.shape[0] - keep.sum())
+        if removed:
+            self._vectors = self._vectors[keep]
+            self._labels = self._labels[keep]
+        return removed
+
+    def search(self, query, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        if not self._labels.shape[0]:
+            return _empty_result()
+        scores = self._vectors @ normalize_rows(query).ravel()
+        best = _top_k(scores, k)
+        return scores[best], self._labels[best]
+
+    def labels(self) -> np.ndarray:
+        return self._labels
+
+    def _params(self) -> dict:
+        return {}
+
+    def _arrays(self) -> dict[str, np.ndarray]:
+        return {"vectors": self._vectors, "labels": self._labels}
+
+    @classmethod
+    def _restore(cls, dim, params, arrays) -> "FlatIndex":
+        index = cls(dim)
+        index._vectors = arrays["vectors"].astype(np.float32, copy=False)
+        index._labels = arrays["labels"].astype(np.int64, copy=False)
+        return index
+
+
+def spherical_kmeans(vectors: np.ndarray, k: int, iterations: int = 20, seed: int = 0) -> np.ndarray:
+    """Cluster unit vectors by cosine similarity and return ``k`` unit-norm centroids."""
+    rng = np.random.default_rng(seed)
+    k = max(1, min(k, vectors.shape[0]))
+    centroids = vectors[rng.choice(vectors.shape[0], size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        counts = np.bincount(assignment, minlength=k)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty clusters from random points so every list stays useful.
+            sums[empty] = vectors[rng.choice(vectors.shape[0], size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    out = np.empty(vectors.shape[0], dtype=np.int64)
+    for start in range(0, vectors.shape[0], _ASSIGN_CHUNK):
+        chunk = vectors[start : start + _ASSIGN_CHUNK]
+        out[start : start + _ASSIGN_CHUNK] = np.argmax(chunk @ centroids.T, axis=1)
+    return out
+
+
+class IVFIndex(BaseVectorIndex):
+    """
+    Inverted-file index: a k-means coarse quantizer splits vectors into ``nlist`` lists
+    and a query scans only the ``nprobe`` lists whose centroids are closest.
+    """
+
+    name = "ivf"
+
+    def __init__(self, dim: int, nlist: int = 0, nprobe: int = 8, train_iterations: int = 20, seed: int = 0):
+        super().__init__(dim)
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.train_iterations = train_iterations
+        self.seed = seed
+        self._centroids = np.empty((0, dim), dtype=np.float32)
+        self._list_vectors: list[np.ndarray] = []
+        self._list_labels: list[np.ndarray] = []
+        self._label_to_list: dict[int, int] = {}
+
+    @property
+    def is_trained(self) -> bool:
+        return self._centroids.shape[0] > 0
+
+    def _train(self, matrix: np.ndarray) -> None:
+        nlist = self.nlist or max(1, int(round(math.sqrt(matrix.shape[0]))))
+        # k-means on a bounded sample keeps training time flat for very large galleries.
+        sample_size = min(matrix.shape[0], max(nlist * 64, 10000))
+        rng = np.random.default_rng(self.seed)
+        sample = matrix[rng.choice(matrix.shape[0], size=sample_size, replace=False)]
+        self._centroids = spherical_kmeans(sample, nlist, self.train_iterations, self.seed)
+        n_lists = self._centroids.shape[0]
+        self._list_vectors = [np.empty((0, self.dim), dtype=np.float32) for _ in range(n_lists)]
+        self._list_labels = [np.empty(0, dtype=np.int64) for _ in range(n_lists)]
+        self._label_to_list = {}
+
+    def build(self, vectors, labels) -> None:
+        matrix, label_array = self._prepare(vectors, labels)
+        self._centroids = np.empty((0, self.dim), dtype=np.float32)
+        self._list_vectors, self._list_labels, self._label_to_list = [], [], {}
+        if matrix.shape[0]:
+            self._train(matrix)
+            self._insert(matrix, label_array)
+
+    def add(self, vectors, labels) -> None:
+        matrix, label_array = self._prepare(vectors, labels)
+        if not matrix.shape[0]:
+            return
+        if not self.is_trained:
+            self._train(matrix)
+        self._insert(matrix, label_array)
+
+    def _insert(self, matrix: np.ndarray, label_array: np.ndarray) -> None:
+        assignment = _assign(matrix, self._centroids)
+        for list_id in np.unique(assignment):
+            mask = assignment == list_id
+            self._list_vectors[list_id] = np.concatenate([self._list_vectors[list_id], matrix[mask]])
+            self._list_labels[list_id] = np.concatenate([self._list_labels[list_id], label_array[mask]])
+            for label in label_array[mask].tolist():
+                self._label_to_list[label] = int(list_id)
+
+    def remove(self, labels: Iterable[int]) -> int:
+        by_list: dict[int, list[int]] = {}
+        for label in labels:
+            list_id = self._label_to_list.pop(int(label), None)
+            if list_id is not None:
+                by_list.setdefault(list_id, []).append(int(label))
+        removed = 0
+        for list_id, dropped in by_list.items():
+            keep = ~np.isin(self._list_labels[list_id], dropped)
+            removed += int(keep.shape[0] - keep.sum())
+            self._list_vectors[list_id] = self._list_vectors[list_id][keep]
+            self._list_labels[list_id] = self._list_labels[list_id][keep]
+        return removed
+
+    def search(self, query, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        if not self._label_to_list:
+            return _empty_result()
+        probe = normalize_rows(query).ravel()
+        lists = _top_k(self._centroids @ probe, min(self.nprobe, self._centroids.shape[0]))
+        vectors = np.concatenate([self._list_vectors[i] for i in lists])
+        labels = np.concatenate([self._list_labels[i] for i in lists])
+        if not labels.shape[0]:
+            return _empty_result()
+        scores = vectors @ probe
+        best = _top_k(scores, k)
+        return scores[best], labels[best]
+
+    def labels(self) -> np.ndarray:
+        if not self._list_labels:
+            return np.empty(0, dtype=np.int64)
+        return np.concatenate(self._list_labels)
+
+    def _params(self) -> dict:
+        return {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "train_iterations": self.train_iterations,
+            "seed": self.seed,
+        }
+
+    def _arrays(self) -> dict[str, np.ndarray]:
+        sizes = np.array([labels.shape[0] for labels in self._list_labels], dtype=np.int64)
+        return {
+            "centroids": self._centroids,
+            "list_sizes": sizes,
+            "vectors": np.concatenate(self._list_vectors) if self._list_vectors else np.empty((0, self.dim), np.float32),
+            "labels": self.labels(),
+        }
+
+    @classmethod
+    def _restore(cls, dim, params, arrays) -> "IVFIndex":
+        index = cls(dim, **params)
+        index._centroids = arrays["centroids"].astype(np.float32, copy=False)
+        offsets = np.concatenate([[0], np.cumsum(arrays["list_sizes"])])
+        vectors, labels = arrays["vectors"], arrays["labels"]
+        for list_id, (start, end) in enumerate(zip(offsets[:-1], offsets[1:])):
+            index._list_vectors.append(vectors[start:end].astype(np.float32, copy=False))
+            index._list_labels.append(labels[start:end].astype(np.int64, copy=False))
+            for label in labels[start:end].tolist():
+                index._label_to_list[label] = list_id
+        return index
+
+
+class HNSWIndex(BaseVectorIndex):
+    """
+    Hierarchical navigable small-world graph (Malkov & Yashunin). Removal marks nodes as
+    deleted; the graph is rebuilt once more than half of its nodes are tombstoned.
+    """
+
+    name = "hnsw"
+
+    def __init__(self, dim: int, m: int = 16, ef_construction: int = 100, ef_search: int = 64, seed: int = 0):
+        super().__init__(dim)
+        self.m = m
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self.seed = seed
+        self._level_mult = 1 / math.log(max(m, 2))
+        self._rng = random.Random(seed)
+        self._reset()
+
+    def _reset(self) -> None:
+        self._vectors = np.empty((0, self.dim), dtype=np.float32)
+        self._labels = np.empty(0, dtype=np.int64)
+        self._count = 0
+        self._links: list[list[list[int]]] = []  # node -> level -> neighbour nodes
+        self._deleted: set[int] = set()
+        self._label_to_node: dict[int, int] = {}
+        self._entry = -1
+        self._max_level = -1
+
+    def _ensure_capacity(self, extra: int) -> None:
+        needed = self._count + extra
+        if needed <= self._vectors.shape[0]:
+            return
+        capacity = max(needed, self._vectors.shape[0] * 2, 64)
+        vectors = np.empty((capacity, self.dim), dtype=np.float32)
+        vectors[: self._count] = self._vectors[: self._count]
+        labels = np.empty(capacity, dtype=np.int64)
+        labels[: self._count] = self._labels[: self._count]
+        self._vectors, self._labels = vectors, labels
+
+    def _distances(self, query: np.ndarray, nodes: list[int]) -> list[float]:
+        return (1.0 - self._vectors[nodes] @ query).tolist()
+
+    def _search_layer(self, query: np.ndarray, entry_points: list[int], ef: int, level: int) -> list[tuple[float, int]]:
+        visited = set(entry_points)
+        candidates = list(zip(self._distances(query, entry_points), entry_points))
+        heapq.heapify(candidates)
+        results = [(-dist, node) for dist, node in candidates]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+        while candidates:
+            dist, node = heapq.heappop(candidates)
+            if dist > -results[0][0] and len(results) >= ef:
+                break
+            neighbours = [n for n in self._links[node][level] if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+            for n_dist, neighbour in zip(self._distances(query, neighbours), neighbours):
+                if len(results) < ef or n_dist < -results[0][0]:
+                    heapq.heappush(candidates, (n_dist, neighbour))
+                    heapq.heappush(results, (-n_dist, neighbour))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+        return sorted((-neg_dist, node) for neg_dist, node in results)
+
+    def _select_neighbours(self, candidates: list[tuple[float, int]], m: int) -> list[int]:
+        """Heuristic selection: prefer candidates that are not already covered by a closer pick."""
+        selected: list[int] = []
+        pruned: list[int] = []
+        for dist, node in candidates:
+            if len(selected) >= m:
+                break
+            if selected and np.any(1.0 - self._vectors[selected] @ self._vectors[node] < dist):
+                pruned.append(node)
+                continue
+            selected.append(node)
+        for node in pruned:
+            if len(selected) >= m:
+                break
+            selected.append(node)
+        return selected
+
+    def _insert(self, vector: np.ndarray, label: int) -> None:
+        node = self._count
+        self._vectors[node] = vector
+        self._labels[node] = label
+        self._count += 1
+        self._label_to_node[label] = node
+        level = int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+        self._links.append([[] for _ in range(level + 1)])
+        if self._entry < 0:
+            self._entry, self._max_level = node, level
+            return
+
+        entry = [self._entry]
+        for lc in range(self._max_level, level, -1):
+            entry = [self._search_layer(vector, entry, 1, lc)[0][1]]
+        for lc in range(min(level, self._max_level), -1, -1):
+            found = self._search_layer(vector, entry, self.ef_construction, lc)
+            neighbours = self._select_neighbours(found, self.m)
+            self._links[node][lc] = neighbours
+            max_links = self.m * 2 if lc == 0 else self.m
+            for neighbour in neighbours:
+                links = self._links[neighbour][lc]
+                links.append(node)
+                if len(links) > max_links:
+                    dists = self._distances(self._vectors[neighbour], links)
+                    self._links[neighbour][lc] = self._select_neighbours(sorted(zip(dists, links)), max_links)
+            entry = [n for _, n in found]
+        if level > self._max_level:
+            self._entry, self._max_level = node, level
+
+    def build(self, vectors, labels) -> None:
+        self._reset()
+        self._rng = random.Random(self.seed)
+        self.add(vectors, labels)
+
+    def add(self, vectors, labels) -> None:
+        matrix, label_array = self._prepare(vectors, labels)
+        self._ensure_capacity(matrix.shape[0])
+        for vector, label in zip(matrix, label_array.tolist()):
+            if label in self._label_to_node:
+                self._deleted.add(self._label_to_node[label])
+            self._insert(vector, label)
+
+    def remove(self, labels: Iterable[int]) -> int:
+        removed = 0
+        for label in labels:
+            node = self._label_to_node.pop(int(label), None)
+            if node is not None:
+                self._deleted.add(node)
+                removed += 1
+        if self._count and len(self._deleted) > self._count // 2:
+            live = [n for n in range(self._count) if n not in self._deleted]
+            self.build(self._vectors[live].copy(), self._labels[live].copy())
+        return removed
+
+    def search(self, query, k: int = 1) -> tuple[np.ndarray, np.ndarray]:
+        if not self._label_to_node:
+            return _empty_result()
+        probe = normalize_rows(query).ravel()
+        entry = [self._entry]
+        for lc in range(self._max_level, 0, -1):
+            entry = [self._search_layer(probe, entry, 1, lc)[0][1]]
+        found = self._search_layer(probe, entry, max(self.ef_search, k + len(self._deleted) // 8), 0)
+        hits = [(dist, node) for dist, node in found if node not in self._deleted][:k]
+        if not hits:
+            return _empty_result()
+        nodes = [node for _, node in hits]
+        similarities = np.array([1.0 - dist for dist, _ in hits], dtype=np.float32)
+        return similarities, self._labels[nodes]
+
+    def labels(self) -> np.ndarray:
+        return np.fromiter(self._label_to_node.keys(), dtype=np.int64, count=len(self._label_to_node))
+
+    def _params(self) -> dict:
+        return {"m": self.m, "ef_construction": self.ef_construction, "ef_search": self.ef_search, "seed": self.seed}
+
+    def _arrays(self) -> dict[str, np.ndarray]:
+        link_sizes: list[int] = []
+        link_data: list[int] = []
+        for node_links in self._links:
+            for level_links in node_links:
+                link_sizes.append(len(level_links))
+                link_data.extend(level_links)
+        deleted = np.zeros(self._count, dtype=bool)
+        deleted[list(self._deleted)] = True
+        return {
+            "vectors": self._vectors[: self._count],
+            "labels": self._labels[: self._count],
+            "levels": np.array([len(node_links) - 1 for node_links in self._links], dtype=np.int32),
+            "link_sizes": np.array(link_sizes, dtype=np.int32),
+            "link_data": np.array(link_data, dtype=np.int64),
+            "deleted": deleted,
+            "entry": np.array([self._entry, self._max_level], dtype=np.int64),
+        }
+
+    @classmethod
+    def _restore(cls, dim, params, arrays) -> "HNSWIndex":
+        index = cls(dim, **params)
+        count = arrays["labels"].shape[0]
+        index._vectors = arrays["vectors"].astype(np.float32)
+        index._labels = arrays["labels"].astype(np.int64)
+        index._count = count
+        sizes = arrays["link_sizes"].tolist()
+        data = arrays["link_data"].tolist()
+        cursor = offset = 0
+        for level in arrays["levels"].tolist():
+            node_links = []
+            for _ in range(level + 1):
+                node_links.append(data[offset : offset + sizes[cursor]])
+                offset += sizes[cursor]
+                cursor += 1
+            index._links.append(node_links)
+        index._deleted = set(np.flatnonzero(arrays["deleted"]).tolist())
+        index._label_to_node = {
+            label: node for node, label in enumerate(index._labels.tolist()) if node not in index._deleted
+        }
+        index._entry, index._max_level = (int(v) for v in arrays["entry"])
+        return index
+
+
+class VectorIndexRegistry:
+    def __init__(self):
+        self._registry: Dict[str, Type[BaseVectorIndex]] = {}
+
+    def register(self, name: str, index_cls: Type[BaseVectorIndex]) -> None:
+        self._registry[name] = index_cls
+
+    def get(self, name: str) -> Type[BaseVectorIndex]:
+        if name not in self._registry:
+            raise KeyError(f"Vector index {name} is not registered")
+        return self._registry[name]
+
+    def create(self, name: str, dim: int, **params) -> BaseVectorIndex:
+        return self.get(name)(dim, **params)
+
+    def names(self) -> list[str]:
+        return list(self._registry)
+
+
+index_registry = VectorIndexRegistry()
+index_registry.register(FlatIndex.name, FlatIndex)
+index_registry.register(IVFIndex.name, IVFIndex)
+index_registry.register(HNSWIndex.name, HNSWIndex)
+
+
+def load_index(path: str | Path) -> tuple[BaseVectorIndex, dict]:
+    with np.load(Path(path)) as data:
+        header = json.loads(bytes(data["__header__"]).decode())
+        arrays = {key: data[key] for key in data.files if key != "__header__"}
+    index_cls = index_registry.get(header["name"])
+    return index_cls._restore(header["dim"], header["params"], arrays), header["meta"]
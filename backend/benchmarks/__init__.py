@@ -0,0 +1,4 @@
+"""
+Standalone performance benchmarks. Run from the repository root, e.g.
+``python -m backend.benchmarks.index_recall``.
+"""
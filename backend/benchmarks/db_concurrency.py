@@ -0,0 +1,128 @@
+"""
+SQLite reader/writer concurrency benchmark. A separate writer process (like another API
+worker) keeps inserting event batches while reader threads page through ``event_logs``. It compares the old default engine (rollback
+journal, no busy_timeout) with the tuned engine from ``create_db_engine``. Reports reader
+latency percentiles, reader errors ("database is locked") and writer throughput.
+
+    python -m backend.benchmarks.db_concurrency --seconds 5 --readers 4
+"""
+import argparse
+import multiprocessing
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from backend.app import schemas
+from backend.app.db import Base, create_db_engine
+from backend.app.services import event_service
+
+
+def _baseline_engine(url: str):
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 0.1})
+
+    @event.listens_for(engine, "connect")
+    def _rollback_journal(dbapi_connection, _):
+        dbapi_connection.execute("PRAGMA journal_mode=DELETE")
+
+    return engine, engine
+
+
+def _tuned_engines(url: str):
+    return create_db_engine(url), create_db_engine(url, read_only=True)
+
+
+_FACTORIES = {"baseline": _baseline_engine, "tuned": _tuned_engines}
+
+
+def _writer(label: str, url: str, batch: int, stop, written, write_errors) -> None:
+    write_engine, _ = _FACTORIES[label](url)
+    db = sessionmaker(bind=write_engine)()
+    try:
+        while not stop.is_set():
+            rows = [schemas.EventCreate(device_id=f"dev-{i % 8}", status="granted", confidence=0.9) for i in range(batch)]
+            try:
+                event_service.log_events(db, rows)
+                written.value += batch
+            except OperationalError:
+                db.rollback()
+                write_errors.value += 1
+    finally:
+        db.close()
+        write_engine.dispose()
+
+
+def run(label: str, url: str, seconds: float, readers: int, batch: int) -> None:
+    write_engine, read_engine = _FACTORIES[label](url)
+    import backend.app.models  # noqa: F401
+
+    Base.metadata.create_all(bind=write_engine)
+    ReadSession = sessionmaker(bind=read_engine)
+    stop = threading.Event()
+    latencies: list[float] = []
+    errors = {"read": 0}
+    lock = threading.Lock()
+    writer_stop = multiprocessing.Event()
+    written = multiprocessing.Value("i", 0)
+    write_errors = multiprocessing.Value("i", 0)
+
+    def reader():
+        while not stop.is_set():
+            db = ReadSession()
+            started = time.perf_counter()
+            try:
+                event_service.list_events(db, limit=50, device_id="dev-1")
+                elapsed = time.perf_counter() - started
+                with lock:
+                    latencies.append(elapsed)
+            except OperationalError:
+                with lock:
+                    errors["read"] += 1
+            finally:
+                db.close()
+
+    writer = multiprocessing.Process(target=_writer, args=(label, url, batch, writer_stop, written, write_errors))
+    writer.start()
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    writer_stop.set()
+    for thread in threads:
+        thread.join()
+    writer.join()
+    write_engine.dispose()
+    read_engine.dispose()
+
+    if latencies:
+        ordered = sorted(latencies)
+        p50 = statistics.median(ordered) * 1000
+        p99 = ordered[int(len(ordered) * 0.99) - 1] * 1000
+    else:
+        p50 = p99 = float("nan")
+    print(
+        f"{label:<9} reads={len(latencies):7d}  p50={p50:7.2f}ms  p99={p99:7.2f}ms  "
+        f"read_errors={errors['read']:5d}  events/s={written.value / seconds:9.0f}  write_errors={write_errors.value}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--batch", type=int, default=50)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for label in _FACTORIES:
+            run(label, f"sqlite:///{Path(tmp) / label}.db", args.seconds, args.readers, args.batch)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Accuracy drift and speed of FaceNet inference modes relative to fp32.
+
+Embeds the same photos with the fp32 reference and with each variant, then reports the
+cosine similarity between the two vectors and whether the nearest enrolled photo stays
+the same. Exits non-zero if any variant drops below ``--min-cosine``. Modes whose runtime is not
+installed (onnx without onnxruntime) are skipped.
+
+    python -m backend.benchmarks.embedder_drift --photos data/photos --modes torchscript compile
+"""
+import argparse
+import sys
+import time
+from importlib.util import find_spec
+from pathlib import Path
+
+import numpy as np
+
+from backend.app.services.face_detector import NoFaceDetected
+from backend.app.services.facenet_embedder import INFERENCE_MODES, FaceNetEmbedder
+from backend.app.services.vector_index import normalize_rows
+
+
+def load_images(root: Path, limit: int) -> list[bytes]:
+    paths = sorted(p for p in root.rglob("*") if p.suffix.lower() in {".jpg", ".jpeg", ".png"})
+    return [p.read_bytes() for p in paths[:limit]]
+
+
+def available(mode: str) -> bool:
+    return mode != "onnx" or find_spec("onnxruntime") is not None
+
+
+def embed_all(embedder: FaceNetEmbedder, images: list[bytes]) -> tuple[np.ndarray, float]:
+    vectors = []
+    started = time.perf_counter()
+    for image in images:
+        vectors.append(embedder.generate_embedding(image))
+    elapsed = time.perf_counter() - started
+    return normalize_rows(np.asarray(vectors, dtype=np.float32)), elapsed / max(1, len(images))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--photos", type=Path, default=Path("data/photos"))
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument(
+        "--modes", nargs="+", choices=INFERENCE_MODES, default=[m for m in INFERENCE_MODES if m != "fp32"]
+    )
+    parser.add_argument("--channels-last", action="store_true")
+    parser.add_argument("--face-detector", default="mtcnn")
+    parser.add_argument("--min-cosine", type=float, default=0.995)
+    args = parser.parse_args()
+
+    reference = FaceNetEmbedder(device="cpu", face_detector=args.face_detector)
+    images = []
+    for image in load_images(args.photos, args.limit):
+        try:
+            reference.generate_embedding(image)
+            images.append(image)
+        except NoFaceDetected:
+            continue
+    if len(images) < 2:
+        sys.exit(f"need at least two photos with faces under {args.photos}")
+    ref_vectors, ref_latency = embed_all(reference, images)
+    ref_sims = ref_vectors @ ref_vectors.T
+    np.fill_diagonal(ref_sims, -np.inf)
+    ref_nearest = ref_sims.argmax(axis=1)
+    print(f"{'mode':<12} {'ms/img':>8} {'speedup':>8} {'cos min':>8} {'cos mean':>9} {'top1 agree':>11}")
+    print(f"{'fp32':<12} {ref_latency * 1000:>8.1f} {1.0:>8.2f} {1.0:>8.4f} {1.0:>9.4f} {1.0:>11.3f}")
+
+    failed = False
+    for mode in args.modes:
+        if not available(mode):
+            print(f"{mode:<12} skipped: onnxruntime is not installed")
+            continue
+        candidate = FaceNetEmbedder(
+            device="cpu",
+            face_detector=args.face_detector,
+            inference_mode=mode,
+            channels_last=args.channels_last,
+        )
+        vectors, latency = embed_all(candidate, images)
+        cosine = np.sum(vectors * ref_vectors, axis=1)
+        # Probe the fp32 gallery with the candidate vectors, as matching would after a switch.
+        sims = vectors @ ref_vectors.T
+        np.fill_diagonal(sims, -np.inf)
+        agree = float(np.mean(sims.argmax(axis=1) == ref_nearest))
+        print(
+            f"{mode:<12} {latency * 1000:>8.1f} {ref_latency / latency:>8.2f} "
+            f"{cosine.min():>8.4f} {cosine.mean():>9.4f} {agree:>11.3f}"
+        )
+        failed = failed or cosine.min() < args.min_cosine
+    if failed:
+        sys.exit(f"at least one mode drifted below cosine {args.min_cosine}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+"""
+Recall-vs-latency benchmark of the approximate vector indexes against the exact flat index.
+
+    python -m backend.benchmarks.index_recall --size 10000 --dim 128 --queries 200
+"""
+import argparse
+import time
+
+import numpy as np
+
+from backend.app.services.vector_index import FlatIndex, index_registry, normalize_rows
+
+
+def make_gallery(size: int, dim: int, identities: int, noise: float, seed: int) -> tuple[np.ndarray, np.ndarray]:
+    """Synthetic gallery shaped like face embeddings: several noisy samples per identity."""
+    rng = np.random.default_rng(seed)
+    centers = normalize_rows(rng.standard_normal((identities, dim)))
+    owners = rng.integers(0, identities, size=size)
+    return normalize_rows(centers[owners] + noise * rng.standard_normal((size, dim))), centers
+
+
+def make_queries(centers: np.ndarray, count: int, noise: float, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed + 1)
+    owners = rng.integers(0, centers.shape[0], size=count)
+    return normalize_rows(centers[owners] + noise * rng.standard_normal((count, centers.shape[1])))
+
+
+def run(name: str, params: dict, vectors, labels, queries, truth, k: int) -> dict:
+    index = index_registry.create(name, vectors.shape[1], **params)
+    started = time.perf_counter()
+    index.build(vectors, labels)
+    build_s = time.perf_counter() - started
+
+    hits = 0
+    latencies = []
+    for query, expected in zip(queries, truth):
+        started = time.perf_counter()
+        _, found = index.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        hits += len(set(found.tolist()) & expected)
+    lat = np.array(latencies) * 1000
+    return {
+        "index": name,
+        "params": params,
+        "build_s": build_s,
+        "recall": hits / (len(truth) * k),
+        "p50_ms": float(np.percentile(lat, 50)),
+        "p99_ms": float(np.percentile(lat, 99)),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=10000)
+    parser.add_argument("--dim", type=int, default=128)
+    parser.add_argument("--identities", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--noise", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors, centers = make_gallery(args.size, args.dim, args.identities, args.noise, args.seed)
+    labels = np.arange(args.size, dtype=np.int64)
+    queries = make_queries(centers, args.queries, args.noise, args.seed)
+
+    exact = FlatIndex(args.dim)
+    exact.build(vectors, labels)
+    truth = [set(exact.search(q, args.k)[1].tolist()) for q in queries]
+
+    configs = [
+        ("flat", {}),
+        ("ivf", {"nprobe": 4}),
+        ("ivf", {"nprobe": 16}),
+        ("hnsw", {"m": 16, "ef_construction": 100, "ef_search": 32}),
+        ("hnsw", {"m": 16, "ef_construction": 100, "ef_search": 96}),
+    ]
+    print(f"{'index':<6} {'params':<52} {'build s':>8} {'recall@' + str(args.k):>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, params in configs:
+        row = run(name, params, vectors, labels, queries, truth, args.k)
+        print(
+            f"{row['index']:<6} {str(row['params']):<52} {row['build_s']:>8.2f} "
+            f"{row['recall']:>10.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""
+API process start-up benchmark: import time, time until ``/health`` answers, peak RSS and
+whether torch was imported along the way. Each run uses a fresh interpreter.
+
+    python -m backend.benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+_PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+from backend.app.main import app
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(app) as client:
+    status = client.get("/health").status_code
+    ready = time.perf_counter()
+print(json.dumps({
+    "import_s": imported - started,
+    "first_health_s": ready - started,
+    "health_status": status,
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "torch_loaded": "torch" in sys.modules,
+}))
+"""
+
+
+def run_once(env: dict) -> dict:
+    out = subprocess.run([sys.executable, "-c", _PROBE], capture_output=True, text=True, env=env, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-first-health-s", type=float, default=None, help="exit non-zero above this median")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.setdefault("DATABASE_URL", f"sqlite:///{tmp}/startup.db")
+        env.setdefault("PYTHONPATH", os.getcwd())
+        runs = [run_once(env) for _ in range(args.runs)]
+
+    for key in ("import_s", "first_health_s", "max_rss_mb"):
+        values = [r[key] for r in runs]
+        print(f"{key:<16} median={statistics.median(values):8.3f}  min={min(values):8.3f}  max={max(values):8.3f}")
+    print(f"torch_loaded     {any(r['torch_loaded'] for r in runs)}")
+    median = statistics.median(r["first_health_s"] for r in runs)
+    if args.max_first_health_s is not None and median > args.max_first_health_s:
+        sys.exit(f"start-up regression: {median:.3f}s > {args.max_first_health_s:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+User listing and sync read-path benchmark. Seeds N users (two access windows each) into a
+fresh SQLite database and records SQL statement count and latency per endpoint. Each size
+runs in its own interpreter, since the app binds its engine at import time.
+
+    python -m backend.benchmarks.user_listing --users 10000 100000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from datetime import time
+
+_ENDPOINTS = (
+    ("GET /users/", "/users/"),
+    ("GET /users/?limit=100", "/users/?limit=100"),
+    ("GET /raspberry/sync (rebuild)", "/raspberry/sync"),
+    ("GET /raspberry/sync (cached)", "/raspberry/sync"),
+    ("GET /raspberry/sync?since", "/raspberry/sync?since={cursor}"),
+)
+
+
+def _seed(users: int) -> None:
+    from sqlalchemy import insert
+
+    from backend.app import models
+    from backend.app.db import SessionLocal, init_db
+
+    init_db()
+    db = SessionLocal()
+    try:
+        batch = 5000
+        for start in range(0, users, batch):
+            ids = range(start + 1, min(users, start + batch) + 1)
+            db.execute(
+                insert(models.User),
+                [{"id": i, "full_name": f"User {i}", "identifier": f"user{i}", "password_hash": "x"} for i in ids],
+            )
+            db.execute(
+                insert(models.AccessWindow),
+                [
+                    {"user_id": i, "day_of_week": day, "start_time": time(8), "end_time": time(18)}
+                    for i in ids
+                    for day in (0, 3)
+                ],
+            )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _measure(users: int, repeats: int) -> dict:
+    import time as clock
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event
+
+    from backend.app.db import engine, read_engine
+    from backend.app.main import app
+    from backend.app.services.sync_service import invalidate_sync_snapshot
+
+    _seed(users)
+    statements = [0]
+
+    def count(*_):
+        statements[0] += 1
+
+    for bound in {engine, read_engine}:
+        event.listen(bound, "before_cursor_execute", count)
+
+    results = {}
+    with TestClient(app) as client:
+        token = client.post("/auth/login", data={"username": "admin", "password": "admin"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        client.get("/users/?limit=1", headers=headers)  # warm the auth cache
+        cursor = client.get("/raspberry/sync").json()["cursor"]
+        for label, path in _ENDPOINTS:
+            timings = []
+            for _ in range(repeats):
+                if label.endswith("(rebuild)"):
+                    invalidate_sync_snapshot()
+                statements[0] = 0
+                started = clock.perf_counter()
+                response = client.get(path.format(cursor=cursor), headers=headers)
+                timings.append(clock.perf_counter() - started)
+                response.raise_for_status()
+            results[label] = {
+                "queries": statements[0],
+                "best_ms": min(timings) * 1000,
+                "bytes": len(response.content),
+            }
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(_measure(args.users[0], args.repeats)))
+        return
+
+    for users in args.users:
+        with tempfile.TemporaryDirectory() as tmp:
+            env = dict(os.environ, DATABASE_URL=f"sqlite:///{tmp}/users.db", EMBEDDER_NAME="hashed")
+            env.setdefault("PYTHONPATH", os.getcwd())
+            cmd = [sys.executable, "-m", "backend.benchmarks.user_listing", "--worker", "--users", str(users)]
+            out = subprocess.run(cmd + ["--repeats", str(args.repeats)], capture_output=True, text=True, env=env, check=True)
+            results = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"users={users}")
+        for label, row in results.items():
+            print(f"  {label:<32} queries={row['queries']:4d}  best={row['best_ms']:9.1f}ms  bytes={row['bytes']}")
+
+
+if __name__ == "__main__":
+    main()
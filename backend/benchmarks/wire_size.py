@@ -0,0 +1,102 @@
+"""
+Bytes on the wire and latency per endpoint and content-coding. Seeds users, access
+windows, events and 512-d embeddings into a temporary SQLite database, then requests each
+endpoint with identity, gzip, br and zstd (those installed) and counts the raw, still-encoded
+response bytes.
+
+    python -m backend.benchmarks.wire_size --users 2000 --events 20000
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+
+def _seed(users: int, events: int, dim: int) -> int:
+    from datetime import time as clock_time
+
+    import numpy as np
+    from sqlalchemy import insert
+
+    from backend.app import models
+    from backend.app.db import SessionLocal, init_db
+    from backend.app.services.vector_codec import encode_vector
+
+    init_db()
+    rng = np.random.default_rng(0)
+    db = SessionLocal()
+    try:
+        ids = range(10_000, 10_000 + users)
+        db.execute(
+            insert(models.User),
+            [{"id": i, "full_name": f"User {i}", "identifier": f"user{i}", "password_hash": "x"} for i in ids],
+        )
+        db.execute(
+            insert(models.AccessWindow),
+            [{"user_id": i, "day_of_week": 1, "start_time": clock_time(8), "end_time": clock_time(18)} for i in ids],
+        )
+        db.execute(
+            insert(models.EventLog),
+            [{"user_id": 10_000 + n % users, "status": "granted", "device_id": "door-1", "confidence": 0.9} for n in range(events)],
+        )
+        db.execute(
+            insert(models.Embedding),
+            [{"user_id": 10_000, "vector": encode_vector(rng.standard_normal(dim)), "model_name": "facenet"} for _ in range(5)],
+        )
+        db.commit()
+    finally:
+        db.close()
+    return 10_000
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp.name}/wire.db"
+    os.environ.setdefault("EMBEDDER_NAME", "hashed")
+
+    from fastapi.testclient import TestClient
+
+    from backend.app.compression import PREFERENCE
+    from backend.app.main import app
+
+    embedded_user = _seed(args.users, args.events, args.dim)
+    endpoints = [
+        ("sync (snapshot)", "/raspberry/sync"),
+        ("users", "/users/"),
+        ("events (1000)", "/events/?limit=1000"),
+        ("get-embeddings json", f"/users/get-embeddings/{embedded_user}"),
+        ("get-embeddings binary", f"/users/get-embeddings/{embedded_user}?format=binary"),
+    ]
+    with TestClient(app) as client:
+        token = client.post("/auth/login", data={"username": "admin", "password": "admin"}).json()["access_token"]
+        auth = {"Authorization": f"Bearer {token}"}
+        print(f"{'endpoint':<24}{'encoding':<10}{'bytes':>12}{'ratio':>8}{'median ms':>12}")
+        for label, path in endpoints:
+            identity_bytes = None
+            for encoding in ["identity", *PREFERENCE]:
+                sizes, timings = [], []
+                for _ in range(args.repeats):
+                    started = time.perf_counter()
+                    with client.stream("GET", path, headers={**auth, "Accept-Encoding": encoding}) as response:
+                        response.raise_for_status()
+                        sizes.append(sum(len(chunk) for chunk in response.iter_raw()))
+                    timings.append(time.perf_counter() - started)
+                size = sizes[-1]
+                identity_bytes = identity_bytes or size
+                print(
+                    f"{label:<24}{encoding:<10}{size:>12}{identity_bytes / size:>8.1f}"
+                    f"{statistics.median(timings) * 1000:>12.1f}"
+                )
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
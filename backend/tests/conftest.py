@@ -0,0 +1,91 @@
+"""
+The app reads its settings and creates its engines at import time, so the environment and
+working directory (``data/`` is relative) are set up here, before anything imports it.
+"""
+import io
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT))
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="face-access-tests-"))
+os.chdir(WORKDIR)
+os.environ.update(
+    {
+        "DATABASE_URL": f"sqlite:///{WORKDIR / 'app.db'}",
+        "EMBEDDER_NAME": "hashed",
+        "FACE_DETECTOR": "none",
+        # Hashed vectors are all positive, so unrelated images sit ~0.25 apart in cosine distance.
+        "THRESHOLD": "0.01",
+        "DEFAULT_ADMIN_PASSWORD": "tests-admin-password",
+        "EVENT_COMPACTION_INTERVAL_SEC": "0",
+        "REEMBED_POLL_SEC": "3600",
+    }
+)
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+
+    from backend.app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture(scope="session")
+def auth(client) -> dict:
+    response = client.post("/auth/login", data={"username": "admin", "password": "tests-admin-password"})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture
+def db():
+    from backend.app.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+def image(seed: int) -> bytes:
+    """A small PNG whose bytes, and so its hashed embedding, differ per seed."""
+    from PIL import Image
+
+    buffer = io.BytesIO()
+    Image.new("RGB", (32, 32), (seed % 256, seed // 256 % 256, 97)).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def create_user(client, auth: dict, identifier: str) -> int:
+    response = client.post(
+        "/users/create",
+        json={"full_name": identifier.title(), "identifier": identifier, "password": "secret-pass"},
+        headers=auth,
+    )
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def enroll(client, auth: dict, user_id: int, *images: bytes):
+    return client.post(
+        "/users/upload-photo",
+        data={"user_id": str(user_id)},
+        files=[("files", (f"photo{i}.png", content, "image/png")) for i, content in enumerate(images)],
+        headers=auth,
+    )
+
+
+def identify(client, content: bytes) -> dict:
+    response = client.post("/raspberry/identify", files={"image": ("frame.png", content, "image/png")})
+    assert response.status_code == 200, response.text
+    return response.json()
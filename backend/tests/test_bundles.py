@@ -0,0 +1,30 @@
+from backend.app.services import bundle_service
+from conftest import create_user, enroll, image
+
+
+def _manifest(client, model_name: str = "hashed") -> dict:
+    manifests = client.get("/raspberry/embeddings/manifest").json()
+    return next(m for m in manifests if m["model_name"] == model_name and m["kind"] == "embeddings")
+
+
+def test_manifest_follows_writes_without_rechecking_every_sync(client, auth, monkeypatch):
+    user = create_user(client, auth, "bundle-user")
+    assert enroll(client, auth, user, image(40)).status_code == 200
+    before = _manifest(client)
+
+    checks = []
+    fingerprints = bundle_service._fingerprints
+    monkeypatch.setattr(bundle_service, "_fingerprints", lambda db: checks.append(1) or fingerprints(db))
+    cursor = client.get("/raspberry/sync").json()["cursor"]
+    client.get("/raspberry/sync", params={"since": cursor})
+    assert _manifest(client) == before
+    assert checks == []
+
+    assert enroll(client, auth, user, image(41)).status_code == 200
+    after = _manifest(client)
+    assert checks == [1]
+    assert after["count"] == before["count"] + 1
+    assert after["version"] != before["version"]
+    body = client.get(after["url"]).content
+    _, ids, users, _ = bundle_service.unpack(body)
+    assert ids.shape[0] == after["count"] and user in users.tolist()
@@ -0,0 +1,46 @@
+import json
+
+import numpy as np
+import pytest
+from sqlalchemy import text
+
+from backend.app import models
+from backend.app.services import embedding_service
+from backend.app.services.vector_codec import decode_vector, encode_vector, is_legacy
+from conftest import create_user
+
+
+@pytest.mark.parametrize("dtype, tolerance", [("float32", 0), ("float16", 1e-3)])
+def test_round_trip(dtype, tolerance):
+    vector = np.random.default_rng(0).random(512).astype(np.float32)
+    raw = encode_vector(vector, dtype)
+    assert len(raw) == 8 + 512 * np.dtype(dtype).itemsize
+    assert not is_legacy(raw)
+    np.testing.assert_allclose(decode_vector(raw), vector, atol=tolerance)
+
+
+def test_legacy_json_still_decodes():
+    vector = [0.25, 0.5, 0.75]
+    for raw in (json.dumps(vector), json.dumps(vector).encode()):
+        assert is_legacy(raw)
+        np.testing.assert_allclose(decode_vector(raw), vector)
+
+
+def test_migration_converts_legacy_rows_once(client, auth, db):
+    user = create_user(client, auth, "legacy-vectors")
+    db.query(models.AppSetting).filter(models.AppSetting.key == embedding_service.MIGRATED_KEY).delete()
+    insert = text("INSERT INTO embeddings (user_id, vector, model_name) VALUES (:user, :vector, 'legacy-test')")
+    db.execute(insert, {"user": user, "vector": json.dumps([0.1, 0.2, 0.3])})
+    db.commit()
+
+    assert embedding_service.migrate_legacy_vectors(db, batch_size=2) >= 1
+    stored = db.query(models.Embedding.vector).filter(models.Embedding.model_name == "legacy-test").scalar()
+    assert not is_legacy(stored)
+    np.testing.assert_allclose(decode_vector(stored), [0.1, 0.2, 0.3], rtol=1e-6)
+
+    # Finished passes are recorded; later starts do not scan again.
+    db.execute(insert, {"user": user, "vector": json.dumps([0.4, 0.5, 0.6])})
+    db.commit()
+    assert embedding_service.migrate_legacy_vectors(db) == 0
+    db.query(models.Embedding).filter(models.Embedding.model_name == "legacy-test").delete()
+    db.commit()
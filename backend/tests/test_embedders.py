@@ -0,0 +1,44 @@
+from backend.app import deps
+
+
+def _registry_names(monkeypatch, installed: set[str]) -> set[str]:
+    monkeypatch.setattr(deps, "find_spec", lambda name: name in installed or None)
+    deps.get_embedder_registry.cache_clear()
+    try:
+        return set(deps.get_embedder_registry().names())
+    finally:
+        deps.get_embedder_registry.cache_clear()
+
+
+def test_facenet_onnx_needs_onnxruntime(monkeypatch):
+    names = _registry_names(monkeypatch, {"torch", "facenet_pytorch"})
+    assert {"facenet", "facenet-ts", "hashed"} <= names
+    assert "facenet-onnx" not in names
+    assert "facenet-onnx" in _registry_names(monkeypatch, {"torch", "facenet_pytorch", "onnxruntime"})
+
+
+def test_batch_matches_single_images():
+    from backend.app.services.model_registry import HashedEmbedder
+
+    embedder = HashedEmbedder()
+    images = [b"first", b"second", b"first"]
+    batch = embedder.generate_embeddings(images)
+    assert batch == [embedder.generate_embedding(image) for image in images]
+    assert batch[0] == batch[2] and len(batch[0]) == 128
+
+
+def test_ready_fails_fast_without_facenet_weights(client, monkeypatch, tmp_path):
+    from backend.app import main
+    from backend.app.services.model_registry import HashedEmbedder
+
+    embedder = HashedEmbedder()
+    embedder.registry_name = "facenet"
+    monkeypatch.setattr(main, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(main.settings, "facenet_weights_path", str(tmp_path / "missing.pt"))
+    assert main.settings.facenet_allow_download is False
+
+    response = client.get("/ready")
+    assert response.status_code == 503
+    assert response.json()["embedder"] == "missing_weights"
+    (tmp_path / "missing.pt").write_bytes(b"weights")
+    assert client.get("/ready").status_code == 200
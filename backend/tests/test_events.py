@@ -0,0 +1,66 @@
+import json
+
+
+def test_keyset_pages_cover_every_event_once(client, auth):
+    device = "pagination-door"
+    for i in range(5):
+        payload = {"status": "granted", "device_id": device, "message": str(i)}
+        assert client.post("/raspberry/events/log", json=payload).status_code in (200, 202)
+
+    seen, cursor = [], None
+    while True:
+        params = {"device_id": device, "limit": 2, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/events/", params=params, headers=auth)
+        assert response.status_code == 200, response.text
+        seen.extend(event["id"] for event in response.json())
+        cursor = response.headers.get("x-next-cursor")
+        if not cursor:
+            break
+    assert len(seen) == 5 == len(set(seen))
+    assert seen == sorted(seen, reverse=True)
+
+    exported = client.get("/events/export", params={"device_id": device}, headers=auth)
+    assert sorted(json.loads(line)["id"] for line in exported.text.splitlines()) == sorted(seen)
+
+
+def test_bad_cursor_is_rejected(client, auth):
+    assert client.get("/events/", params={"cursor": "not-a-cursor"}, headers=auth).status_code == 400
+
+
+def test_backlogged_events_keep_their_time(client, auth):
+    device = "offline-door"
+    backlog = [
+        {"status": "granted", "device_id": device, "occurred_at": "2026-03-01T08:00:00+02:00"},
+        {"status": "denied", "device_id": device, "occurred_at": "2026-03-01T07:30:00"},
+        {"status": "denied", "device_id": device},
+    ]
+    assert client.post("/raspberry/events/batch", json=backlog).json() == {"accepted": 3}
+
+    events = client.get("/events/", params={"device_id": device}, headers=auth).json()
+    times = [event["created_at"] for event in events]
+    assert times[1:] == ["2026-03-01T07:30:00", "2026-03-01T06:00:00"]  # newest first, stored as UTC
+    assert times[0] > "2026-10"
+
+
+def test_write_behind_retries_instead_of_dropping(monkeypatch):
+    from backend.app.db import SessionLocal
+    from backend.app.schemas import EventCreate
+    from backend.app.services import event_service
+    from backend.app.services.event_buffer import EventWriteBuffer
+
+    real, failures = event_service.log_events, iter([True, True, True, False, True, False])
+
+    def flaky(db, payloads):
+        if next(failures, False):
+            raise RuntimeError("database is locked")
+        return real(db, payloads)
+
+    monkeypatch.setattr(event_service, "log_events", flaky)
+    buffer = EventWriteBuffer(SessionLocal, flush_interval_ms=10, retries=2, retry_backoff_ms=1)
+    assert all(buffer.submit(EventCreate(status="granted", device_id="busy-door")) for _ in range(3))
+    buffer.start()  # after queueing, so the three events make up the first batch
+    buffer.stop()
+
+    stats = buffer.stats()
+    assert (stats["written"], stats["dropped"]) == (3, 0)
+    assert stats["requeued"] == 3  # the first batch failed all three attempts
@@ -0,0 +1,80 @@
+import numpy as np
+from sqlalchemy import text
+
+from backend.app import models
+from backend.app.services import generation
+from backend.app.services.gallery_service import get_gallery
+from conftest import create_user, enroll, identify, image
+
+
+def test_deleted_users_face_does_not_match_the_next_user(client, auth):
+    """A reused user or embedding id must not hand the old face to whoever got the id."""
+    first = create_user(client, auth, "reuse-first")
+    assert enroll(client, auth, first, image(1)).status_code == 200
+    assert identify(client, image(1))["user_id"] == first  # gallery is warm now
+
+    assert client.delete(f"/users/delete/{first}", headers=auth).status_code == 200
+    second = create_user(client, auth, "reuse-second")
+    assert enroll(client, auth, second, image(2)).status_code == 200
+
+    assert second != first
+    result = identify(client, image(1))
+    assert result["matched"] is False
+    assert result["user_id"] is None
+    assert identify(client, image(2))["user_id"] == second
+
+
+def test_bulk_delete_bumps_the_generation(db):
+    before = generation.current(db, "embeddings")
+    db.query(models.Embedding).filter(models.Embedding.id == -1).delete(synchronize_session=False)
+    db.commit()
+    assert generation.current(db, "embeddings") == before + 1
+
+
+def test_reassigned_id_is_reindexed(client, auth, db):
+    """Even when an id comes back under another owner, the diff replaces the stale vector."""
+    owner = create_user(client, auth, "reassign-owner")
+    other = create_user(client, auth, "reassign-other")
+    embedding_id = enroll(client, auth, owner, image(3)).json()[0]["id"]
+    gallery = get_gallery("hashed")
+    assert gallery.search(db, _vector(db, embedding_id)).user_id == owner
+
+    db.execute(text("UPDATE embeddings SET user_id = :user WHERE id = :id"), {"user": other, "id": embedding_id})
+    generation.bump(db.connection(), ["embeddings"])
+    db.commit()
+    assert gallery.search(db, _vector(db, embedding_id)).user_id == other
+
+
+def test_autoincrement_tables(db):
+    for table in ("users", "embeddings", "photos"):
+        sql = db.execute(text("SELECT sql FROM sqlite_master WHERE name = :name"), {"name": table}).scalar()
+        assert "AUTOINCREMENT" in sql
+
+
+def test_approximate_index_is_built_off_the_request_path(client, auth, db, monkeypatch):
+    from backend.app.config import get_settings
+    from backend.app.services.embedding_service import add_embedding
+    from backend.app.services.gallery_service import EmbeddingGallery
+
+    monkeypatch.setattr(get_settings(), "vector_index", "hnsw")
+    user = create_user(client, auth, "background-build")
+    vectors = [np.random.default_rng(seed).random(16).tolist() for seed in range(20)]
+    ids = [add_embedding(db, user, vector, "background-test").id for vector in vectors]
+    gallery = EmbeddingGallery("background-test")
+
+    assert gallery.search(db, vectors[0]).embedding_id == ids[0]  # flat stand-in answers at once
+    builder = gallery._builder
+    if builder is not None:
+        builder.join(10)
+    late = add_embedding(db, user, np.random.default_rng(99).random(16).tolist(), "background-test")
+
+    assert gallery.search(db, vectors[5]).embedding_id == ids[5]
+    assert gallery._index.name == "hnsw"
+    assert gallery.search(db, _vector(db, late.id)).embedding_id == late.id
+    gallery.index_path.unlink(missing_ok=True)
+
+
+def _vector(db, embedding_id: int) -> list[float]:
+    from backend.app.services.embedding_service import get_vector
+
+    return get_vector(db.get(models.Embedding, embedding_id)).tolist()
@@ -0,0 +1,70 @@
+from backend.app import models
+from backend.app.services import media_service
+from backend.app.services.blob_service import blob_path
+from conftest import create_user, enroll, image
+
+
+def test_a_rolled_back_delete_keeps_the_blob(client, auth, db):
+    user = create_user(client, auth, "rollback-owner")
+    assert enroll(client, auth, user, image(50)).status_code == 200
+    photo = db.query(models.Photo).filter(models.Photo.user_id == user).one()
+    checksum, path = photo.checksum, media_service.PHOTOS_ROOT / photo.path
+
+    cleanup = media_service.forget_photos(db, models.Photo.user_id == user)
+    assert cleanup.blobs == [checksum] and cleanup.paths == [path]
+    db.rollback()  # the commit never happened, so the cleanup must not run
+
+    assert db.get(models.Blob, checksum).ref_count == 1
+    assert blob_path(checksum).exists() and path.exists()
+
+
+def test_worker_renders_every_variant(tmp_path):
+    import hashlib
+
+    from PIL import Image
+
+    from backend.app.services.derivative_service import PHOTO_VARIANTS, DerivativeWorker, derivative_path
+
+    source = tmp_path / "source.png"
+    source.write_bytes(image(51))
+    checksum = hashlib.sha256(source.read_bytes()).hexdigest()
+    worker = DerivativeWorker(max_queue=4)
+    assert not worker.submit(checksum, source, PHOTO_VARIANTS)  # not started yet
+    worker.start()
+    assert worker.submit(checksum, source, PHOTO_VARIANTS)
+    worker.stop()  # drains the queue first
+
+    assert worker.stats()["rendered"] == len(PHOTO_VARIANTS)
+    with Image.open(derivative_path(checksum, "face")) as face:
+        assert (face.format, face.size) == ("JPEG", (160, 160))
+    assert derivative_path(checksum, "thumb").exists()
+
+
+def test_sync_points_at_variants_that_answer_304(client, auth):
+    from backend.app.config import get_settings
+
+    user = create_user(client, auth, "media-variants")
+    assert enroll(client, auth, user, image(52)).status_code == 200
+    meta = next(meta for meta in client.get("/raspberry/sync").json()["photos"] if meta["user_id"] == user)
+    assert meta["url"].startswith(f"/media/{get_settings().sync_photo_variant}/uploads/user_{user}/")
+    assert meta["original_url"] == "/uploads/" + meta["url"].split("/uploads/", 1)[1]
+
+    first = client.get(meta["url"])
+    assert first.status_code == 200 and first.headers["content-type"] == "image/jpeg"
+    again = client.get(meta["url"], headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304 and again.headers["etag"] == first.headers["etag"]
+    assert client.get(meta["url"].replace("/media/face/", "/media/huge/")).status_code == 404
+
+
+def test_deleting_the_last_copy_removes_its_derivatives(client, auth, db):
+    from backend.app.services.derivative_service import VARIANTS, ensure
+
+    user = create_user(client, auth, "media-forget")
+    assert enroll(client, auth, user, image(53)).status_code == 200
+    photo = db.query(models.Photo).filter(models.Photo.user_id == user).one()
+    checksum = photo.checksum
+    paths = [ensure(checksum, media_service.PHOTOS_ROOT / photo.path, variant) for variant in VARIANTS]
+    db.rollback()
+
+    assert client.delete(f"/users/delete/{user}", headers=auth).status_code == 200
+    assert not any(path.exists() for path in paths)
@@ -0,0 +1,23 @@
+import pytest
+
+from backend.app import main
+
+
+@pytest.mark.parametrize("path", ["/stats/inference", "/stats/storage", "/stats/reembed"])
+def test_stats_require_a_user(client, auth, path):
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers=auth).status_code == 200
+
+
+def test_metrics_token(client, monkeypatch):
+    assert client.get("/metrics").status_code == 200
+    monkeypatch.setattr(main.settings, "metrics_token", "scrape-secret")
+    assert client.get("/metrics").status_code == 401
+    assert client.get("/metrics", headers={"Authorization": "Bearer wrong"}).status_code == 401
+    response = client.get("/metrics", headers={"Authorization": "Bearer scrape-secret"})
+    assert response.status_code == 200
+    assert "http_requests_total" in response.text
+
+
+def test_metrics_middleware_is_outermost():
+    assert main.app.user_middleware[0].cls is main.metrics.MetricsMiddleware
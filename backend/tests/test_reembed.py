@@ -0,0 +1,134 @@
+import threading
+
+from backend.app import models
+from backend.app.db import SessionLocal
+from backend.app.services import reembed_service
+from backend.app.services.active_model import get_active_model
+from backend.app.services.model_registry import HashedEmbedder
+from conftest import create_user, enroll, image
+
+
+def _worker() -> reembed_service.ReembedWorker:
+    return reembed_service.ReembedWorker(
+        SessionLocal,
+        resolve_embedder=lambda name: HashedEmbedder(),
+        on_active=lambda db: None,
+        busy=lambda: False,
+        poll_sec=3600,
+        pause_ms=10,
+    )
+
+
+def test_pausing_at_the_last_batch_stops_the_worker(client, auth, db):
+    user = create_user(client, auth, "reembed-pause")
+    assert enroll(client, auth, user, image(30), image(31)).status_code == 200
+    active = get_active_model(db)
+    job = reembed_service.create_job(db, "hashed", "pause-test", batch_size=1000)
+    assert reembed_service.set_status(db, job, "running", ("pending",))
+    assert reembed_service.run_batch(db, job, HashedEmbedder()) > 0
+
+    # The worker still holds the job as running when the API pauses it.
+    worker_db = SessionLocal()
+    worker_job = worker_db.get(models.ReembedJob, job.id)
+    assert reembed_service.set_status(db, job, "paused", ("running",))
+    worker = _worker()
+    thread = threading.Thread(target=worker._work, args=(worker_db, worker_job), daemon=True)
+    thread.start()
+    thread.join(5)
+    stuck = thread.is_alive()
+    worker._stop.set()
+    thread.join(5)
+    worker_db.close()
+
+    assert not stuck
+    db.refresh(job)
+    assert job.status == "paused"
+    assert get_active_model(db) == active
+    assert reembed_service.cancel_job(db, job)
+
+
+def test_run_batch_reports_a_job_paused_after_its_last_batch(client, auth, db):
+    job = reembed_service.create_job(db, "hashed", "pause-test-2", batch_size=1000)
+    assert reembed_service.set_status(db, job, "running", ("pending",))
+    while reembed_service.run_batch(db, job, HashedEmbedder()):
+        pass
+
+    other = SessionLocal()
+    try:
+        assert reembed_service.set_status(other, other.get(models.ReembedJob, job.id), "paused", ("running",))
+    finally:
+        other.close()
+    job.status = "running"  # what a worker that has not seen the pause still holds
+    assert reembed_service.run_batch(db, job, HashedEmbedder()) is None
+    assert reembed_service.cancel_job(db, job)
+
+
+def test_a_changed_vector_space_queues_a_re_embedding(db):
+    from backend.app.services.active_model import set_active_model
+    from backend.app.services.face_detector import facenet_model_name
+
+    assert facenet_model_name("mtcnn") == "facenet-aligned" != facenet_model_name("none")
+    active = get_active_model(db)
+    set_active_model(db, "hashed", "space-before")
+    db.commit()
+    try:
+        job = reembed_service.queue_for_changed_space(db, "hashed", "space-after")
+        assert (job.embedder_name, job.model_name, job.status) == ("hashed", "space-after", "pending")
+        assert reembed_service.queue_for_changed_space(db, "hashed", "space-after") is None  # one open job
+        assert reembed_service.queue_for_changed_space(db, "hashed", "space-before") is None
+        assert reembed_service.cancel_job(db, job)
+    finally:
+        set_active_model(db, active.embedder_name, active.model_name)
+        db.commit()
+
+
+def test_upgrade_keeps_the_stored_space_and_queues_after_the_reindex(tmp_path, monkeypatch):
+    """First start after FaceNet moved to the aligned space, on a database that predates both."""
+    from types import SimpleNamespace
+
+    from sqlalchemy import create_engine
+    from sqlalchemy.orm import sessionmaker
+
+    from backend.app import main
+    from backend.app.db import Base
+    from backend.app.services import blob_service, gallery_service, media_service
+    from backend.app.services.vector_codec import encode_vector
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'upgrade.db'}")
+    Base.metadata.create_all(engine)
+    Session = sessionmaker(bind=engine, autoflush=False)
+    photos = tmp_path / "photos"
+    (photos / "user_1").mkdir(parents=True)
+    (photos / "user_1" / "1.png").write_bytes(image(40))
+    monkeypatch.setattr(media_service, "PHOTOS_ROOT", photos)
+    monkeypatch.setattr(media_service, "CAPTURES_ROOT", tmp_path / "captures")
+    monkeypatch.setattr(blob_service, "BLOBS_ROOT", tmp_path / "blobs")
+    embedder = HashedEmbedder()
+    embedder.name, embedder.registry_name = "upgrade-aligned", "hashed"
+    woken = []
+    monkeypatch.setattr(main, "get_embedder", lambda: embedder)
+    monkeypatch.setattr(main, "get_reembed_worker", lambda: SimpleNamespace(wake=lambda: woken.append(True)))
+    monkeypatch.setattr(main, "SessionLocal", Session)
+
+    db = Session()
+    try:
+        db.add(models.User(id=1, full_name="Legacy", identifier="legacy", password_hash="x"))
+        db.add(models.Embedding(id=1, user_id=1, vector=encode_vector([0.5] * 16), model_name="upgrade-plain"))
+        db.commit()
+
+        main._record_active_model(db)
+        active = get_active_model(db)
+        assert (active.embedder_name, active.model_name) == ("hashed", "upgrade-plain")
+        assert reembed_service.open_job(db) is None  # the photo index is still empty
+
+        main._migrate_embeddings()
+        db.expire_all()
+        job = reembed_service.open_job(db)
+        assert (job.embedder_name, job.model_name, job.total) == ("hashed", "upgrade-aligned", 1)
+        assert woken
+        assert reembed_service.set_status(db, job, "running", ("pending",))
+        assert reembed_service.run_batch(db, job, embedder) == 1
+    finally:
+        db.close()
+        engine.dispose()
+        gallery_service.drop_gallery("upgrade-plain")
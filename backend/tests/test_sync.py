@@ -0,0 +1,76 @@
+import gzip
+import json
+
+import pytest
+
+from backend.app import compression
+from conftest import create_user
+
+
+@pytest.mark.parametrize("encoding", compression.PREFERENCE)
+def test_snapshot_is_served_pre_compressed(client, encoding):
+    plain = client.get("/raspberry/sync", headers={"Accept-Encoding": "identity"})
+    encoded = client.get("/raspberry/sync", headers={"Accept-Encoding": encoding})
+    assert encoded.headers["content-encoding"] == encoding
+    assert encoded.headers["etag"] == plain.headers["etag"]
+    assert json.loads(encoded.content) == plain.json()  # httpx decodes the body
+
+
+def test_encode_all_round_trips():
+    data = json.dumps({"users": [{"id": i, "name": f"user {i}"} for i in range(500)]}).encode()
+    encoded = compression.encode_all(data)
+    assert set(encoded) == set(compression.PREFERENCE)
+    assert gzip.decompress(encoded["gzip"]) == data
+    assert all(len(body) < len(data) for body in encoded.values())
+
+
+def test_unchanged_sync_answers_304(client):
+    first = client.get("/raspberry/sync")
+    etag = first.headers["etag"]
+    assert etag.startswith('W/"')  # one tag for every content-coding, so it must be weak
+    again = client.get("/raspberry/sync", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["etag"] == etag
+    strong = etag.removeprefix("W/")  # what devices stored before the tag became weak
+    assert client.get("/raspberry/sync", headers={"If-None-Match": f'"other", {strong}'}).status_code == 304
+    assert client.get("/raspberry/sync", headers={"If-None-Match": '"stale"'}).status_code == 200
+
+
+def test_delta_returns_changes_and_tombstones(client, auth):
+    cursor = client.get("/raspberry/sync").json()["cursor"]
+    user = create_user(client, auth, "delta-user")
+
+    delta = client.get("/raspberry/sync", params={"since": cursor})
+    body = delta.json()
+    assert body["full"] is False
+    assert user in [item["id"] for item in body["users"]]
+    headers = {"If-None-Match": delta.headers["etag"]}
+    assert client.get("/raspberry/sync", params={"since": cursor}, headers=headers).status_code == 304
+
+    assert client.delete(f"/users/delete/{user}", headers=auth).status_code == 200
+    body = client.get("/raspberry/sync", params={"since": cursor}).json()
+    assert ("user", str(user)) in [(item["entity"], item["entity_id"]) for item in body["deleted"]]
+    assert user not in [item["id"] for item in body["users"]]
+
+
+def test_invalid_cursor(client):
+    assert client.get("/raspberry/sync", params={"since": "yesterday"}).status_code == 400
+
+
+def test_snapshot_is_reused_until_invalidated(client, auth, db):
+    from backend.app.services import sync_service
+
+    first = sync_service.get_sync_snapshot(db)
+    assert sync_service.get_sync_snapshot(db) is first
+    etag = client.get("/raspberry/sync").headers["etag"]
+
+    user = create_user(client, auth, "snapshot-user")
+    rebuilt = sync_service.get_sync_snapshot(db)
+    assert rebuilt is not first
+    assert user in [item["id"] for item in json.loads(rebuilt.body)["users"]]
+    assert client.get("/raspberry/sync").headers["etag"] != etag
+
+
+def test_event_log_survived_the_sync_rework(client):
+    response = client.post("/raspberry/events/log", json={"status": "denied", "device_id": "door-1"})
+    assert response.status_code in (200, 202), response.text
@@ -0,0 +1,23 @@
+from backend.app import models
+from backend.app.services.media_service import PHOTOS_ROOT
+from conftest import create_user, enroll, image
+
+
+def test_prune_removes_the_photos_of_pruned_embeddings(client, auth, db):
+    user = create_user(client, auth, "prune-photos")
+    assert enroll(client, auth, user, *(image(20 + i) for i in range(4))).status_code == 200
+    rows = db.query(models.Photo).filter_by(user_id=user)
+    photos = {photo.embedding_id: (photo.path, photo.checksum) for photo in rows}
+    db.rollback()
+
+    response = client.post(f"/gallery/templates/{user}/prune", params={"max_distance": 0.01}, headers=auth)
+    assert response.status_code == 200, response.text
+    pruned = [item["embedding_id"] for item in response.json()["pruned"]]
+    assert len(pruned) == 1  # template_min_embeddings keeps three
+
+    remaining = {photo.embedding_id for photo in db.query(models.Photo).filter_by(user_id=user)}
+    assert remaining == set(photos) - set(pruned)
+    assert db.query(models.Embedding).filter(models.Embedding.id.in_(remaining)).count() == len(remaining)
+    path, checksum = photos[pruned[0]]
+    assert not (PHOTOS_ROOT / path).exists()
+    assert db.get(models.Blob, checksum) is None
@@ -0,0 +1,66 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from backend.app.config import get_settings
+from backend.app.services.media_service import CAPTURES_ROOT
+from backend.app.services.upload_service import BodyLimitMiddleware
+from conftest import image
+
+
+@pytest.fixture
+def small_limit(monkeypatch):
+    monkeypatch.setattr(get_settings(), "max_upload_bytes", 64)
+    return 64
+
+
+@pytest.fixture(scope="module")
+def limited_client():
+    app = FastAPI()
+
+    @app.post("/echo")
+    async def echo(request: Request):
+        return {"size": len(await request.body())}
+
+    app.add_middleware(BodyLimitMiddleware, max_bytes=100)
+    return TestClient(app)
+
+
+def test_body_limit_refuses_by_content_length(limited_client):
+    assert limited_client.post("/echo", content=b"x" * 100).json() == {"size": 100}
+    assert limited_client.post("/echo", content=b"x" * 101).status_code == 413
+
+
+def test_body_limit_refuses_a_chunked_body(limited_client):
+    chunks = (b"x" * 50 for _ in range(10))  # no Content-Length, so the count happens on receive
+    response = limited_client.post("/echo", content=chunks)
+    assert response.status_code == 413
+    assert "100 byte limit" in response.json()["detail"]
+
+
+def test_oversized_file_is_refused(client, small_limit):
+    response = client.post("/raspberry/identify", files={"image": ("frame.png", image(60), "image/png")})
+    assert response.status_code == 413
+    assert str(small_limit) in response.json()["detail"]
+
+
+def test_oversized_capture_leaves_no_temp_file(client, small_limit):
+    response = client.post(
+        "/raspberry/upload-capture",
+        data={"person_name": "too big"},
+        files={"image": ("big.png", image(61), "image/png")},
+        headers={"X-Device-Id": "upload-limit"},
+    )
+    assert response.status_code == 413
+    device_dir = CAPTURES_ROOT / "upload-limit"
+    assert list(device_dir.iterdir()) == []
+
+
+def test_empty_uploads_are_refused(client):
+    empty = {"image": ("empty.png", b"", "image/png")}
+    assert client.post("/raspberry/identify", files=empty).status_code == 400
+    response = client.post(
+        "/raspberry/upload-capture", data={"person_name": "nobody"}, files=empty, headers={"X-Device-Id": "empty"}
+    )
+    assert response.status_code == 400
+    assert list((CAPTURES_ROOT / "empty").iterdir()) == []
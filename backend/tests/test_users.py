@@ -0,0 +1,37 @@
+from backend.app import models
+from backend.app.services.blob_service import blob_path
+from backend.app.services.media_service import PHOTOS_ROOT
+from conftest import create_user, enroll, image
+
+
+def test_delete_then_re_enroll(client, auth, db):
+    first = create_user(client, auth, "delete-first")
+    assert enroll(client, auth, first, image(10)).status_code == 200
+    photo = db.query(models.Photo).filter(models.Photo.user_id == first).one()
+    checksum, path = photo.checksum, PHOTOS_ROOT / photo.path
+    db.rollback()
+
+    assert client.delete(f"/users/delete/{first}", headers=auth).status_code == 200
+    assert db.query(models.Photo).filter(models.Photo.user_id == first).count() == 0
+    assert db.get(models.Blob, checksum) is None
+    assert not path.exists() and not blob_path(checksum).exists()
+    synced = client.get("/raspberry/sync").json()["photos"]
+    assert all(meta["user_id"] != first for meta in synced)
+
+    second = create_user(client, auth, "delete-second")
+    response = enroll(client, auth, second, image(11))
+    assert response.status_code == 200, response.text
+
+
+def test_delete_keeps_photos_shared_with_other_users(client, auth, db):
+    owner = create_user(client, auth, "shared-owner")
+    other = create_user(client, auth, "shared-other")
+    assert enroll(client, auth, owner, image(12)).status_code == 200
+    assert enroll(client, auth, other, image(12)).status_code == 200
+    checksum = db.query(models.Photo.checksum).filter(models.Photo.user_id == other).scalar()
+
+    assert client.delete(f"/users/delete/{owner}", headers=auth).status_code == 200
+    db.expire_all()
+    assert db.get(models.Blob, checksum).ref_count == 1
+    kept = db.query(models.Photo).filter(models.Photo.user_id == other).one()
+    assert (PHOTOS_ROOT / kept.path).exists()